@@ -1,11 +1,15 @@
-from typing import Any, Dict, List
-import json
+from typing import Any, Dict, List, Optional
+import asyncio
 import os
 import chainlit as cl
 import tokeniser
 import litellm
 from linkup import LinkupClient
 
+from tool_call_assembler import ToolCall, ToolCallAssembler
+from token_buffer import TokenBuffer
+from tool_runner import ToolRunner
+
 MAX_CONTEXT_WINDOW_TOKENS = 70000
 DEFAULT_MODEL = "anthropic/claude-3-5-sonnet-20240620"
 
@@ -98,7 +102,9 @@ async def search_web(query: str, depth: str) -> str:
         Formatted search results as markdown text
     """
     try:
-        search_results = linkup_client.search(
+        # The Linkup client is synchronous, keep it off the event loop
+        search_results = await asyncio.to_thread(
+            linkup_client.search,
             query=query,
             depth=depth,
             output_type="searchResults",
@@ -116,44 +122,60 @@ async def search_web(query: str, depth: str) -> str:
         return f"Search failed: {str(e)}"
 
 
-async def process_tool_calls(tool_calls: Dict, context_messages: List[Dict[str, Any]], msg: cl.Message):
+async def run_tool(tool_call: ToolCall) -> Optional[str]:
+    """
+    Execute one tool call once its arguments have been fully streamed
+
+    Args:
+        tool_call: Assembled tool call from the model
+
+    Returns:
+        The tool output, or None for unknown tools
+    """
+    if tool_call.error:
+        raise ValueError(tool_call.error)
+
+    if tool_call.name == "search_web":
+        return await search_web(
+            tool_call.arguments["query"],
+            tool_call.arguments["depth"]
+        )
+    return None
+
+
+async def process_tool_calls(tool_calls: List[ToolCall], tasks: Dict[Any, asyncio.Future], context_messages: List[Dict[str, Any]], msg: cl.Message):
     """
     Process tool calls made by the model
 
     Args:
-        tool_calls: Dictionary of tool calls from the model
+        tool_calls: Tool calls from the model, in order
+        tasks: Running tool executions, keyed by tool call
         context_messages: Conversation context
         msg: Chainlit message object for streaming response
-        
+
     Returns:
         The generated response after processing tool calls
     """
     # Show temporary "searching" message
     tmp_message = cl.Message(content="Searching the web...", author="Tool")
     await tmp_message.send()
-    await cl.sleep(1)
 
-    for _, tool_info in tool_calls.items():
+    for tool_call in tool_calls:
         try:
-            arguments = json.loads(tool_info["arguments"])
-
-            if tool_info["name"] == "search_web":
-                # Execute web search
-                search_result = await search_web(
-                    arguments["query"],
-                    arguments["depth"]
-                )
+            # The search was started while the model was still streaming
+            search_result = await tasks[tool_call.key]
 
+            if search_result is not None:
                 # Add search results to conversation context
                 context_messages.append({
                     "role": "user",
                     "content": search_result
                 })
 
-        except json.JSONDecodeError:
-            await msg.stream_token("Error: Failed to parse tool arguments")
-            return "Error: Failed to parse tool arguments"
         except Exception as e:
+            for task in tasks.values():
+                task.cancel()
+            await tmp_message.remove()
             await msg.stream_token(f"Error: Tool execution failed - {str(e)}")
             return f"Error: Tool execution failed - {str(e)}"
 
@@ -173,10 +195,11 @@ async def process_tool_calls(tool_calls: Dict, context_messages: List[Dict[str,
         stream=True
     )
 
-    async for chunk in stream:
-        if chunk.choices[0].delta.content:
-            tool_response += chunk.choices[0].delta.content
-            await msg.stream_token(chunk.choices[0].delta.content)
+    async with TokenBuffer(msg) as buffer:
+        async for chunk in stream:
+            if chunk.choices[0].delta.content:
+                tool_response += chunk.choices[0].delta.content
+                await buffer.stream_token(chunk.choices[0].delta.content)
             
     return tool_response
 
@@ -203,8 +226,10 @@ async def run_with_tools(messages: List[Dict[str, Any]], selected_tool: str = No
     if selected_tool:
         tool_choice = {"type": "function", "function": {"name": selected_tool}}
 
-    # Initial response generation
-    current_tool_calls = {}
+    # Initial response generation. Each tool call starts running as soon as
+    # its arguments are complete, while the rest of the response streams in.
+    assembler = ToolCallAssembler()
+    tool_tasks = {}
     response_content = ""
 
     system_prompt = "You're an helpful assistant. Please provide a response to the user's query."
@@ -220,36 +245,37 @@ async def run_with_tools(messages: List[Dict[str, Any]], selected_tool: str = No
             stream=True
         )
 
-        async for chunk in stream:
-            # Process text content
-            if chunk.choices[0].delta.content:
-                response_content += chunk.choices[0].delta.content
-                await msg.stream_token(chunk.choices[0].delta.content)
-
-            # Process tool calls
-            if chunk.choices[0].delta.tool_calls:
-                for tool_call in chunk.choices[0].delta.tool_calls:
-                    tool_id = tool_call.index
-
-                    # Initialize new tool call
-                    if tool_id not in current_tool_calls and tool_call.function.name:
-                        current_tool_calls[tool_id] = {
-                            "name": tool_call.function.name,
-                            "arguments": tool_call.function.arguments or ""
-                        }
-                    # Append to existing tool call
-                    elif tool_id in current_tool_calls:
-                        current_tool_calls[tool_id]["arguments"] += tool_call.function.arguments or ""
-
-            # Add assistant's response to context
-            context_messages.append(
-                {"role": "assistant", "content": response_content})
+        tool_runner = cl.user_session.get("tool_runner")
+        try:
+            async with TokenBuffer(msg) as buffer:
+                async for chunk in stream:
+                    # Process text content
+                    if chunk.choices[0].delta.content:
+                        response_content += chunk.choices[0].delta.content
+                        await buffer.stream_token(chunk.choices[0].delta.content)
+
+                    # Process tool calls, bounded by the runner's concurrency
+                    # limit and timeout
+                    for tool_call in assembler.add_openai_delta(chunk.choices[0].delta):
+                        tool_tasks[tool_call.key] = tool_runner.start(tool_call, run_tool)
+        except BaseException:
+            # Nobody awaits the tools already started if the stream fails
+            for task in tool_tasks.values():
+                task.cancel()
+            raise
+
+        for tool_call in assembler.finish():
+            tool_tasks[tool_call.key] = tool_runner.start(tool_call, run_tool)
+
+        # Add assistant's response to context
+        context_messages.append(
+            {"role": "assistant", "content": response_content})
 
         # Send initial message
         await msg.send()
 
         # Process any tool calls and combine responses
-        if current_tool_calls:
+        if tool_tasks:
             if len(response_content) == 0:
                 # Display initial message if no response content.
                 # Can be the case when the user explicitly asks for a tool.
@@ -258,7 +284,7 @@ async def run_with_tools(messages: List[Dict[str, Any]], selected_tool: str = No
                 await msg.stream_token(response_content)
                 await msg.update()
                 
-            tool_response = await process_tool_calls(current_tool_calls, context_messages, msg)
+            tool_response = await process_tool_calls(assembler.tool_calls, tool_tasks, context_messages, msg)
             
             if tool_response:
                 response_content = f"{response_content}\n\n{tool_response}"
@@ -281,6 +307,7 @@ async def start_chat():
     await cl.context.emitter.set_commands(COMMANDS)
 
     cl.user_session.set("chat_messages", [])
+    cl.user_session.set("tool_runner", ToolRunner())
 
 
 @cl.on_message
@@ -0,0 +1,140 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalJSON:
+    """Tell when a streamed JSON object or array is complete.
+
+    Each fragment is scanned once, tracking nesting depth and whether the
+    scanner is inside a string, so completion is known as soon as the closing
+    bracket arrives without re-parsing the text received so far.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.complete = False
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, fragment: str) -> bool:
+        self.parts.append(fragment)
+        if self.complete:
+            return True
+        for char in fragment:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                self._started = True
+            elif char in "}]":
+                self._depth -= 1
+                if self._started and self._depth == 0:
+                    self.complete = True
+                    break
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class ToolCall:
+    def __init__(self, key, index: Optional[int] = None):
+        self.key = key
+        self.index = index
+        self.id: Optional[str] = None
+        self.name = ""
+        self.arguments: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.done = False
+        self._json = IncrementalJSON()
+
+    @property
+    def raw_arguments(self) -> str:
+        return self._json.text
+
+    def _finish(self):
+        self.done = True
+        text = self._json.text.strip()
+        try:
+            self.arguments = json.loads(text) if text else {}
+        except json.JSONDecodeError as e:
+            self.error = f"Failed to parse tool arguments: {e}"
+
+
+class ToolCallAssembler:
+    """Assemble streamed tool calls from OpenAI, litellm or Anthropic deltas.
+
+    Several tool calls may be streamed side by side; they are tracked by
+    index or id. Every `add_*` method returns the calls whose arguments just
+    became complete JSON, so they can be dispatched before the model stream
+    ends. `finish` returns the calls that were still open when it ended.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Any, ToolCall] = {}
+        # Anthropic content-block index to tool call
+        self._blocks: Dict[int, ToolCall] = {}
+
+    @property
+    def tool_calls(self) -> List[ToolCall]:
+        return list(self.calls.values())
+
+    def add_openai_delta(self, delta) -> List[ToolCall]:
+        """Handle `choices[0].delta` of an OpenAI or litellm stream chunk."""
+        completed = []
+        for tool_call in getattr(delta, "tool_calls", None) or []:
+            key = tool_call.index if tool_call.index is not None else tool_call.id
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = ToolCall(key, tool_call.index)
+            if tool_call.id:
+                call.id = tool_call.id
+            function = tool_call.function
+            if function is not None and function.name:
+                call.name = function.name
+            if function is not None and function.arguments and not call.done:
+                if call._json.feed(function.arguments):
+                    call._finish()
+                    completed.append(call)
+        return completed
+
+    def add_anthropic_event(self, event) -> List[ToolCall]:
+        """Handle one raw event of an Anthropic Messages stream."""
+        if event.type == "content_block_start":
+            block = event.content_block
+            if block.type == "tool_use":
+                call = ToolCall(block.id, event.index)
+                call.id = block.id
+                call.name = block.name
+                self.calls[block.id] = self._blocks[event.index] = call
+        elif event.type == "content_block_delta":
+            call = self._blocks.get(event.index)
+            if call is not None and event.delta.type == "input_json_delta":
+                if not call.done and call._json.feed(event.delta.partial_json):
+                    call._finish()
+                    return [call]
+        elif event.type == "content_block_stop":
+            call = self._blocks.get(event.index)
+            if call is not None and not call.done:
+                # Tools without parameters never stream any JSON
+                call._finish()
+                return [call]
+        return []
+
+    def finish(self) -> List[ToolCall]:
+        completed = []
+        for call in self.calls.values():
+            if not call.done:
+                call._finish()
+                completed.append(call)
+        return completed
@@ -2,6 +2,8 @@ import os
 import anthropic
 import chainlit as cl
 
+from token_buffer import TokenBuffer
+
 c = anthropic.AsyncAnthropic()
 
 
@@ -23,9 +25,10 @@ async def call_claude(query: str):
         stream=True,
     )
 
-    async for data in stream:
-        if data.type == "content_block_delta":
-            await msg.stream_token(data.delta.text)
+    async with TokenBuffer(msg) as buffer:
+        async for data in stream:
+            if data.type == "content_block_delta":
+                await buffer.stream_token(data.delta.text)
 
     await msg.send()
     messages.append({"role": "assistant", "content": msg.content})
@@ -1,7 +1,12 @@
+import asyncio
 import chainlit as cl
 import json
 from anthropic import AsyncAnthropic
 
+from tool_call_assembler import ToolCallAssembler
+from token_buffer import TokenBuffer
+from tool_runner import ToolRunner
+
 SYSTEM = "you are a helpful assistant."
 MODEL_NAME = "claude-3-5-sonnet-20240620"
 c = AsyncAnthropic()
@@ -98,40 +103,61 @@ TOOL_FUNCTIONS = {"get_current_weather": get_current_weather, "calculator": calc
 async def call_claude(chat_messages):
     msg = cl.Message(content="", author="Claude")
 
-    async with c.messages.stream(
-        max_tokens=1024,
-        system=SYSTEM,
-        messages=chat_messages,
-        tools=tools,
-        model="claude-3-5-sonnet-20240620",
-    ) as stream:
-        async for text in stream.text_stream:
-            await msg.stream_token(text)
+    # Each tool is started as soon as its input JSON is complete, while
+    # Claude is still streaming the rest of the turn
+    assembler = ToolCallAssembler()
+    tool_runner = cl.user_session.get("tool_runner")
+    running = {}
+
+    try:
+        async with c.messages.stream(
+            max_tokens=1024,
+            system=SYSTEM,
+            messages=chat_messages,
+            tools=tools,
+            model="claude-3-5-sonnet-20240620",
+        ) as stream, TokenBuffer(msg) as buffer:
+            async for event in stream:
+                if event.type == "text":
+                    await buffer.stream_token(event.text)
+                for tool_call in assembler.add_anthropic_event(event):
+                    running[tool_call.id] = tool_runner.start(tool_call, call_tool)
+    except BaseException:
+        # Nobody awaits the tools already started if the stream fails
+        for task in running.values():
+            task.cancel()
+        raise
+
+    for tool_call in assembler.finish():
+        running[tool_call.id] = tool_runner.start(tool_call, call_tool)
 
     await msg.send()
     response = await stream.get_final_message()
 
-    return response
+    return response, running
 
 
 # initialise chat
 @cl.on_chat_start
 async def start_chat():
     cl.user_session.set("chat_messages", [])
+    cl.user_session.set("tool_runner", ToolRunner())
 
 
 # route to functions based on tool call
 @cl.step(type="tool")
-async def call_tool(tool_use):
-    tool_name = tool_use.name
-    tool_input = tool_use.input
+async def call_tool(tool_call):
+    tool_name = tool_call.name
+    tool_input = tool_call.arguments
 
     current_step = cl.context.current_step
     current_step.name = tool_name
 
     tool_function = TOOL_FUNCTIONS.get(tool_name)
 
-    if tool_function:
+    if tool_call.error:
+        current_step.output = json.dumps({"error": tool_call.error})
+    elif tool_function:
         try:
             current_step.output = await tool_function(**tool_input)
         except TypeError:
@@ -150,11 +176,15 @@ async def call_tool(tool_use):
 async def chat(message: cl.Message):
     chat_messages = cl.user_session.get("chat_messages")
     chat_messages.append({"role": "user", "content": message.content})
-    response = await call_claude(chat_messages)
+    response, running = await call_claude(chat_messages)
 
     while response.stop_reason == "tool_use":
-        tool_use = next(block for block in response.content if block.type == "tool_use")
-        tool_result = await call_tool(tool_use)
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        # The tools were started while the turn streamed, results are sent
+        # back in call order
+        tool_results = await asyncio.gather(
+            *(running[tool_use.id] for tool_use in tool_uses)
+        )
 
         messages = [
             {"role": "assistant", "content": response.content},
@@ -166,12 +196,13 @@ async def chat(message: cl.Message):
                         "tool_use_id": tool_use.id,
                         "content": str(tool_result),
                     }
+                    for tool_use, tool_result in zip(tool_uses, tool_results)
                 ],
             },
         ]
 
         chat_messages.extend(messages)
-        response = await call_claude(chat_messages)
+        response, running = await call_claude(chat_messages)
 
     final_response = next(
         (block.text for block in response.content if hasattr(block, "text")),
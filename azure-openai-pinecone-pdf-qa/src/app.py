@@ -4,15 +4,15 @@ from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
 from dotenv import load_dotenv
 from langchain.schema import Document
 from langchain_pinecone import Pinecone
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    PyMuPDFLoader,
-)
 import os
-import uuid
 from pinecone import Pinecone, ServerlessSpec
 import chainlit as cl
 
+from cached_embeddings import CachedEmbeddings
+from ingest import ingest_documents
+from semantic_cache import CachedConversationalRetrievalChain, SemanticCache
+from pdf_pipeline import iter_pdf_chunks
+
 chunk_size = 1024
 chunk_overlap = 50
 PDF_STORAGE_PATH = "./pdfs"
@@ -37,6 +37,11 @@ AZURE_OPENAI_CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 index_name = "primer"
 
+# Ingestion batching
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+
 # Initialize Pinecone
 pc = Pinecone(api_key=PINECONE_API_KEY)
 if index_name not in pc.list_indexes().names():
@@ -47,51 +52,65 @@ if index_name not in pc.list_indexes().names():
         spec=ServerlessSpec(cloud="aws", region="us-west-2"),
     )
 
-# Initialize Azure OpenAI embeddings
+# Initialize Azure OpenAI embeddings, chunks embedded by an earlier run
+# are served from the on-disk cache
 
-embeddings = AzureOpenAIEmbeddings(
-    deployment=AZURE_OPENAI_ADA_EMBEDDING_DEPLOYMENT_NAME,
-    model=AZURE_OPENAI_ADA_EMBEDDING_MODEL_NAME,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    openai_api_key=AZURE_OPENAI_API_KEY,
-    openai_api_version=AZURE_OPENAI_ADA_DEPLOYMENT_VERSION,
+embeddings = CachedEmbeddings(
+    AzureOpenAIEmbeddings(
+        deployment=AZURE_OPENAI_ADA_EMBEDDING_DEPLOYMENT_NAME,
+        model=AZURE_OPENAI_ADA_EMBEDDING_MODEL_NAME,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        openai_api_key=AZURE_OPENAI_API_KEY,
+        openai_api_version=AZURE_OPENAI_ADA_DEPLOYMENT_VERSION,
+    )
 )
 
 
 def process_pdfs(pdf_storage_path: str):
     pdf_directory = Path(pdf_storage_path)
-    docs = []
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-
-    # Load PDFs and split into documents
-    for pdf_path in pdf_directory.glob("*.pdf"):
-        loader = PyMuPDFLoader(str(pdf_path))
-        documents = loader.load()
-        docs += text_splitter.split_documents(documents)
-
-    # Convert text to embeddings
-    for doc in docs:
-        embedding = embeddings.embed_query(doc.page_content)
-        random_id = str(uuid.uuid4())
-        # print (embedding)
-        doc_search = pc.Index(index_name)
-        # doc_search = Pinecone (doc_search, embeddings.embed_query, doc.page_content, random_id)
-
-        # Store the vector in Pinecone index
-        doc_search.upsert(
-            vectors=[
-                {
-                    "id": random_id,
-                    "values": embedding,
-                    "metadata": {"source": doc.page_content},
-                }
-            ]
+
+    # Load PDFs and split into documents in a process pool, chunks are
+    # streamed to the embedding stage as soon as their pages are parsed
+    docs = (
+        chunk
+        for chunks in iter_pdf_chunks(
+            pdf_directory.glob("*.pdf"), chunk_size=1000, chunk_overlap=100
         )
-        print("Vector stored in Pinecone index successfully.")
-    return doc_search
+        for chunk in chunks
+    )
 
+    # Convert text to embeddings and store the vectors in Pinecone index
+    doc_search = pc.Index(index_name)
+    stats = ingest_documents(
+        docs,
+        embeddings,
+        doc_search,
+        embed_batch_size=EMBED_BATCH_SIZE,
+        upsert_batch_size=UPSERT_BATCH_SIZE,
+        max_concurrency=EMBED_CONCURRENCY,
+    )
+    print(
+        f"Stored {stats['chunks']} vectors in Pinecone index in {stats['seconds']}s "
+        f"({stats['chunks_per_second']} chunks/sec)."
+    )
+    return doc_search, stats["fingerprint"]
 
-doc_search = process_pdfs(PDF_STORAGE_PATH)
+
+doc_search, ingest_fingerprint = process_pdfs(PDF_STORAGE_PATH)
+
+# Answers to near-duplicate questions are shared across chats
+answer_cache = SemanticCache.from_env(embeddings)
+
+
+def namespace_version(cache_namespace: str):
+    """
+    The content ingested at startup, and the vector count to notice writes by
+    other processes. Those are missed when they keep the count unchanged, e.g.
+    edited pages upserted under stable ids, until ANSWER_CACHE_TTL expires.
+    """
+    stats = doc_search.describe_index_stats()
+    summary = stats.namespaces.get(cache_namespace)
+    return ingest_fingerprint, summary.vector_count if summary else 0
 
 welcome_message = "Welcome to the Chainlit Pinecone demo! Ask anything about documents you vectorized and stored in your Pinecone DB."
 namespace = None
@@ -108,6 +127,12 @@ async def start():
         index_name=index_name, embedding=embeddings, namespace=namespace
     )
 
+    # Cached answers are dropped once the namespace's version changes
+    cache_namespace = namespace or ""
+    answer_cache.check_version(
+        cache_namespace, await cl.make_async(namespace_version)(cache_namespace)
+    )
+
     message_history = ChatMessageHistory()
 
     memory = ConversationBufferMemory(
@@ -117,7 +142,7 @@ async def start():
         return_messages=True,
     )
 
-    chain = ConversationalRetrievalChain.from_llm(
+    chain = CachedConversationalRetrievalChain.from_llm(
         llm=AzureChatOpenAI(
             api_key=AZURE_OPENAI_API_KEY,
             azure_endpoint=AZURE_OPENAI_ENDPOINT,
@@ -130,12 +155,18 @@ async def start():
         retriever=docsearch.as_retriever(),
         memory=memory,
         return_source_documents=True,
+        answer_cache=answer_cache,
+        cache_namespace=cache_namespace,
     )
     cl.user_session.set("chain", chain)
 
 
 @cl.on_message
 async def main(message: cl.Message):
+    if message.content.strip() == "/cache-stats":
+        await cl.Message(content=f"Answer cache: {answer_cache.stats()}").send()
+        return
+
     chain = cl.user_session.get("chain")  # type: ConversationalRetrievalChain
 
     cb = cl.AsyncLangchainCallbackHandler()
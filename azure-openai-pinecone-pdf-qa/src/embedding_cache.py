@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+# Every vector slot starts with the first bytes of its key's digest
+_TAG_BYTES = 16
+_EMPTY_TAG = bytes(_TAG_BYTES)
+
+
+class EmbeddingStore:
+    """On-disk embedding cache keyed by (model, text hash).
+
+    Vectors are stored as float32 in one memory-mapped file per dimension,
+    with a fixed number of slots. A SQLite index maps keys to slots and keeps
+    the last use of every entry, so once all slots are taken the least
+    recently used vector is overwritten.
+
+    Several worker processes on one node can share a cache directory. Writes
+    happen while holding the SQLite write lock, and readers check the tag at
+    the start of a slot before and after copying it, so a vector that is
+    being evicted by another process is treated as a miss rather than read
+    torn.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._db_path = os.path.join(path, "index.sqlite3")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._maps: Dict[int, mmap.mmap] = {}
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, dim INTEGER, slot INTEGER, last_used REAL)"
+        )
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS entries_slot ON entries (dim, slot)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_lru ON entries (dim, last_used)"
+        )
+
+    @staticmethod
+    def key(namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        conn = self._connect()
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), 500):
+            batch = keys[i : i + 500]
+            rows = conn.execute(
+                "SELECT key, dim, slot FROM entries WHERE key IN "
+                f"({','.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+            for key, dim, slot in rows:
+                vector = self._read(key, dim, slot)
+                if vector is not None:
+                    found[key] = vector
+
+        if found:
+            now = time.time()
+            try:
+                conn.execute("BEGIN")
+                try:
+                    conn.executemany(
+                        "UPDATE entries SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.OperationalError:
+                # Recency is best effort, never fail a lookup because the
+                # index is busy
+                pass
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]):
+        if not vectors:
+            return
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, vector in vectors.items():
+                dim = len(vector)
+                row = conn.execute(
+                    "SELECT slot FROM entries WHERE key = ? AND dim = ?", (key, dim)
+                ).fetchone()
+                if row is not None:
+                    slot = row[0]
+                    conn.execute(
+                        "UPDATE entries SET last_used = ? WHERE key = ?", (now, key)
+                    )
+                else:
+                    slot = self._allocate(conn, dim)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                        (key, dim, slot, now),
+                    )
+                self._write(key, dim, slot, vector)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict:
+        entries = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _allocate(self, conn: sqlite3.Connection, dim: int) -> int:
+        next_slot = conn.execute(
+            "SELECT COALESCE(MAX(slot) + 1, 0) FROM entries WHERE dim = ?", (dim,)
+        ).fetchone()[0]
+        if next_slot < self.max_entries:
+            return next_slot
+        key, slot = conn.execute(
+            "SELECT key, slot FROM entries WHERE dim = ? ORDER BY last_used LIMIT 1",
+            (dim,),
+        ).fetchone()
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return slot
+
+    def _map(self, dim: int) -> mmap.mmap:
+        with self._lock:
+            mapped = self._maps.get(dim)
+            if mapped is None:
+                size = self.max_entries * (_TAG_BYTES + 4 * dim)
+                fd = os.open(
+                    os.path.join(self.path, f"vectors-{dim}.f32"),
+                    os.O_RDWR | os.O_CREAT,
+                )
+                try:
+                    if os.fstat(fd).st_size < size:
+                        # Sparse, disk is only used as slots get written
+                        os.ftruncate(fd, size)
+                    mapped = mmap.mmap(fd, os.fstat(fd).st_size)
+                finally:
+                    os.close(fd)
+                self._maps[dim] = mapped
+            return mapped
+
+    def _read(self, key: str, dim: int, slot: int):
+        mapped = self._map(dim)
+        offset = slot * (_TAG_BYTES + 4 * dim)
+        tag = bytes.fromhex(key)[:_TAG_BYTES]
+        if offset + _TAG_BYTES + 4 * dim > len(mapped):
+            return None
+        if mapped[offset : offset + _TAG_BYTES] != tag:
+            return None
+        data = mapped[offset + _TAG_BYTES : offset + _TAG_BYTES + 4 * dim]
+        if mapped[offset : offset + _TAG_BYTES] != tag:
+            return None
+        vector = array("f")
+        vector.frombytes(data)
+        return vector.tolist()
+
+    def _write(self, key: str, dim: int, slot: int, vector: Sequence[float]):
+        mapped = self._map(dim)
+        offset = slot * (_TAG_BYTES + 4 * dim)
+        mapped[offset : offset + _TAG_BYTES] = _EMPTY_TAG
+        mapped[offset + _TAG_BYTES : offset + _TAG_BYTES + 4 * dim] = array(
+            "f", vector
+        ).tobytes()
+        mapped[offset : offset + _TAG_BYTES] = bytes.fromhex(key)[:_TAG_BYTES]
+
+
+def embed_with_cache(
+    store: EmbeddingStore,
+    namespace: str,
+    texts: List[str],
+    embed: Callable[[List[str]], List[List[float]]],
+) -> List[List[float]]:
+    """Embed `texts`, only calling `embed` for texts the store has not seen."""
+    keys = [store.key(namespace, text) for text in texts]
+    found = store.get_many(keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+        vectors = embed(list(missing.values()))
+        computed = dict(zip(missing, vectors))
+        store.put_many(computed)
+        found.update(computed)
+    return [found[key] for key in keys]
+
+
+async def aembed_with_cache(
+    store: EmbeddingStore,
+    namespace: str,
+    texts: List[str],
+    aembed: Callable[[List[str]], Awaitable[List[List[float]]]],
+) -> List[List[float]]:
+    keys = [store.key(namespace, text) for text in texts]
+    found = await asyncio.to_thread(store.get_many, keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+        vectors = await aembed(list(missing.values()))
+        computed = dict(zip(missing, vectors))
+        await asyncio.to_thread(store.put_many, computed)
+        found.update(computed)
+    return [found[key] for key in keys]
+
+
+def model_namespace(embeddings) -> str:
+    """Identify the model an embeddings object calls, for cache keys."""
+    parts = [type(embeddings).__name__]
+    for attr in ("model", "model_name", "deployment", "dimensions"):
+        value = getattr(embeddings, attr, None)
+        if value is not None:
+            parts.append(f"{attr}={value}")
+    return ":".join(parts)
+
+
+_stores: Dict[tuple, EmbeddingStore] = {}
+
+
+def get_store(path: str = None, max_entries: int = None) -> EmbeddingStore:
+    """The store of this process for `path`, configured from the environment."""
+    path = path or os.environ.get("EMBEDDING_CACHE_DIR", ".embedding_cache")
+    max_entries = max_entries or int(
+        os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "100000")
+    )
+    key = (os.path.abspath(path), max_entries)
+    if key not in _stores:
+        _stores[key] = EmbeddingStore(path, max_entries)
+    return _stores[key]
@@ -0,0 +1,124 @@
+import hashlib
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+from langchain.schema import Document
+
+T = TypeVar("T")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status in (429, 503) or "rate limit" in str(error).lower()
+
+
+def retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def with_backoff(
+    fn: Callable[[], T], max_retries: int = 6, base_delay: float = 1.0
+) -> T:
+    """
+    Call `fn`, retrying rate-limited calls with exponential backoff and jitter.
+    A `Retry-After` header sent by the service takes precedence.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limited(e):
+                raise
+            delay = retry_after(e) or base_delay * 2**attempt
+            time.sleep(delay + random.uniform(0, delay / 2))
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_documents(
+    docs: Iterable[Document],
+    embeddings,
+    index,
+    embed_batch_size: int = 64,
+    upsert_batch_size: int = 100,
+    max_concurrency: int = 4,
+) -> dict:
+    """
+    Embed `docs` and store them in a Pinecone `index`.
+
+    Chunks are embedded `embed_batch_size` at a time with `embed_documents`,
+    with up to `max_concurrency` batches in flight. Vectors are upserted
+    `upsert_batch_size` at a time as soon as their batch is embedded, so
+    upserts overlap with the remaining embedding requests. `docs` may be a
+    generator; it is only consumed as fast as batches can be embedded.
+    The returned `fingerprint` identifies the ingested content.
+    """
+    start = time.perf_counter()
+    pending = []
+    upserted = 0
+    ids = set()
+
+    def embed(batch: List[Document]):
+        texts = [doc.page_content for doc in batch]
+        return texts, with_backoff(lambda: embeddings.embed_documents(texts))
+
+    def flush(vectors):
+        with_backoff(lambda: index.upsert(vectors=vectors))
+        return len(vectors)
+
+    def collect(futures):
+        nonlocal upserted
+        for future in futures:
+            texts, vectors = future.result()
+            for text, values in zip(texts, vectors):
+                # Re-ingesting a chunk overwrites its vector instead of
+                # adding a duplicate
+                id_ = hashlib.sha256(text.encode()).hexdigest()
+                ids.add(id_)
+                pending.append(
+                    {"id": id_, "values": values, "metadata": {"source": text}}
+                )
+            while len(pending) >= upsert_batch_size:
+                upserted += flush(pending[:upsert_batch_size])
+                del pending[:upsert_batch_size]
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        in_flight = set()
+        for batch in batched(docs, embed_batch_size):
+            if len(in_flight) >= 2 * max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(pool.submit(embed, batch))
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    if pending:
+        upserted += flush(pending)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "chunks": upserted,
+        # Ids are content hashes, so this changes whenever any chunk does
+        "fingerprint": hashlib.sha256("".join(sorted(ids)).encode()).hexdigest(),
+        "seconds": round(elapsed, 2),
+        "chunks_per_second": round(upserted / elapsed, 1) if elapsed else 0.0,
+    }
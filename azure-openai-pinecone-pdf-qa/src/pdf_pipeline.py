@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pymupdf
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# Splitter of the current worker process, built by _init_worker
+_splitter: Optional[RecursiveCharacterTextSplitter] = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int):
+    global _splitter
+    _splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def _load_pages(path: str, start: int, end: int) -> List[Document]:
+    """Extract and split pages [start, end) of one PDF, in a worker process."""
+    documents = []
+    with pymupdf.open(path) as pdf:
+        # Same metadata as PyMuPDFLoader
+        file_metadata = {
+            "source": path,
+            "file_path": path,
+            "total_pages": len(pdf),
+            **{
+                k: v
+                for k, v in pdf.metadata.items()
+                if isinstance(v, (str, int))
+            },
+        }
+        for page_number in range(start, min(end, len(pdf))):
+            documents.append(
+                Document(
+                    page_content=pdf[page_number].get_text(),
+                    metadata={**file_metadata, "page": page_number},
+                )
+            )
+    return _splitter.split_documents(documents)
+
+
+def plan_tasks(paths: Iterable[str], pages_per_task: int) -> Iterator[Tuple[str, int, int]]:
+    """Split every PDF into page ranges, so one large file can use all cores."""
+    for path in paths:
+        with pymupdf.open(path) as pdf:
+            page_count = len(pdf)
+        for start in range(0, max(page_count, 1), pages_per_task):
+            yield path, start, start + pages_per_task
+
+
+def iter_pdf_chunks(
+    paths: Iterable[str],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+    pages_per_task: int = 16,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[List[Document]]:
+    """
+    Parse and split PDFs in a process pool, yielding chunks as they are ready.
+
+    Every PDF is cut into ranges of `pages_per_task` pages. At most
+    `max_pending` ranges are queued or running at a time, so memory stays
+    bounded no matter how large the corpus is, and the caller can embed the
+    chunks of one range while the next ones are being parsed. Ranges are
+    yielded in completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    tasks = plan_tasks([str(path) for path in paths], pages_per_task)
+
+    if workers == 1:
+        # A pool would only add process startup and pickling
+        _init_worker(chunk_size, chunk_overlap)
+        for task in tasks:
+            yield _load_pages(*task)
+        return
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Workers are forked from a server that already imported langchain and
+        # PyMuPDF, instead of importing them again each
+        context.set_forkserver_preload([__name__])
+    else:
+        # Windows, each worker imports the dependencies itself
+        context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(chunk_size, chunk_overlap),
+    ) as pool:
+        pending = set()
+        for task in tasks:
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_load_pages, *task))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
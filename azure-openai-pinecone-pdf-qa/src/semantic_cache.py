@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+
+
+class _Entry:
+    __slots__ = ("namespace", "question", "vector", "answer", "sources", "expires")
+
+    def __init__(self, namespace, question, vector, answer, sources, expires):
+        self.namespace = namespace
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.expires = expires
+
+
+class SemanticCache:
+    """Answers keyed by the embedding of the question, per namespace.
+
+    A lookup returns the answer of the most similar cached question in the
+    same namespace when its cosine similarity is at least `threshold`.
+    Entries expire after `ttl` seconds, and the least recently used entry is
+    evicted once there are `max_entries`. A namespace is invalidated when it
+    is re-indexed, or when the version passed to `check_version` changes.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.95,
+        ttl: float = 3600,
+        max_entries: int = 1000,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_key = 0
+        # Stacked vectors of each namespace, rebuilt after it changes
+        self._matrices: Dict[str, Tuple[List[int], np.ndarray]] = {}
+        self._versions: Dict[str, Any] = {}
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evicted": 0,
+            "invalidated": 0,
+        }
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings) -> "SemanticCache":
+        return cls(
+            embeddings,
+            threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95")),
+            ttl=float(os.environ.get("ANSWER_CACHE_TTL", "3600")),
+            max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+        )
+
+    def embed(self, question: str) -> np.ndarray:
+        return _normalize(self.embeddings.embed_query(question))
+
+    async def aembed(self, question: str) -> np.ndarray:
+        return _normalize(await self.embeddings.aembed_query(question))
+
+    def get(
+        self, namespace: str, vector: np.ndarray
+    ) -> Optional[Tuple[str, List[Document]]]:
+        """Return the (answer, source documents) of a near-duplicate question."""
+        with self._lock:
+            self._expire()
+            keys, matrix = self._matrix(namespace)
+            if keys:
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self._counters["hits"] += 1
+                    entry = self._entries[keys[best]]
+                    return entry.answer, entry.sources
+            self._counters["misses"] += 1
+            return None
+
+    def put(
+        self,
+        namespace: str,
+        vector: np.ndarray,
+        question: str,
+        answer: str,
+        sources: List[Document],
+    ):
+        with self._lock:
+            self._entries[self._next_key] = _Entry(
+                namespace,
+                question,
+                vector,
+                answer,
+                sources,
+                time.monotonic() + self.ttl,
+            )
+            self._next_key += 1
+            self._matrices.pop(namespace, None)
+            while len(self._entries) > self.max_entries:
+                _, entry = self._entries.popitem(last=False)
+                self._matrices.pop(entry.namespace, None)
+                self._counters["evicted"] += 1
+
+    def invalidate(self, namespace: str):
+        """Drop every answer of `namespace`, e.g. after re-indexing it."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.namespace == namespace]
+            for key in stale:
+                del self._entries[key]
+            self._matrices.pop(namespace, None)
+            self._counters["invalidated"] += len(stale)
+
+    def check_version(self, namespace: str, version: Any):
+        """Invalidate `namespace` if its content changed since the last check."""
+        with self._lock:
+            known = self._versions.get(namespace, version)
+            self._versions[namespace] = version
+        if known != version:
+            self.invalidate(namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "hit_rate": round(self._counters["hits"] / lookups, 3)
+                if lookups
+                else 0.0,
+            }
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items() if e.expires <= now]
+        for key in expired:
+            self._matrices.pop(self._entries.pop(key).namespace, None)
+        self._counters["expired"] += len(expired)
+
+    def _matrix(self, namespace: str) -> Tuple[List[int], np.ndarray]:
+        if namespace not in self._matrices:
+            keys = [k for k, e in self._entries.items() if e.namespace == namespace]
+            vectors = [self._entries[k].vector for k in keys]
+            self._matrices[namespace] = (
+                keys,
+                np.stack(vectors) if vectors else np.zeros((0, 0), np.float32),
+            )
+        return self._matrices[namespace]
+
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class CachedConversationalRetrievalChain(ConversationalRetrievalChain):
+    """ConversationalRetrievalChain that answers repeated questions from a cache.
+
+    The question is first condensed into a standalone question with the chat
+    history, as usual. That standalone question is looked up in
+    `answer_cache` under `cache_namespace`; on a hit, retrieval and the LLM
+    call are skipped. On a miss, the chain runs on the standalone question
+    and the answer is cached.
+    """
+
+    answer_cache: SemanticCache
+    cache_namespace: str = ""
+
+    def _chat_history_str(self, inputs: Dict[str, Any]) -> str:
+        get_chat_history = self.get_chat_history or _get_chat_history
+        return get_chat_history(inputs["chat_history"])
+
+    def _cached_output(self, answer: str, sources: List[Document]) -> Dict[str, Any]:
+        output = {self.output_key: answer}
+        if self.return_source_documents:
+            output["source_documents"] = sources
+        return output
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        chat_history_str = self._chat_history_str(inputs)
+        if chat_history_str:
+            question = self.question_generator.run(
+                question=question,
+                chat_history=chat_history_str,
+                callbacks=run_manager.get_child(),
+            )
+        vector = self.answer_cache.embed(question)
+        cached = self.answer_cache.get(self.cache_namespace, vector)
+        if cached:
+            return self._cached_output(*cached)
+
+        # The question is already standalone, so it is not condensed again
+        output = super()._call(
+            {**inputs, "question": question, "chat_history": []}, run_manager
+        )
+        self.answer_cache.put(
+            self.cache_namespace,
+            vector,
+            question,
+            output[self.output_key],
+            output.get("source_documents", []),
+        )
+        return output
+
+    async def _acall(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        run_manager = run_manager or AsyncCallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        chat_history_str = self._chat_history_str(inputs)
+        if chat_history_str:
+            question = await self.question_generator.arun(
+                question=question,
+                chat_history=chat_history_str,
+                callbacks=run_manager.get_child(),
+            )
+        vector = await self.answer_cache.aembed(question)
+        cached = self.answer_cache.get(self.cache_namespace, vector)
+        if cached:
+            return self._cached_output(*cached)
+
+        # The question is already standalone, so it is not condensed again
+        output = await super()._acall(
+            {**inputs, "question": question, "chat_history": []}, run_manager
+        )
+        self.answer_cache.put(
+            self.cache_namespace,
+            vector,
+            question,
+            output[self.output_key],
+            output.get("source_documents", []),
+        )
+        return output
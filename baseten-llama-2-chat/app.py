@@ -1,12 +1,16 @@
 import chainlit as cl
-import requests
-import json
+import httpx
 
 import os
 
+from baseten_stream import MarkerMatcher, stream_text
+from token_buffer import TokenBuffer
+
 version_id = os.environ["VERSION_ID"]
 baseten_api_key = os.environ["BASETEN_API_KEY"]
 
+http_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+
 
 @cl.on_message
 async def main(message: cl.Message):
@@ -19,24 +23,18 @@ async def main(message: cl.Message):
         content="",
     )
 
-    s = requests.Session()
-    with s.post(
-        f"https://app.baseten.co/model_versions/{version_id}/predict",
-        headers={"Authorization": f"Api-Key {baseten_api_key}"},
-        data=json.dumps({"prompt": prompt, "stream": True, "max_new_tokens": 4096}),
-        stream=True,
-    ) as resp:
-        buffer = ""
-        start_response = False
-        for token in resp.iter_content(1):
-            token = token.decode("utf-8")
-            buffer += token
-            if not start_response:
-                if "[/INST]" in buffer:
-                    start_response = True
-            else:
+    # The model echoes the prompt back, the answer starts after "[/INST]"
+    matcher = MarkerMatcher("[/INST]")
+    async with TokenBuffer(ui_msg) as buffer:
+        async for text in stream_text(
+            http_client,
+            f"https://app.baseten.co/model_versions/{version_id}/predict",
+            baseten_api_key,
+            {"prompt": prompt, "stream": True, "max_new_tokens": 4096},
+        ):
+            if token := matcher.feed(text):
                 response += token
-                await ui_msg.stream_token(token)
+                await buffer.stream_token(token)
 
     await ui_msg.send()
     if not prompt_history:
@@ -0,0 +1,60 @@
+import codecs
+from typing import AsyncIterator
+
+import httpx
+
+
+async def stream_text(
+    client: httpx.AsyncClient, url: str, api_key: str, payload: dict
+) -> AsyncIterator[str]:
+    """Stream a Baseten model response as decoded text.
+
+    Bytes are read as large as the network delivers them rather than one at a
+    time, and decoded with an incremental UTF-8 decoder so multi-byte
+    characters split across reads come out whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async with client.stream(
+        "POST",
+        url,
+        headers={"Authorization": f"Api-Key {api_key}"},
+        json=payload,
+    ) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes():
+            if text := decoder.decode(chunk):
+                yield text
+
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
+
+class MarkerMatcher:
+    """Skip streamed text up to and including the first `marker`.
+
+    Only the last `len(marker) - 1` characters are carried between chunks, so
+    a marker split across chunks is still found without rescanning
+    everything received so far.
+    """
+
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.found = False
+        self._tail = ""
+
+    def feed(self, text: str) -> str:
+        """Return the part of `text` that comes after the marker."""
+        if self.found:
+            return text
+
+        window = self._tail + text
+        index = window.find(self.marker)
+        if index == -1:
+            keep = len(self.marker) - 1
+            self._tail = window[-keep:] if keep else ""
+            return ""
+
+        self.found = True
+        self._tail = ""
+        return window[index + len(self.marker) :]
@@ -0,0 +1,131 @@
+"""Benchmark the async Baseten stream against the previous one-byte reads.
+
+Starts a local stand-in for the Baseten predict endpoint that echoes the
+prompt, then streams tokens (including multi-byte UTF-8), and runs several
+concurrent sessions through each client. Reports decoded tokens/sec and the
+longest time the event loop was blocked:
+
+    python benchmark_stream.py --sessions 10 --tokens 2000
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from baseten_stream import MarkerMatcher, stream_text
+
+TOKEN = " héllo wörld ✓"
+
+
+def make_handler(tokens: int, tokens_per_flush: int):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def write_chunk(self, data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.write_chunk(b"[INST] prompt [/INST]")
+            for i in range(0, tokens, tokens_per_flush):
+                self.write_chunk((TOKEN * tokens_per_flush).encode("utf-8"))
+                time.sleep(0.001)
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+async def legacy_session(url: str) -> str:
+    # The previous implementation: a blocking client, one byte at a time
+    # (it used requests, httpx's sync client reads the same way).
+    response = ""
+    with httpx.stream(
+        "POST", url, json={"prompt": "prompt", "stream": True}, timeout=None
+    ) as resp:
+        buffer = ""
+        start_response = False
+        for token in resp.iter_bytes(1):
+            token = token.decode("utf-8", errors="replace")
+            buffer += token
+            if not start_response:
+                if "[/INST]" in buffer:
+                    start_response = True
+            else:
+                response += token
+    return response
+
+
+async def async_session(client: httpx.AsyncClient, url: str) -> str:
+    response = ""
+    matcher = MarkerMatcher("[/INST]")
+    async for text in stream_text(
+        client, url, "key", {"prompt": "prompt", "stream": True}
+    ):
+        response += matcher.feed(text)
+    return response
+
+
+async def measure(name: str, sessions, tokens: int):
+    max_lag = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal max_lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - start - 0.001)
+
+    monitor = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    results = await asyncio.gather(*sessions)
+    elapsed = time.perf_counter() - start
+    done = True
+    await monitor
+
+    expected = TOKEN * tokens
+    correct = sum(result == expected for result in results)
+    total_tokens = tokens * len(results)
+    print(
+        f"{name:>6}: {total_tokens / elapsed:10.0f} tokens/s, "
+        f"max loop stall {max_lag * 1000:7.1f} ms, "
+        f"{correct}/{len(results)} responses decoded correctly"
+    )
+
+
+async def main(args):
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(args.tokens, args.tokens_per_flush)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/predict"
+
+    await measure(
+        "legacy", [legacy_session(url) for _ in range(args.sessions)], args.tokens
+    )
+    async with httpx.AsyncClient(timeout=None) as client:
+        await measure(
+            "async",
+            [async_session(client, url) for _ in range(args.sessions)],
+            args.tokens,
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--tokens-per-flush", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
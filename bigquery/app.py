@@ -5,6 +5,8 @@ from google.cloud import bigquery
 
 import chainlit as cl
 
+from token_buffer import TokenBuffer
+
 # Set up BigQuery client
 client = bigquery.Client(location="EU")
 
@@ -50,10 +52,11 @@ async def gen_query(human_query: str):
     stream_resp = await openai_client.chat.completions.create(
         messages=messages, stream=True, **settings
     )
-    async for part in stream_resp:
-        token = part.choices[0].delta.content or ""
-        if token:
-            await current_step.stream_token(token)
+    async with TokenBuffer(current_step) as buffer:
+        async for part in stream_resp:
+            token = part.choices[0].delta.content or ""
+            if token:
+                await buffer.stream_token(token)
 
     current_step.language = "sql"
 
@@ -93,10 +96,11 @@ async def analyze(table):
     stream = await openai_client.chat.completions.create(
         messages=messages, stream=True, **settings
     )
-    async for part in stream:
-        token = part.choices[0].delta.content or ""
-        if token:
-            await final_answer.stream_token(token)
+    async with TokenBuffer(final_answer) as buffer:
+        async for part in stream:
+            token = part.choices[0].delta.content or ""
+            if token:
+                await buffer.stream_token(token)
 
     final_answer.actions = [
         cl.Action(name="take_action", payload={}, label="Take action")
@@ -1,61 +1,81 @@
-from typing import List
-from pathlib import Path
+import os
+import time
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema import StrOutputParser
-from langchain_community.document_loaders import (
-    PyMuPDFLoader,
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document, StrOutputParser
 from langchain.vectorstores.chroma import Chroma
-from langchain.indexes import SQLRecordManager, index
-from langchain.schema import Document
+from langchain.indexes import SQLRecordManager
 from langchain.schema.runnable import Runnable, RunnablePassthrough, RunnableConfig
 from langchain.callbacks.base import BaseCallbackHandler
 
 import chainlit as cl
 
+from cached_embeddings import CachedEmbeddings
+from hybrid_retriever import HybridRetriever
+from pdf_sync import PdfManifest, sync_pdfs
+from token_buffer import TokenBuffer
+
 
 chunk_size = 1024
 chunk_overlap = 50
 
-embeddings_model = OpenAIEmbeddings()
+# Chunks embedded by an earlier run are served from the on-disk cache
+embeddings_model = CachedEmbeddings(OpenAIEmbeddings())
 
 PDF_STORAGE_PATH = "./pdfs"
+# The collection, the record manager and the manifest are kept together, so
+# deleting this directory always triggers a full re-index
+CHROMA_PERSIST_DIR = "./chroma_db"
 
 
 def process_pdfs(pdf_storage_path: str):
-    pdf_directory = Path(pdf_storage_path)
-    docs = []  # type: List[Document]
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-
-    for pdf_path in pdf_directory.glob("*.pdf"):
-        loader = PyMuPDFLoader(str(pdf_path))
-        documents = loader.load()
-        docs += text_splitter.split_documents(documents)
+    start = time.perf_counter()
+    os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
 
-    doc_search = Chroma.from_documents(docs, embeddings_model)
+    doc_search = Chroma(
+        collection_name="my_documents",
+        embedding_function=embeddings_model,
+        persist_directory=CHROMA_PERSIST_DIR,
+    )
 
     namespace = "chromadb/my_documents"
     record_manager = SQLRecordManager(
-        namespace, db_url="sqlite:///record_manager_cache.sql"
+        namespace,
+        db_url=f"sqlite:///{CHROMA_PERSIST_DIR}/record_manager_cache.sql",
     )
     record_manager.create_schema()
 
-    index_result = index(
-        docs,
-        record_manager,
+    # Only new, changed and deleted PDFs are parsed and re-indexed
+    manifest = PdfManifest(os.path.join(CHROMA_PERSIST_DIR, "pdf_manifest.json"))
+    index_result = sync_pdfs(
+        pdf_storage_path,
         doc_search,
-        cleanup="incremental",
-        source_id_key="source",
+        record_manager,
+        manifest,
+        chunk_size=1000,
+        chunk_overlap=100,
     )
 
-    print(f"Indexing stats: {index_result}")
+    print(
+        f"Indexing stats: {index_result} "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
 
     return doc_search
 
 
+def get_hybrid_retriever(doc_search: Chroma) -> HybridRetriever:
+    # The BM25 index is rebuilt in memory from the chunks stored in Chroma
+    stored = doc_search.get(include=["documents", "metadatas"])
+    documents = [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(stored["documents"], stored["metadatas"])
+    ]
+    return HybridRetriever.from_vector_store(doc_search, documents)
+
+
 doc_search = process_pdfs(PDF_STORAGE_PATH)
+retriever = get_hybrid_retriever(doc_search)
 model = ChatOpenAI(model_name="gpt-4", streaming=True)
 
 
@@ -72,8 +92,6 @@ async def on_chat_start():
     def format_docs(docs):
         return "\n\n".join([d.page_content for d in docs])
 
-    retriever = doc_search.as_retriever()
-
     runnable = (
         {"context": retriever | format_docs, "question": RunnablePassthrough()}
         | prompt
@@ -114,12 +132,13 @@ async def on_message(message: cl.Message):
                     cl.Text(name="Sources", content=sources_text, display="inline")
                 )
 
-    async for chunk in runnable.astream(
-        message.content,
-        config=RunnableConfig(
-            callbacks=[cl.LangchainCallbackHandler(), PostMessageHandler(msg)]
-        ),
-    ):
-        await msg.stream_token(chunk)
+    async with TokenBuffer(msg) as buffer:
+        async for chunk in runnable.astream(
+            message.content,
+            config=RunnableConfig(
+                callbacks=[cl.LangchainCallbackHandler(), PostMessageHandler(msg)]
+            ),
+        ):
+            await buffer.stream_token(chunk)
 
     await msg.send()
@@ -0,0 +1,71 @@
+"""Measure startup indexing time on an unchanged corpus.
+
+Generates a corpus of text PDFs (about 10k chunks by default), indexes it
+once into a persistent Chroma collection, then times `sync_pdfs` the way a
+restart runs it: with fresh Chroma, record manager and manifest objects
+over the same directory. A change and a deletion are timed as well.
+Embeddings are faked, so no API key is needed:
+
+    python benchmark_cold_start.py --pdfs 250 --pages 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from langchain.indexes import SQLRecordManager
+from langchain.vectorstores.chroma import Chroma
+from langchain_community.embeddings import FakeEmbeddings
+
+from benchmark_pdf_pipeline import make_corpus
+from pdf_sync import PdfManifest, sync_pdfs
+
+
+def startup(pdf_dir: str, persist_dir: str):
+    start = time.perf_counter()
+    doc_search = Chroma(
+        collection_name="my_documents",
+        embedding_function=FakeEmbeddings(size=256),
+        persist_directory=persist_dir,
+    )
+    record_manager = SQLRecordManager(
+        "chromadb/my_documents",
+        db_url=f"sqlite:///{persist_dir}/record_manager_cache.sql",
+    )
+    record_manager.create_schema()
+    manifest = PdfManifest(os.path.join(persist_dir, "pdf_manifest.json"))
+    result = sync_pdfs(pdf_dir, doc_search, record_manager, manifest)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", type=int, default=250)
+    parser.add_argument("--pages", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_dir = Path(tmp) / "pdfs"
+        persist_dir = Path(tmp) / "chroma_db"
+        pdf_dir.mkdir()
+        persist_dir.mkdir()
+        make_corpus(pdf_dir, args.pdfs, args.pages)
+
+        elapsed, result = startup(str(pdf_dir), str(persist_dir))
+        print(f"first start     {elapsed:7.2f}s  {result}")
+
+        elapsed, result = startup(str(pdf_dir), str(persist_dir))
+        print(f"unchanged       {elapsed:7.2f}s  {result}")
+
+        pdfs = sorted(pdf_dir.glob("*.pdf"))
+        make_corpus(Path(tmp), 1, args.pages + 1)
+        os.replace(Path(tmp) / "doc-0000.pdf", pdfs[0])
+        pdfs[1].unlink()
+        elapsed, result = startup(str(pdf_dir), str(persist_dir))
+        print(f"1 changed, 1 deleted {elapsed:7.2f}s  {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Compare BM25, dense and hybrid retrieval on the seven-wonders dataset.
+
+Loads the `bilgeyucel/seven-wonders` documents used by the haystack demo,
+indexes them in an in-memory Chroma collection and a BM25 index, and asks a
+fixed set of questions about each wonder. A retrieved chunk counts as
+relevant when it comes from the right Wikipedia page and contains the
+answer term. Reports hit rate and MRR at k and per-query latency for each
+retriever, and the per-stage latencies of the hybrid retriever. Needs
+`OPENAI_API_KEY` and the `datasets` package; embeddings go through the
+on-disk cache, so only the first run pays for them:
+
+    python benchmark_hybrid_retrieval.py --k 4
+"""
+
+import argparse
+import time
+
+from datasets import load_dataset
+from langchain.schema import Document
+from langchain.vectorstores.chroma import Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from cached_embeddings import CachedEmbeddings
+from hybrid_retriever import BM25Index, HybridRetriever
+
+# (question, Wikipedia page, answer term)
+QUESTIONS = [
+    ("How tall was the Colossus of Rhodes?", "Colossus_of_Rhodes", "cubits"),
+    ("What destroyed the Colossus of Rhodes?", "Colossus_of_Rhodes", "earthquake"),
+    ("Who built the Colossus?", "Colossus_of_Rhodes", "Chares"),
+    ("Who sculpted the Statue of Zeus at Olympia?", "Statue_of_Zeus", "Phidias"),
+    ("What was the statue of Zeus made of?", "Statue_of_Zeus", "ivory"),
+    ("Where was the Statue of Zeus housed?", "Statue_of_Zeus", "temple"),
+    ("Which pharaoh was the Great Pyramid built for?", "Great_Pyramid", "Khufu"),
+    ("When was the Great Pyramid of Giza built?", "Great_Pyramid", "2560"),
+    ("What is the King's Chamber lined with?", "Great_Pyramid", "granite"),
+    ("Who was buried in the Mausoleum at Halicarnassus?", "Mausoleum", "Mausolus"),
+    ("Who designed the Mausoleum at Halicarnassus?", "Mausoleum", "Satyros"),
+    ("How was the Mausoleum destroyed?", "Mausoleum", "earthquake"),
+    ("Who set fire to the Temple of Artemis?", "Temple_of_Artemis", "Herostratus"),
+    ("In which city stood the Temple of Artemis?", "Temple_of_Artemis", "Ephesus"),
+    ("Who raided the Temple of Artemis?", "Temple_of_Artemis", "Goths"),
+    ("Who designed the Lighthouse of Alexandria?", "Lighthouse_of_Alexandria", "Sostratus"),
+    ("On which island was the Alexandria lighthouse built?", "Lighthouse_of_Alexandria", "Pharos"),
+    ("What happened to the Lighthouse of Alexandria?", "Lighthouse_of_Alexandria", "earthquake"),
+    ("Who built the Hanging Gardens of Babylon?", "Hanging_Gardens", "Nebuchadnezzar"),
+    ("Did the Hanging Gardens really exist?", "Hanging_Gardens", "exist"),
+    ("Where else might the Hanging Gardens have been?", "Hanging_Gardens", "Nineveh"),
+]
+
+
+def load_documents():
+    dataset = load_dataset("bilgeyucel/seven-wonders", split="train")
+    return [
+        Document(
+            page_content=row["content"],
+            metadata={"source": row["meta"].get("url", "")},
+        )
+        for row in dataset
+    ]
+
+
+def is_relevant(document: Document, page: str, term: str) -> bool:
+    return (
+        page in document.metadata["source"]
+        and term.lower() in document.page_content.lower()
+    )
+
+
+def evaluate(retriever, k: int):
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    for question, page, term in QUESTIONS:
+        start = time.perf_counter()
+        documents = retriever.invoke(question)[:k]
+        latencies.append(time.perf_counter() - start)
+        for rank, document in enumerate(documents, start=1):
+            if is_relevant(document, page, term):
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+    latencies.sort()
+    return (
+        hits / len(QUESTIONS),
+        reciprocal_ranks / len(QUESTIONS),
+        1000 * latencies[len(latencies) // 2],
+        1000 * latencies[int(0.95 * (len(latencies) - 1))],
+    )
+
+
+class BM25Retriever:
+    def __init__(self, bm25: BM25Index, k: int):
+        self.bm25, self.k = bm25, k
+
+    def invoke(self, query: str):
+        return [document for document, _ in self.bm25.search(query, self.k)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    args = parser.parse_args()
+
+    documents = load_documents()
+    print(f"{len(documents)} documents, {len(QUESTIONS)} questions")
+    vector_store = Chroma.from_documents(
+        documents,
+        CachedEmbeddings(OpenAIEmbeddings()),
+        collection_name="seven_wonders_benchmark",
+    )
+    hybrid = HybridRetriever.from_vector_store(
+        vector_store, documents, fetch_k=args.fetch_k, k=args.k
+    )
+
+    retrievers = {
+        "bm25": BM25Retriever(hybrid.bm25, args.k),
+        "dense": vector_store.as_retriever(search_kwargs={"k": args.k}),
+        "hybrid": hybrid,
+    }
+    print(f"{'retriever':10} {f'hit@{args.k}':>7} {f'mrr@{args.k}':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, retriever in retrievers.items():
+        hit_rate, mrr, p50, p95 = evaluate(retriever, args.k)
+        print(f"{name:10} {hit_rate:7.3f} {mrr:7.3f} {p50:8.1f} {p95:8.1f}")
+
+    print("hybrid stages:")
+    for stage, summary in hybrid.stats().items():
+        print(f"  {stage:8} {summary}")
+
+
+if __name__ == "__main__":
+    main()
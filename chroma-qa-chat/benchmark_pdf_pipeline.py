@@ -0,0 +1,86 @@
+"""Compare serial PDF loading and splitting with the process-pool pipeline.
+
+Generates a synthetic corpus of text PDFs, then times the previous serial
+`PyMuPDFLoader` + `RecursiveCharacterTextSplitter` loop against
+`iter_pdf_chunks` with an increasing number of workers. No API key is needed:
+
+    python benchmark_pdf_pipeline.py --pdfs 1000 --pages 8
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import pymupdf
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyMuPDFLoader
+
+from pdf_pipeline import iter_pdf_chunks
+
+WORDS = (
+    "attention transformer encoder decoder layer token embedding sequence "
+    "model training gradient softmax query key value head position"
+).split()
+
+
+def make_corpus(directory: Path, pdfs: int, pages: int):
+    rng = random.Random(0)
+    for i in range(pdfs):
+        pdf = pymupdf.open()
+        for _ in range(pages):
+            page = pdf.new_page()
+            text = "\n".join(
+                " ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(45)
+            )
+            page.insert_text((36, 36), text, fontsize=8)
+        pdf.save(directory / f"doc-{i:04}.pdf")
+        pdf.close()
+
+
+def serial(paths):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    docs = []
+    for path in paths:
+        docs += text_splitter.split_documents(PyMuPDFLoader(str(path)).load())
+    return len(docs)
+
+
+def pipeline(paths, workers):
+    return sum(len(chunks) for chunks in iter_pdf_chunks(paths, workers=workers))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Generating {args.pdfs} PDFs of {args.pages} pages...")
+        make_corpus(Path(tmp), args.pdfs, args.pages)
+        paths = sorted(Path(tmp).glob("*.pdf"))
+
+        start = time.perf_counter()
+        chunks = serial(paths)
+        baseline = time.perf_counter() - start
+        print(f"serial         {baseline:7.2f}s  {chunks} chunks")
+
+        workers = 1
+        while True:
+            start = time.perf_counter()
+            chunks = pipeline(paths, workers)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{workers:2} worker(s)   {elapsed:7.2f}s  {chunks} chunks  "
+                f"x{baseline / elapsed:.1f}"
+            )
+            if workers >= (os.cpu_count() or 1):
+                break
+            workers = min(workers * 2, os.cpu_count())
+
+
+if __name__ == "__main__":
+    main()
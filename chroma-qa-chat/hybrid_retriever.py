@@ -0,0 +1,247 @@
+import asyncio
+import math
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain.schema import BaseRetriever, Document
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have he her his i in is it its of on "
+    "or she that the their them they this to was were what when where which who "
+    "why will with you your how did does do".split()
+)
+
+# Stages run in these threads for synchronous callers
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-retriever")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index scored with Okapi BM25.
+
+    Postings are kept per term as arrays of (document, term frequency), so a
+    query only touches the documents that contain one of its terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Document] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add_documents(self, documents: Iterable[Document]):
+        for document in documents:
+            doc_id = len(self.documents)
+            terms = Counter(tokenize(document.page_content))
+            self.documents.append(document)
+            self._lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                ids, frequencies = self._postings.setdefault(term, ([], []))
+                ids.append(doc_id)
+                frequencies.append(frequency)
+        # Arrays and length norms are rebuilt on the next search
+        self._arrays = {}
+        self._norms = None
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        if not self.documents:
+            return []
+        if self._norms is None:
+            lengths = np.asarray(self._lengths, dtype=np.float32)
+            average = lengths.mean() or 1.0
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / average)
+
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        n = len(self.documents)
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            if term not in self._arrays:
+                ids, frequencies = self._postings[term]
+                self._arrays[term] = (
+                    np.asarray(ids),
+                    np.asarray(frequencies, dtype=np.float32),
+                )
+            ids, frequencies = self._arrays[term]
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += (
+                idf * frequencies * (self.k1 + 1) / (frequencies + self._norms[ids])
+            )
+
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+
+class LatencyStats:
+    """Latencies of one retrieval stage, over the last `window` calls."""
+
+    def __init__(self, window: int = 256):
+        self.calls = 0
+        self.misses = 0
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float, missed: bool = False):
+        self.calls += 1
+        if missed:
+            self.misses += 1
+        self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"calls": self.calls, "misses": self.misses}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "calls": self.calls,
+            "misses": self.misses,
+            "p50_ms": round(percentile(0.5) * 1000, 1),
+            "p95_ms": round(percentile(0.95) * 1000, 1),
+            "max_ms": round(samples[-1] * 1000, 1),
+        }
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], k: int, rrf_k: int = 60
+) -> List[Document]:
+    """Fuse rankings by summing 1 / (rrf_k + rank) per document."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            # Chunks are identified by their text, so both retrievers agree
+            key = document.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """Runs BM25 and dense retrieval concurrently and fuses them with RRF.
+
+    Each stage has its own latency budget in seconds. A stage that misses
+    its budget is left out of the fusion, so a slow vector service degrades
+    the answer to keyword search instead of stalling it. Per-stage latencies
+    and misses are available from `stats()`.
+    """
+
+    dense: BaseRetriever
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    sparse_budget: float = 0.5
+    dense_budget: float = 3.0
+    latency: Dict[str, LatencyStats] = {}
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = {
+            stage: LatencyStats() for stage in ("sparse", "dense", "total")
+        }
+
+    @classmethod
+    def from_vector_store(
+        cls, vector_store, documents: Iterable[Document], fetch_k: int = 20, **kwargs
+    ) -> "HybridRetriever":
+        """Pair `vector_store` with a BM25 index over the same `documents`."""
+        bm25 = BM25Index()
+        bm25.add_documents(documents)
+        dense = vector_store.as_retriever(search_kwargs={"k": fetch_k})
+        return cls(dense=dense, bm25=bm25, fetch_k=fetch_k, **kwargs)
+
+    def stats(self) -> dict:
+        return {stage: stats.summary() for stage, stats in self.latency.items()}
+
+    def _sparse(self, query: str) -> List[Document]:
+        return [document for document, _ in self.bm25.search(query, self.fetch_k)]
+
+    def _dense(self, query: str, callbacks) -> List[Document]:
+        return self.dense.invoke(query, config={"callbacks": callbacks})
+
+    def _fuse(self, rankings: List[Optional[List[Document]]]) -> List[Document]:
+        rankings = [ranking for ranking in rankings if ranking is not None]
+        return reciprocal_rank_fusion(rankings, self.k, self.rrf_k)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        start = time.perf_counter()
+        sparse = _executor.submit(_timed, self._sparse, query)
+        dense = _executor.submit(_timed, self._dense, query, run_manager.get_child())
+
+        rankings = []
+        for stage, budget, future in (
+            ("sparse", self.sparse_budget, sparse),
+            ("dense", self.dense_budget, dense),
+        ):
+            remaining = budget - (time.perf_counter() - start)
+            try:
+                ranking, seconds = future.result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                self.latency[stage].record(budget, missed=True)
+                ranking = None
+            else:
+                self.latency[stage].record(seconds)
+            rankings.append(ranking)
+
+        documents = self._fuse(rankings)
+        self.latency["total"].record(time.perf_counter() - start)
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        start = time.perf_counter()
+        callbacks = run_manager.get_child()
+
+        async def sparse():
+            return await asyncio.to_thread(self._sparse, query)
+
+        async def dense():
+            return await self.dense.ainvoke(query, config={"callbacks": callbacks})
+
+        async def run(stage: str, coro, budget: float):
+            stage_start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(coro, budget)
+            except asyncio.TimeoutError:
+                self.latency[stage].record(budget, missed=True)
+                return None
+            self.latency[stage].record(time.perf_counter() - stage_start)
+            return result
+
+        rankings = await asyncio.gather(
+            run("sparse", sparse(), self.sparse_budget),
+            run("dense", dense(), self.dense_budget),
+        )
+        documents = self._fuse(rankings)
+        self.latency["total"].record(time.perf_counter() - start)
+        return documents
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from langchain.indexes import index
+
+from pdf_pipeline import iter_pdf_chunks
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PdfManifest:
+    """
+    The size, mtime and content hash of every PDF that was last indexed.
+
+    A file whose size and mtime are unchanged is trusted without reading it.
+    Otherwise it is hashed, so a file that was only touched or copied over
+    with the same content is not re-indexed either.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.entries: Dict[str, dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def diff(self, pdf_paths: List[Path]):
+        """Return (changed, deleted) sources and the entries to save once synced."""
+        entries = {}
+        changed = []
+        for pdf_path in pdf_paths:
+            source = str(pdf_path)
+            stat = pdf_path.stat()
+            known = self.entries.get(source)
+            if (
+                known is not None
+                and known["size"] == stat.st_size
+                and known["mtime_ns"] == stat.st_mtime_ns
+            ):
+                entries[source] = known
+                continue
+
+            sha256 = file_hash(pdf_path)
+            entries[source] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+            }
+            if known is None or known["sha256"] != sha256:
+                changed.append(source)
+
+        deleted = [source for source in self.entries if source not in entries]
+        return changed, deleted, entries
+
+    def save(self, entries: Dict[str, dict]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+        self.entries = entries
+
+
+def sync_pdfs(
+    pdf_directory: str,
+    vector_store,
+    record_manager,
+    manifest: PdfManifest,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+) -> dict:
+    """
+    Bring `vector_store` in line with the PDFs in `pdf_directory`.
+
+    Only new and changed PDFs are parsed, and the record manager only embeds
+    chunks it has not indexed before. Chunks of changed PDFs that no longer
+    exist are removed by the incremental cleanup, and all chunks of deleted
+    PDFs are removed by source.
+    """
+    pdf_paths = sorted(Path(pdf_directory).glob("*.pdf"))
+    changed, deleted, entries = manifest.diff(pdf_paths)
+
+    result = {"num_added": 0, "num_updated": 0, "num_skipped": 0, "num_deleted": 0}
+    if changed:
+        chunks = (
+            chunk
+            for batch in iter_pdf_chunks(
+                changed, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            )
+            for chunk in batch
+        )
+        result = index(
+            chunks,
+            record_manager,
+            vector_store,
+            cleanup="incremental",
+            source_id_key="source",
+        )
+
+    for source in deleted:
+        keys = record_manager.list_keys(group_ids=[source])
+        if keys:
+            vector_store.delete(keys)
+            record_manager.delete_keys(keys)
+            result["num_deleted"] += len(keys)
+
+    # Only remember the files once their chunks are safely indexed
+    manifest.save(entries)
+    return {
+        **result,
+        "changed_files": len(changed),
+        "deleted_files": len(deleted),
+        "unchanged_files": len(pdf_paths) - len(changed),
+    }
@@ -4,6 +4,8 @@ from openai import AsyncOpenAI
 
 import chainlit as cl
 
+from token_buffer import TokenBuffer
+
 client = AsyncOpenAI(
     api_key=os.getenv("DEEP_SEEK_API_KEY"), base_url="https://api.deepseek.com"
 )
@@ -26,25 +28,28 @@ async def on_message(msg: cl.Message):
 
     # Streaming the thinking
     async with cl.Step(name="Thinking") as thinking_step:
-        async for chunk in stream:
-            delta = chunk.choices[0].delta
-            reasoning_content = getattr(delta, "reasoning_content", None)
-            if reasoning_content is not None and not thinking_completed:
-                await thinking_step.stream_token(reasoning_content)
-            elif not thinking_completed:
-                # Exit the thinking step
-                thought_for = round(time.time() - start)
-                thinking_step.name = f"Thought for {thought_for}s"
-                await thinking_step.update()
-                thinking_completed = True
-                break
+        async with TokenBuffer(thinking_step) as thinking_buffer:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta
+                reasoning_content = getattr(delta, "reasoning_content", None)
+                if reasoning_content is not None and not thinking_completed:
+                    await thinking_buffer.stream_token(reasoning_content)
+                elif not thinking_completed:
+                    # Exit the thinking step
+                    await thinking_buffer.flush()
+                    thought_for = round(time.time() - start)
+                    thinking_step.name = f"Thought for {thought_for}s"
+                    await thinking_step.update()
+                    thinking_completed = True
+                    break
 
     final_answer = cl.Message(content="")
 
     # Streaming the final answer
-    async for chunk in stream:
-        delta = chunk.choices[0].delta
-        if delta.content:
-            await final_answer.stream_token(delta.content)
+    async with TokenBuffer(final_answer) as buffer:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta
+            if delta.content:
+                await buffer.stream_token(delta.content)
 
     await final_answer.send()
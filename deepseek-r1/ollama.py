@@ -3,6 +3,9 @@ from openai import AsyncOpenAI
 
 import chainlit as cl
 
+from tag_stream import TagStreamParser
+from token_buffer import TokenBuffer
+
 client = AsyncOpenAI(api_key="ollama", base_url="http://localhost:11434/v1/")
 
 
@@ -18,29 +21,29 @@ async def on_message(msg: cl.Message):
         stream=True,
     )
 
-    thinking = False
+    parser = TagStreamParser(["think"])
 
     # Streaming the thinking
     async with cl.Step(name="Thinking") as thinking_step:
         final_answer = cl.Message(content="")
-
-        async for chunk in stream:
-            delta = chunk.choices[0].delta
-
-            if delta.content == "<think>":
-                thinking = True
-                continue
-
-            if delta.content == "</think>":
-                thinking = False
-                thought_for = round(time.time() - start)
-                thinking_step.name = f"Thought for {thought_for}s"
-                await thinking_step.update()
-                continue
-
-            if thinking:
-                await thinking_step.stream_token(delta.content)
-            else:
-                await final_answer.stream_token(delta.content)
+        thinking_buffer = TokenBuffer(thinking_step)
+        answer_buffer = TokenBuffer(final_answer)
+
+        async def route(events):
+            for kind, tag, text in events:
+                if kind == "close":
+                    await thinking_buffer.flush()
+                    thought_for = round(time.time() - start)
+                    thinking_step.name = f"Thought for {thought_for}s"
+                    await thinking_step.update()
+                elif kind == "text" and tag == "think":
+                    await thinking_buffer.stream_token(text)
+                elif kind == "text":
+                    await answer_buffer.stream_token(text)
+
+        async with thinking_buffer, answer_buffer:
+            async for chunk in stream:
+                await route(parser.feed(chunk.choices[0].delta.content or ""))
+            await route(parser.close())
 
     await final_answer.send()
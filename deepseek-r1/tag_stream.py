@@ -0,0 +1,87 @@
+from typing import Iterable, List, Optional, Tuple
+
+# (kind, tag, text) where kind is "open", "close" or "text". `tag` is the
+# innermost open tag, or None for text outside of any tag.
+Event = Tuple[str, Optional[str], str]
+
+
+class TagStreamParser:
+    """Incrementally split a streamed model answer on known XML-like tags.
+
+    Tags such as `<thinking>` or `</output>` may be split across any number of
+    chunks. Only a possible partial tag at the very end of a chunk is held
+    back, so each `feed` costs time proportional to the chunk, not to
+    everything received so far. Unknown tags and stray `<` are passed through
+    as text. Tags nest, e.g. `<reflection>` inside `<thinking>`.
+    """
+
+    def __init__(self, tags: Iterable[str]):
+        self._markers = {}
+        for tag in tags:
+            self._markers[f"<{tag}>"] = ("open", tag)
+            self._markers[f"</{tag}>"] = ("close", tag)
+        self._max_len = max(len(marker) for marker in self._markers)
+        self._pending = ""
+        self.stack: List[str] = []
+
+    @property
+    def current(self) -> Optional[str]:
+        return self.stack[-1] if self.stack else None
+
+    def feed(self, text: str) -> List[Event]:
+        buf = self._pending + text
+        self._pending = ""
+        events: List[Event] = []
+        start = 0
+        i = buf.find("<")
+
+        while i != -1:
+            marker = self._match(buf, i)
+            if marker is not None:
+                self._text(events, buf[start:i])
+                kind, tag = self._markers[marker]
+                if kind == "open":
+                    self.stack.append(tag)
+                    events.append(("open", tag, ""))
+                elif tag in self.stack:
+                    while self.stack.pop() != tag:
+                        pass
+                    events.append(("close", tag, ""))
+                else:
+                    # A closing tag that was never opened is just text.
+                    self._text(events, marker)
+                start = i + len(marker)
+                i = buf.find("<", start)
+                continue
+
+            tail = buf[i:]
+            if len(tail) < self._max_len and any(
+                marker.startswith(tail) for marker in self._markers
+            ):
+                # Possibly the start of a tag cut off at the end of the chunk.
+                self._text(events, buf[start:i])
+                self._pending = tail
+                return events
+
+            i = buf.find("<", i + 1)
+
+        self._text(events, buf[start:])
+        return events
+
+    def close(self) -> List[Event]:
+        """Flush anything held back once the stream has ended."""
+        events: List[Event] = []
+        self._text(events, self._pending)
+        self._pending = ""
+        return events
+
+    def _match(self, buf: str, i: int) -> Optional[str]:
+        end = buf.find(">", i, i + self._max_len)
+        if end == -1:
+            return None
+        candidate = buf[i : end + 1]
+        return candidate if candidate in self._markers else None
+
+    def _text(self, events: List[Event], text: str):
+        if text:
+            events.append(("text", self.current, text))
@@ -0,0 +1,149 @@
+"""Show that concurrent sessions no longer serialize on the Anthropic stream.
+
+Starts a local stand-in for the Anthropic Messages API that streams a
+thinking block followed by a text block, then runs several sessions at once
+on one event loop: first with the synchronous client (the previous
+implementation) and then with `AsyncAnthropic`, consuming the stream the same
+way `app.py` does. No API key is needed:
+
+    python load_test.py --sessions 10
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anthropic import Anthropic, AsyncAnthropic
+
+
+def make_handler(deltas: int, delay: float):
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+    def events():
+        yield event(
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "id": "msg_local",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": "stand-in",
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": 1, "output_tokens": 1},
+                },
+            },
+        )
+        blocks = [
+            ({"type": "thinking", "thinking": "", "signature": ""}, "thinking_delta", "thinking"),
+            ({"type": "text", "text": ""}, "text_delta", "text"),
+        ]
+        for index, (block, delta_type, field) in enumerate(blocks):
+            yield event(
+                "content_block_start",
+                {"type": "content_block_start", "index": index, "content_block": block},
+            )
+            for i in range(deltas):
+                yield event(
+                    "content_block_delta",
+                    {
+                        "type": "content_block_delta",
+                        "index": index,
+                        "delta": {"type": delta_type, field: f" {field}{i}"},
+                    },
+                )
+            yield event("content_block_stop", {"type": "content_block_stop", "index": index})
+        yield event(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": 2 * deltas},
+            },
+        )
+        yield event("message_stop", {"type": "message_stop"})
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for data in events():
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+REQUEST = dict(
+    model="stand-in",
+    max_tokens=64000,
+    thinking={"type": "enabled", "budget_tokens": 20000},
+    messages=[{"role": "user", "content": "hi"}],
+    stream=True,
+)
+
+
+async def sync_session(client: Anthropic):
+    # The previous implementation: a blocking iterator inside a coroutine.
+    answer = ""
+    for chunk in client.messages.create(**REQUEST):
+        if chunk.type == "content_block_delta" and chunk.delta.type == "text_delta":
+            answer += chunk.delta.text
+    return answer
+
+
+async def async_session(client: AsyncAnthropic):
+    answer = ""
+    stream = await client.messages.create(**REQUEST)
+    async for chunk in stream:
+        if chunk.type == "content_block_start" and chunk.content_block.type == "text":
+            break
+    async for chunk in stream:
+        if chunk.type == "content_block_delta" and chunk.delta.type == "text_delta":
+            answer += chunk.delta.text
+    return answer
+
+
+async def measure(name, sessions):
+    start = time.perf_counter()
+    await asyncio.gather(*sessions)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>5}: {len(sessions)} concurrent sessions in {elapsed:6.2f}s")
+
+
+async def main(args):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.deltas, args.delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    sync_client = Anthropic(api_key="local", base_url=base_url)
+    await measure("sync", [sync_session(sync_client) for _ in range(args.sessions)])
+
+    async_client = AsyncAnthropic(api_key="local", base_url=base_url)
+    await measure("async", [async_session(async_client) for _ in range(args.sessions)])
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--deltas", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.002)
+    asyncio.run(main(parser.parse_args()))
@@ -1,5 +1,6 @@
-from llama_index.core import StorageContext, ServiceContext, load_index_from_storage
+from llama_index.core import ServiceContext, Settings
 from llama_index.core.callbacks.base import CallbackManager
+from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.llms.groq import Groq
 import os
@@ -8,45 +9,67 @@ from dotenv import load_dotenv
 load_dotenv()
 import chainlit as cl
 
+from index_refresh import IndexRefresher
+from token_buffer import TokenBuffer
+
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-try:
-    # rebuild storage context
-    storage_context = StorageContext.from_defaults(persist_dir="./storage_mini")
-    # load index
-    index = load_index_from_storage(storage_context)
-except:
-    documents = SimpleDirectoryReader("./data").load_data(show_progress=True)
-    index = VectorStoreIndex.from_documents(documents)
-    index.storage_context.persist(persist_dir="./storage_mini")
+# Documents are embedded with the same model that embeds the questions
+Settings.embed_model = HuggingFaceEmbedding(
+    model_name="sentence-transformers/all-MiniLM-L6-v2"
+)
 
+# Added, modified and deleted files in ./data are picked up in the
+# background and swapped in as a new index generation
+refresher = IndexRefresher(
+    "./data",
+    "./storage_mini",
+    interval=float(os.getenv("INDEX_REFRESH_INTERVAL", "30")),
+)
+refresher.load()
+refresher.start()
 
-@cl.on_chat_start
-async def factory():
-    embed_model = HuggingFaceEmbedding(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
 
-    llm = Groq(model="llama3-70b-8192", api_key=GROQ_API_KEY)
+def get_chat_engine():
+    """Return the session's chat engine, rebuilt after an index refresh."""
+    # Read the generation first, a swap in between only causes another rebuild
+    generation = refresher.generation
+    if cl.user_session.get("generation") != generation:
+        llm = Groq(model="llama3-70b-8192", api_key=GROQ_API_KEY)
+
+        service_context = ServiceContext.from_defaults(
+            embed_model=Settings.embed_model,
+            llm=llm,
+            callback_manager=CallbackManager([cl.LlamaIndexCallbackHandler()]),
+        )
+        # The conversation carries over to the refreshed index
+        chat_engine = refresher.index.as_chat_engine(
+            service_context=service_context,
+            memory=cl.user_session.get("memory"),
+        )
+        cl.user_session.set("chat_engine", chat_engine)
+        cl.user_session.set("generation", generation)
+    return cl.user_session.get("chat_engine")
 
-    service_context = ServiceContext.from_defaults(
-        embed_model=embed_model,
-        llm=llm,
-        callback_manager=CallbackManager([cl.LlamaIndexCallbackHandler()]),
-    )
-    chat_engine = index.as_chat_engine(service_context=service_context)
 
-    cl.user_session.set("chat_engine", chat_engine)
+@cl.on_chat_start
+async def factory():
+    cl.user_session.set("memory", ChatMemoryBuffer.from_defaults())
+    get_chat_engine()
 
 
 @cl.on_message
 async def main(message: cl.Message):
-    chat_engine = cl.user_session.get("chat_engine")
-    response = await cl.make_async(chat_engine.chat)(message.content)
-
+    chat_engine = get_chat_engine()
     response_message = cl.Message(content="", author="Assistant")
 
-    for token in response.response:
-        await response_message.stream_token(token=token)
+    # Tokens are streamed as Groq produces them, and waiting on the network
+    # does not hold the event loop of the other chats. Retrieval and LLM calls
+    # show up as steps through the callback handler.
+    response = await chat_engine.astream_chat(message.content)
+
+    async with TokenBuffer(response_message) as buffer:
+        async for token in response.async_response_gen():
+            await buffer.stream_token(token)
 
     await response_message.send()
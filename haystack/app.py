@@ -5,8 +5,13 @@ from haystack.agents.base import Tool
 from haystack.agents.conversational import ConversationalAgent
 from haystack.agents.memory import ConversationSummaryMemory
 from haystack.document_stores import InMemoryDocumentStore
-from haystack.nodes import BM25Retriever, PromptNode
-from haystack.pipelines import DocumentSearchPipeline
+from haystack.nodes import (
+    BM25Retriever,
+    EmbeddingRetriever,
+    JoinDocuments,
+    PromptNode,
+)
+from haystack.pipelines import Pipeline
 
 import chainlit as cl
 
@@ -17,19 +22,36 @@ if not openai_api_key:
 
 
 @cl.cache
-def get_retriever():
-    document_store = InMemoryDocumentStore(use_bm25=True)
+def get_search_pipeline():
+    document_store = InMemoryDocumentStore(use_bm25=True, embedding_dim=384)
 
     dataset = load_dataset("bilgeyucel/seven-wonders", split="train")
     document_store.write_documents(dataset)
 
-    return BM25Retriever(document_store)
+    bm25_retriever = BM25Retriever(document_store, top_k=20)
+    embedding_retriever = EmbeddingRetriever(
+        document_store,
+        embedding_model="sentence-transformers/all-MiniLM-L6-v2",
+        top_k=20,
+    )
+    document_store.update_embeddings(embedding_retriever)
 
+    # Keyword and embedding results are fused by reciprocal rank
+    pipeline = Pipeline()
+    pipeline.add_node(bm25_retriever, name="BM25Retriever", inputs=["Query"])
+    pipeline.add_node(
+        embedding_retriever, name="EmbeddingRetriever", inputs=["Query"]
+    )
+    pipeline.add_node(
+        JoinDocuments(join_mode="reciprocal_rank_fusion", top_k_join=5),
+        name="JoinDocuments",
+        inputs=["BM25Retriever", "EmbeddingRetriever"],
+    )
+    return pipeline
 
-@cl.cache
-def get_agent(retriever):
-    pipeline = DocumentSearchPipeline(retriever)
 
+@cl.cache
+def get_agent(pipeline):
     search_tool = Tool(
         name="seven_wonders_search",
         pipeline_or_node=pipeline,
@@ -83,8 +105,8 @@ Thought:
     )
 
 
-retriever = get_retriever()
-agent = get_agent(retriever)
+pipeline = get_search_pipeline()
+agent = get_agent(pipeline)
 cl.HaystackAgentCallbackHandler(agent)
 
 
@@ -14,6 +14,7 @@ from tools.web_search import web_search
 from tools.uploaded_files_search import uploaded_files_search
 
 from services.azure_services import AzureServices
+from token_buffer import TokenBuffer
 
 from chainlit.types import ThreadDict
 import chainlit as cl
@@ -59,14 +60,17 @@ class StreamHandler(BaseCallbackHandler):
 
     Attributes:
         msg (cl.Message): The message object used for streaming the response.
+        buffer (TokenBuffer): Coalesces the tokens streamed to `msg`.
 
     Methods:
         on_llm_new_token: Called when a new token is received from the language model.
         on_llm_end: Called when the streaming response from the language model ends.
+        on_llm_error: Called when the language model fails mid-stream.
     """
 
     def __init__(self):
         self.msg = None
+        self.buffer = None
 
     async def on_llm_new_token(self, token: str, **kwargs):
         if not token:
@@ -74,13 +78,23 @@ class StreamHandler(BaseCallbackHandler):
 
         if self.msg is None:
             self.msg = cl.Message(content="", author="Assistant")
+            self.buffer = TokenBuffer(self.msg)
 
-        await self.msg.stream_token(token)
+        await self.buffer.stream_token(token)
 
     async def on_llm_end(self, response: str, **kwargs):
         if self.msg:
+            await self.buffer.flush()
             await self.msg.send()
         self.msg = None
+        self.buffer = None
+
+    async def on_llm_error(self, error: BaseException, **kwargs):
+        # Show what was streamed before the failure
+        if self.msg:
+            await self.buffer.flush()
+        self.msg = None
+        self.buffer = None
 
 
 # Function to setup the runnable environment for the chat application
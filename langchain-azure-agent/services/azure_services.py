@@ -8,6 +8,9 @@ from azure.search.documents.indexes.models import (
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain_community.vectorstores.azuresearch import AzureSearch
 
+from services.cached_embeddings import CachedEmbeddings
+from services.local_vector_store import LocalVectorStore
+
 
 class AzureServices:
     """
@@ -43,15 +46,32 @@ class AzureServices:
             streaming=True,
         )
 
-        # Initialize the Azure OpenAI Embeddings model
-        self.embeddings = AzureOpenAIEmbeddings(
-            azure_deployment=self.azure_openai_embeddings_deployment_name,
-            openai_api_version=self.azure_openai_api_version,
-            azure_endpoint=self.azure_openai_endpoint,
-            api_key=self.azure_openai_api_key,
-            model="text-embedding-3-large",
+        # Initialize the Azure OpenAI Embeddings model, text that was already
+        # embedded is served from the on-disk embedding cache
+        self.embeddings = CachedEmbeddings(
+            AzureOpenAIEmbeddings(
+                azure_deployment=self.azure_openai_embeddings_deployment_name,
+                openai_api_version=self.azure_openai_api_version,
+                azure_endpoint=self.azure_openai_endpoint,
+                api_key=self.azure_openai_api_key,
+                model="text-embedding-3-large",
+            )
         )
 
+        # Without an Azure AI Search endpoint, both indexes are kept in
+        # in-process vector stores under LOCAL_VECTOR_STORE_DIR
+        if not self.azure_search_service_endpoint:
+            local_dir = os.environ.get("LOCAL_VECTOR_STORE_DIR", ".vector_store")
+            self.uploaded_files_vector_store = LocalVectorStore(
+                self.embeddings, os.path.join(local_dir, "uploaded-files-idx")
+            )
+            self.rag_vector_store = LocalVectorStore(
+                self.embeddings, os.path.join(local_dir, "rag-idx")
+            )
+            return
+
+        embedding_dimensions = len(self.embeddings.embed_query("Text"))
+
         # Define fields for user-upload index
         self.uploaded_files_fields = [
             SimpleField(
@@ -64,7 +84,7 @@ class AzureServices:
                 name="content_vector",
                 type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
                 searchable=True,
-                vector_search_dimensions=len(self.embeddings.embed_query("Text")),
+                vector_search_dimensions=embedding_dimensions,
                 vector_search_profile_name="myHnswProfile",
             ),
             SearchableField(
@@ -86,7 +106,7 @@ class AzureServices:
             azure_search_endpoint=self.azure_search_service_endpoint,
             azure_search_key=self.azure_search_api_key,
             index_name="uploaded-files-idx",
-            embedding_function=self.embeddings.embed_query,
+            embedding_function=self.embeddings,
             fields=self.uploaded_files_fields,
         )
 
@@ -102,7 +122,7 @@ class AzureServices:
                 name="content_vector",
                 type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
                 searchable=True,
-                vector_search_dimensions=len(self.embeddings.embed_query("Text")),
+                vector_search_dimensions=embedding_dimensions,
                 vector_search_profile_name="myHnswProfile",
             ),
             SearchableField(
@@ -119,6 +139,12 @@ class AzureServices:
             azure_search_endpoint=self.azure_search_service_endpoint,
             azure_search_key=self.azure_search_api_key,
             index_name="rag-idx",
-            embedding_function=self.embeddings.embed_query,
+            embedding_function=self.embeddings,
             fields=self.rag_idx_fields,
         )
+
+    def thread_filter(self, thread_id: str) -> dict:
+        """Search kwargs restricting uploaded files to a single thread."""
+        if isinstance(self.uploaded_files_vector_store, LocalVectorStore):
+            return {"filter": {"thread_id": thread_id}}
+        return {"filters": "thread_id eq '{}'".format(thread_id)}
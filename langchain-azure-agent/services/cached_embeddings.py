@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from services.embedding_cache import (
+    EmbeddingStore,
+    aembed_with_cache,
+    embed_with_cache,
+    get_store,
+    model_namespace,
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings that only call the wrapped model for unseen text.
+
+    Vectors are looked up in a shared EmbeddingStore by (model, text hash),
+    so re-indexing a known document or restarting the app costs no
+    embedding calls.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        store: Optional[EmbeddingStore] = None,
+        namespace: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.store = store or get_store()
+        self.namespace = namespace or model_namespace(embeddings)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed_with_cache(
+            self.store, self.namespace, texts, self.embeddings.embed_documents
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some models embed queries differently from documents
+        return embed_with_cache(
+            self.store,
+            f"{self.namespace}:query",
+            [text],
+            lambda texts: [self.embeddings.embed_query(texts[0])],
+        )[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await aembed_with_cache(
+            self.store, self.namespace, texts, self.embeddings.aembed_documents
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async def aembed(texts):
+            return [await self.embeddings.aembed_query(texts[0])]
+
+        vectors = await aembed_with_cache(
+            self.store, f"{self.namespace}:query", [text], aembed
+        )
+        return vectors[0]
@@ -0,0 +1,145 @@
+import asyncio
+import uuid
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from services.vector_index import VectorIndex
+
+
+class LocalVectorStore(VectorStore):
+    """LangChain vector store over an in-process `VectorIndex`.
+
+    Used instead of Azure AI Search when no search endpoint is configured,
+    for single-node deployments and offline runs. Metadata filters are
+    plain dicts, e.g. `filter={"thread_id": thread_id}`.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        path: str,
+        dtype: str = "float16",
+        **index_kwargs: Any,
+    ):
+        self.embedding = embedding
+        self.index = VectorIndex(path, dtype=dtype, **index_kwargs)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self._add(texts, vectors, metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = await self.embedding.aembed_documents(texts)
+        return await asyncio.to_thread(self._add, texts, vectors, metadatas, ids)
+
+    def _add(self, texts, vectors, metadatas, ids) -> List[str]:
+        if not texts:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.index.add(ids, vectors, texts, metadatas or [{} for _ in texts])
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self.index.delete(ids or [])
+        return True
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_with_score(query, k, filter)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self.embedding.embed_query(query), k, filter
+        )
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(
+                embedding, k, filter
+            )
+        ]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        results = []
+        for id_, score in self.index.search(embedding, k, filter):
+            record = self.index.get(id_)
+            if record is None:
+                # Deleted since the search
+                continue
+            text, metadata = record
+            results.append(
+                (Document(id=id_, page_content=text, metadata=metadata or {}), score)
+            )
+        return results
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in await self.asimilarity_search_with_score(query, k, filter)
+        ]
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = await self.embedding.aembed_query(query)
+        return await asyncio.to_thread(
+            self.similarity_search_by_vector_with_score, embedding, k, filter
+        )
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (1.0 + score) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        path: str = ".vector_store",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, path, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
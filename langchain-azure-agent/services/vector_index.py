@@ -0,0 +1,429 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class VectorIndex:
+    """In-process vector index over memory-mapped vector files.
+
+    Vectors are stored in `path` in one file of fixed-width rows, as float32,
+    float16 or int8 (with a float32 scale per row), and read through a memory
+    map so the OS pages them in on demand. Ids, texts and metadata are kept
+    in an append-only log next to them and replayed on load.
+
+    Small collections are searched exactly with NumPy. Once more than
+    `ann_threshold` vectors are live, an IVF index (spherical k-means
+    centroids, `nprobe` lists scanned per query) is trained and used instead,
+    and retrained whenever the collection doubles. Metadata filters support
+    equality and `{"$in": [...]}` and are answered from an inverted index
+    over scalar metadata values (keys starting with "_" are not indexed);
+    very selective filters are searched exactly over the matching rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: Optional[int] = None,
+        dtype: str = "float16",
+        metric: str = "cosine",
+        ann_threshold: int = 50_000,
+        nprobe: int = 16,
+        exact_filter_limit: int = 4096,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        if metric not in ("cosine", "ip"):
+            raise ValueError("metric must be 'cosine' or 'ip'")
+        self.path = path
+        self.metric = metric
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.exact_filter_limit = exact_filter_limit
+
+        self._lock = threading.RLock()
+        self._rows = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._texts: List[Optional[str]] = []
+        self._metadatas: List[Optional[dict]] = []
+        self._row_of: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[Any, set]] = {}
+
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+        self._trained_on = 0
+
+        os.makedirs(path, exist_ok=True)
+        config_path = os.path.join(path, "config.json")
+        if os.path.exists(config_path):
+            with open(config_path, "r") as f:
+                config = json.load(f)
+            self.dim, self.dtype, self.metric = (
+                config["dim"],
+                config["dtype"],
+                config["metric"],
+            )
+            self._load()
+        else:
+            self.dim, self.dtype = dim, dtype
+            if dim is not None:
+                self._write_config()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors,
+        texts: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Optional[dict]]] = None,
+    ):
+        """Add or replace vectors by id."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one vector per id")
+        texts = texts if texts is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_config()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dimension {self.dim}")
+
+            self.delete([i for i in ids if i in self._row_of])
+            start = self._rows
+            self._reserve(start + len(ids))
+            self._store(start, vectors)
+
+            with open(self._log_path, "a") as log:
+                for offset, (id_, text, metadata) in enumerate(
+                    zip(ids, texts, metadatas)
+                ):
+                    row = start + offset
+                    self._append(row, id_, text, metadata)
+                    log.write(
+                        json.dumps(
+                            {"row": row, "id": id_, "text": text, "metadata": metadata}
+                        )
+                        + "\n"
+                    )
+            self._rows = start + len(ids)
+            self._vectors.flush()
+            if self._centroids is not None:
+                self._assign(start, self._rows)
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            deleted = [i for i in ids if i in self._row_of]
+            if not deleted:
+                return
+            with open(self._log_path, "a") as log:
+                for id_ in deleted:
+                    self._remove(self._row_of[id_])
+                    log.write(json.dumps({"delete": id_}) + "\n")
+
+    def get(self, id_: str) -> Optional[Tuple[Optional[str], Optional[dict]]]:
+        """(text, metadata) of `id_`, None if it is not (or no longer) stored."""
+        with self._lock:
+            row = self._row_of.get(id_)
+            if row is None:
+                return None
+            return self._texts[row], self._metadatas[row]
+
+    def ids(self, filter: Optional[dict] = None) -> List[str]:
+        """Ids of live vectors, optionally only those matching `filter`."""
+        with self._lock:
+            rows = self.rows_matching(filter)
+            if rows is None:
+                return list(self._row_of)
+            return [self._ids[row] for row in rows]
+
+    def rows_matching(self, filter: Optional[dict]) -> Optional[np.ndarray]:
+        """Live rows matching `filter`, or None when there is no filter."""
+        if not filter:
+            return None
+        matched = None
+        for key, condition in filter.items():
+            values = condition["$in"] if isinstance(condition, dict) else [condition]
+            postings = self._postings.get(key, {})
+            rows = set()
+            for value in values:
+                rows |= postings.get(_hashable(key, value), set())
+            matched = rows if matched is None else matched & rows
+            if not matched:
+                break
+        return np.fromiter(sorted(matched), dtype=np.int64)
+
+    def search(
+        self, vector, k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to `k` (id, score) pairs, best first.
+
+        Vectors are scored without holding the lock, ids deleted in the
+        meantime are left out. They can still be deleted before `get`.
+        """
+        return self._search(vector, k, filter, self.ann_threshold)
+
+    def search_exact(
+        self, vector, k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[str, float]]:
+        """Brute-force search, whatever the size of the collection."""
+        return self._search(vector, k, filter, float("inf"))
+
+    def _search(
+        self, vector, k: int, filter: Optional[dict], ann_threshold: float
+    ) -> List[Tuple[str, float]]:
+        if self.dim is None or not self._row_of:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        if self.metric == "cosine":
+            query = query / (np.linalg.norm(query) or 1.0)
+
+        with self._lock:
+            rows = self.rows_matching(filter)
+            if rows is not None and len(rows) == 0:
+                return []
+            n = self._rows
+            if len(self._row_of) >= ann_threshold and (
+                rows is None or len(rows) > self.exact_filter_limit
+            ):
+                self._maybe_train()
+                candidates = self._probe(query)
+                if rows is not None:
+                    candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            else:
+                candidates = rows
+
+        if candidates is None:
+            scores = self._score_all(query, n)
+            order = [row for row in _top_k(scores, k) if scores[row] > -np.inf]
+            hits = [(row, float(scores[row])) for row in order]
+        else:
+            candidates = candidates[self._alive[candidates]]
+            scores = self._score_rows(query, candidates)
+            hits = [(candidates[i], float(scores[i])) for i in _top_k(scores, k)]
+
+        # Rows are never reused, only check they are still alive
+        with self._lock:
+            return [(self._ids[row], score) for row, score in hits if self._alive[row]]
+
+    # Storage
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "records.jsonl")
+
+    def _write_config(self):
+        with open(os.path.join(self.path, "config.json"), "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "metric": self.metric}, f)
+
+    def _load(self):
+        rows = 0
+        if os.path.exists(self._log_path):
+            with open(self._log_path, "r") as log:
+                for line in log:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if "delete" in record:
+                        row = self._row_of.get(record["delete"])
+                        if row is not None:
+                            self._remove(row)
+                        continue
+                    self._reserve_lists(record["row"] + 1)
+                    self._append(
+                        record["row"], record["id"], record["text"], record["metadata"]
+                    )
+                    rows = max(rows, record["row"] + 1)
+        self._reserve(rows)
+        self._rows = rows
+
+        centroids_path = os.path.join(self.path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            self._centroids = np.load(centroids_path)
+            self._trained_on = len(self._row_of)
+            self._assign(0, self._rows)
+
+    def _reserve(self, rows: int):
+        if rows <= self._capacity:
+            self._reserve_lists(rows)
+            return
+        capacity = max(rows, 2 * self._capacity, 1024)
+        dtype = DTYPES[self.dtype]
+        self._vectors = _open_memmap(
+            os.path.join(self.path, f"vectors.{self.dtype}"),
+            dtype,
+            (capacity, self.dim),
+        )
+        if self.dtype == "int8":
+            self._scales = _open_memmap(
+                os.path.join(self.path, "scales.float32"), np.float32, (capacity,)
+            )
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self._alive)] = self._alive[:capacity]
+        self._alive = alive
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[: len(self._assignments)] = self._assignments[:capacity]
+        self._assignments = assignments
+        self._capacity = capacity
+        self._reserve_lists(rows)
+
+    def _reserve_lists(self, rows: int):
+        missing = rows - len(self._ids)
+        if missing > 0:
+            self._ids.extend([None] * missing)
+            self._texts.extend([None] * missing)
+            self._metadatas.extend([None] * missing)
+        if rows > len(self._alive):
+            alive = np.zeros(rows, dtype=bool)
+            alive[: len(self._alive)] = self._alive
+            self._alive = alive
+
+    def _store(self, start: int, vectors: np.ndarray):
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1.0, norms)
+        end = start + len(vectors)
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._vectors[start:end] = np.round(vectors / scales[:, None]).astype(
+                np.int8
+            )
+            self._scales[start:end] = scales
+            self._scales.flush()
+        else:
+            self._vectors[start:end] = vectors.astype(DTYPES[self.dtype])
+
+    def _append(self, row: int, id_: str, text, metadata):
+        self._ids[row] = id_
+        self._texts[row] = text
+        self._metadatas[row] = metadata
+        self._alive[row] = True
+        self._row_of[id_] = row
+        for key, value in (metadata or {}).items():
+            value = _hashable(key, value)
+            if value is not None:
+                self._postings.setdefault(key, {}).setdefault(value, set()).add(row)
+
+    def _remove(self, row: int):
+        self._alive[row] = False
+        del self._row_of[self._ids[row]]
+        for key, value in (self._metadatas[row] or {}).items():
+            value = _hashable(key, value)
+            if value is not None:
+                self._postings.get(key, {}).get(value, set()).discard(row)
+        self._texts[row] = None
+        self._metadatas[row] = None
+
+    # Scoring
+
+    def _decode(self, rows) -> np.ndarray:
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= np.asarray(self._scales[rows], dtype=np.float32)[:, None]
+        return vectors
+
+    def _dot(self, rows, query: np.ndarray) -> np.ndarray:
+        scores = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+        if self.dtype == "int8":
+            # Scale the scores rather than every vector component
+            scores *= self._scales[rows]
+        return scores
+
+    def _score_all(self, query: np.ndarray, n: int, block: int = 4096) -> np.ndarray:
+        # Small blocks keep the float32 copy of quantized vectors in cache
+        scores = np.full(n, -np.inf, dtype=np.float32)
+        for start in range(0, n, block):
+            end = min(start + block, n)
+            scores[start:end] = self._dot(slice(start, end), query)
+        scores[~self._alive[:n]] = -np.inf
+        return scores
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.float32)
+        # Sorted rows keep memory-mapped reads sequential
+        return self._dot(rows, query)
+
+    # IVF
+
+    def _maybe_train(self):
+        live = len(self._row_of)
+        if self._centroids is None or live > 2 * self._trained_on:
+            self._train()
+
+    def _train(self, iterations: int = 10, seed: int = 0):
+        live_rows = np.flatnonzero(self._alive[: self._rows])
+        nlist = max(1, int(np.sqrt(len(live_rows))))
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(live_rows, min(len(live_rows), 64 * nlist), replace=False)
+        sample = self._decode(np.sort(sample))
+        sample /= np.linalg.norm(sample, axis=1, keepdims=True) + 1e-12
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) + 1e-12)
+
+        self._centroids = centroids.astype(np.float32)
+        np.save(os.path.join(self.path, "centroids.npy"), self._centroids)
+        self._trained_on = len(live_rows)
+        self._assign(0, self._rows)
+
+    def _assign(self, start: int, end: int, block: int = 4096):
+        for s in range(start, end, block):
+            e = min(s + block, end)
+            self._assignments[s:e] = np.argmax(
+                self._decode(slice(s, e)) @ self._centroids.T, axis=1
+            )
+        self._lists = None
+
+    def _probe(self, query: np.ndarray) -> np.ndarray:
+        if self._lists is None:
+            rows = np.flatnonzero(self._alive[: self._rows])
+            order = rows[np.argsort(self._assignments[rows], kind="stable")]
+            bounds = np.searchsorted(
+                self._assignments[order], np.arange(len(self._centroids) + 1)
+            )
+            self._lists = [
+                order[bounds[c] : bounds[c + 1]] for c in range(len(self._centroids))
+            ]
+        nearest = _top_k(self._centroids @ query, self.nprobe)
+        return np.sort(np.concatenate([self._lists[c] for c in nearest]))
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _hashable(key: str, value):
+    if not key.startswith("_") and isinstance(value, (str, int, float, bool)):
+        return value
+    return None
+
+
+def _open_memmap(path: str, dtype, shape) -> np.memmap:
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    with open(path, "ab") as f:
+        if f.tell() < size:
+            f.truncate(size)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
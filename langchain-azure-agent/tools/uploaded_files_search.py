@@ -37,7 +37,7 @@ async def uploaded_files_search(query: str) -> str:
             query=query,
             k=5,
             search_type="similarity",
-            filters="thread_id eq '{}'".format(cl.user_session.get("current_thread")),
+            **azure_services.thread_filter(cl.user_session.get("current_thread")),
         )
 
         return [
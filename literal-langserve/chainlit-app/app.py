@@ -2,6 +2,8 @@ from langserve import RemoteRunnable
 
 import chainlit as cl
 
+from token_buffer import TokenBuffer
+
 
 def get_runnable():
     runnable = RemoteRunnable(
@@ -18,9 +20,10 @@ def get_runnable():
 async def on_msg(msg: cl.Message):
     msg = cl.Message(content="")
 
-    async for chunk in get_runnable().astream(
-        {"question": msg.content},
-    ):
-        await msg.stream_token(chunk)
+    async with TokenBuffer(msg) as buffer:
+        async for chunk in get_runnable().astream(
+            {"question": msg.content},
+        ):
+            await buffer.stream_token(chunk)
 
     await msg.send()
@@ -19,6 +19,7 @@ from llama_index.callbacks.base import CallbackManager
 import openai
 import chainlit as cl
 
+from token_buffer import TokenBuffer
 
 openai.api_key = os.environ.get("OPENAI_API_KEY")
 
@@ -101,8 +102,9 @@ async def main(message: cl.Message):
 
     res = query_engine.query(message.content)
 
-    for text in res.response_gen:
-        token = text
-        await msg.stream_token(token)
+    async with TokenBuffer(msg) as buffer:
+        for text in res.response_gen:
+            token = text
+            await buffer.stream_token(token)
 
     await msg.send()
@@ -2,30 +2,55 @@ import os
 import openai
 import chainlit as cl
 
-from llama_index.core import (
-    Settings,
-    StorageContext,
-    VectorStoreIndex,
-    SimpleDirectoryReader,
-    load_index_from_storage,
-)
+from llama_index.core import Settings
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core.query_engine.retriever_query_engine import RetrieverQueryEngine
 from llama_index.core.callbacks import CallbackManager
 from llama_index.core.service_context import ServiceContext
 
+from cached_embedding import CachedEmbedding
+from index_refresh import IndexRefresher
+from local_vector_store import LocalVectorStore
+from token_buffer import TokenBuffer
+
 openai.api_key = os.environ.get("OPENAI_API_KEY")
 
-try:
-    # rebuild storage context
-    storage_context = StorageContext.from_defaults(persist_dir="./storage")
-    # load index
-    index = load_index_from_storage(storage_context)
-except:
-    documents = SimpleDirectoryReader("./data").load_data(show_progress=True)
-    index = VectorStoreIndex.from_documents(documents)
-    index.storage_context.persist()
+# Set before the index is built so documents and queries use the same model.
+# Text that was already embedded is served from the on-disk cache.
+Settings.embed_model = CachedEmbedding(
+    OpenAIEmbedding(model="text-embedding-3-small")
+)
+
+# Vectors live in a memory-mapped, in-process vector store next to the
+# persisted index metadata. Added, modified and deleted files in ./data are
+# picked up in the background and applied to the live index, the store
+# keeps serving queries while they are.
+refresher = IndexRefresher(
+    "./data",
+    "./storage",
+    vector_store_factory=LocalVectorStore,
+    interval=float(os.environ.get("INDEX_REFRESH_INTERVAL", "30")),
+    update_in_place=True,
+)
+refresher.load()
+refresher.start()
+
+
+def get_query_engine():
+    """Return the session's query engine, rebuilt after an index refresh."""
+    # Read the generation first, a swap in between only causes another rebuild
+    generation = refresher.generation
+    if cl.user_session.get("generation") != generation:
+        service_context = ServiceContext.from_defaults(
+            callback_manager=CallbackManager([cl.LlamaIndexCallbackHandler()])
+        )
+        query_engine = refresher.index.as_query_engine(
+            streaming=True, similarity_top_k=2, service_context=service_context
+        )
+        cl.user_session.set("query_engine", query_engine)
+        cl.user_session.set("generation", generation)
+    return cl.user_session.get("query_engine")  # type: RetrieverQueryEngine
 
 
 @cl.on_chat_start
@@ -33,16 +58,9 @@ async def start():
     Settings.llm = OpenAI(
         model="gpt-3.5-turbo", temperature=0.1, max_tokens=1024, streaming=True
     )
-    Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-small")
     Settings.context_window = 4096
 
-    service_context = ServiceContext.from_defaults(
-        callback_manager=CallbackManager([cl.LlamaIndexCallbackHandler()])
-    )
-    query_engine = index.as_query_engine(
-        streaming=True, similarity_top_k=2, service_context=service_context
-    )
-    cl.user_session.set("query_engine", query_engine)
+    get_query_engine()
 
     await cl.Message(
         author="Assistant", content="Hello! Im an AI assistant. How may I help you?"
@@ -51,12 +69,17 @@ async def start():
 
 @cl.on_message
 async def main(message: cl.Message):
-    query_engine = cl.user_session.get("query_engine")  # type: RetrieverQueryEngine
+    query_engine = get_query_engine()
 
     msg = cl.Message(content="", author="Assistant")
 
-    res = await cl.make_async(query_engine.query)(message.content)
+    # Retrieval and generation run on the event loop without holding it, so
+    # other chats keep streaming while this one waits on OpenAI. The callback
+    # handler records them as retrieve and llm steps, the llm step ends with
+    # the last token.
+    res = await query_engine.aquery(message.content)
 
-    for token in res.response_gen:
-        await msg.stream_token(token)
+    async with TokenBuffer(msg) as buffer:
+        async for token in res.async_response_gen():
+            await buffer.stream_token(token)
     await msg.send()
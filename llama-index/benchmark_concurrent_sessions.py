@@ -0,0 +1,165 @@
+"""Concurrent chat sessions on one event loop, blocking vs async streaming.
+
+Runs `--sessions` queries at the same time against a small index, the way
+Chainlit runs the `on_message` handlers of concurrent chats on one event
+loop. The LLM and the query embedding sleep like remote APIs (a round trip
+before the first token, then a delay per token). The blocking path is the
+previous `app.py`, `query` in a thread and then `response_gen` iterated on
+the loop; the async path is `aquery` and `async_response_gen`. Reports the
+wall time, time to first token, the longest stall of the event loop, and the
+retrieve and llm spans recorded by the callback manager. No API key is
+needed:
+
+    python benchmark_concurrent_sessions.py --sessions 8 --tokens 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+
+from llama_index.core import Document, MockEmbedding, Settings, VectorStoreIndex
+from llama_index.core.callbacks import CallbackManager, CBEventType, LlamaDebugHandler
+from llama_index.core.llms import (
+    CompletionResponse,
+    CompletionResponseGen,
+    CustomLLM,
+    LLMMetadata,
+)
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+
+class SlowEmbedding(MockEmbedding):
+    round_trip: float = 0.1
+
+    def _get_query_embedding(self, query: str):
+        time.sleep(self.round_trip)
+        return super()._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str):
+        await asyncio.sleep(self.round_trip)
+        return super()._get_query_embedding(query)
+
+
+class SlowLLM(CustomLLM):
+    first_token: float = 0.3
+    per_token: float = 0.02
+    tokens: int = 50
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="slow-llm")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.first_token + self.per_token * self.tokens)
+        return CompletionResponse(text="token " * self.tokens)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, **kwargs: Any) -> CompletionResponseGen:
+        def gen():
+            time.sleep(self.first_token)
+            text = ""
+            for _ in range(self.tokens):
+                time.sleep(self.per_token)
+                text += "token "
+                yield CompletionResponse(text=text, delta="token ")
+
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, **kwargs: Any):
+        async def gen():
+            await asyncio.sleep(self.first_token)
+            text = ""
+            for _ in range(self.tokens):
+                await asyncio.sleep(self.per_token)
+                text += "token "
+                yield CompletionResponse(text=text, delta="token ")
+
+        return gen()
+
+
+async def blocking_session(query_engine, question):
+    start = time.perf_counter()
+    first_token = None
+    res = await asyncio.to_thread(query_engine.query, question)
+    for _ in res.response_gen:
+        first_token = first_token or time.perf_counter() - start
+        # Stands in for msg.stream_token
+        await asyncio.sleep(0)
+    return first_token
+
+
+async def async_session(query_engine, question):
+    start = time.perf_counter()
+    first_token = None
+    res = await query_engine.aquery(question)
+    async for _ in res.async_response_gen():
+        first_token = first_token or time.perf_counter() - start
+        await asyncio.sleep(0)
+    return first_token
+
+
+async def run(session, query_engine, sessions):
+    stalls = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            tick = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - tick - 0.01)
+
+    monitor = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    first_tokens = await asyncio.gather(
+        *(session(query_engine, f"question {i}") for i in range(sessions))
+    )
+    elapsed = time.perf_counter() - start
+    done.set()
+    await monitor
+    return elapsed, first_tokens, max(stalls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--per-token", type=float, default=0.02)
+    args = parser.parse_args()
+
+    debug_handler = LlamaDebugHandler(print_trace_on_end=False)
+    Settings.callback_manager = CallbackManager([debug_handler])
+    Settings.embed_model = SlowEmbedding(embed_dim=64)
+    Settings.llm = SlowLLM(
+        first_token=args.first_token, per_token=args.per_token, tokens=args.tokens
+    )
+    documents = [Document(text=f"Document {i} about topic {i % 7}.") for i in range(50)]
+    query_engine = VectorStoreIndex.from_documents(documents).as_query_engine(
+        streaming=True, similarity_top_k=2
+    )
+    debug_handler.flush_event_logs()
+
+    print(f"{args.sessions} concurrent sessions, {args.tokens} tokens each")
+    for name, session in [("blocking", blocking_session), ("async", async_session)]:
+        elapsed, first_tokens, stall = asyncio.run(
+            run(session, query_engine, args.sessions)
+        )
+        retrieve = debug_handler.get_event_time_info(CBEventType.RETRIEVE)
+        llm = debug_handler.get_event_time_info(CBEventType.LLM)
+        debug_handler.flush_event_logs()
+        print(
+            f"{name:9} wall {elapsed:6.2f}s  "
+            f"first token mean {statistics.mean(first_tokens):5.2f}s "
+            f"max {max(first_tokens):5.2f}s  "
+            f"longest loop stall {stall * 1000:6.0f} ms  "
+            f"spans: retrieve {retrieve.average_secs * 1000:4.0f} ms, "
+            f"llm {llm.average_secs:5.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Recall and latency of `VectorIndex` against brute-force float32 search.
+
+Builds indexes over synthetic clustered embeddings (real embeddings are
+clustered too, uniform random vectors are a worst case for IVF) and reports
+recall@k and per-query latency for each storage type, with and without IVF
+and with a metadata filter. No API key is needed:
+
+    python benchmark_vector_index.py --vectors 200000 --dim 384
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def clustered(rng, n, dim, clusters=256):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def brute_force(vectors, queries, k, mask=None):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run(index, queries, truth, k, filter=None, exact=False):
+    search = index.search_exact if exact else index.search
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {int(id_) for id_, _ in search(query, k, filter)}
+        hits += len(found & {int(i) for i in expected})
+    elapsed = time.perf_counter() - start
+    return hits / (len(queries) * k), 1000 * elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, args.vectors, args.dim)
+    queries = clustered(rng, args.queries, args.dim)
+    threads = rng.integers(0, 100, args.vectors)
+    thread = 7
+
+    truth = brute_force(vectors, queries, args.k)
+    filtered_truth = brute_force(vectors, queries, args.k, mask=threads == thread)
+
+    ids = [str(i) for i in range(args.vectors)]
+    metadatas = [{"thread_id": f"thread-{t}"} for t in threads]
+
+    print(f"{args.vectors} vectors of {args.dim} dims, recall@{args.k}")
+    print(f"{'dtype':8} {'search':14} {'recall':>7} {'ms/query':>9}")
+    for dtype in ("float32", "float16", "int8"):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = VectorIndex(
+                tmp, dtype=dtype, ann_threshold=1, nprobe=args.nprobe
+            )
+            start = time.perf_counter()
+            for i in range(0, args.vectors, 10_000):
+                index.add(
+                    ids[i : i + 10_000],
+                    vectors[i : i + 10_000],
+                    metadatas=metadatas[i : i + 10_000],
+                )
+            index.search(queries[0])  # train IVF
+            build = time.perf_counter() - start
+
+            for name, kwargs, expected in (
+                ("exact", {"exact": True}, truth),
+                ("ivf", {}, truth),
+                (
+                    "ivf+filter",
+                    {"filter": {"thread_id": f"thread-{thread}"}},
+                    filtered_truth,
+                ),
+            ):
+                recall, latency = run(index, queries, expected, args.k, **kwargs)
+                print(f"{dtype:8} {name:14} {recall:7.3f} {latency:9.2f}")
+            print(f"{dtype:8} build + train  {build:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
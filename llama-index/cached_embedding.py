@@ -0,0 +1,78 @@
+from typing import List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from embedding_cache import (
+    EmbeddingStore,
+    aembed_with_cache,
+    embed_with_cache,
+    get_store,
+    model_namespace,
+)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """LlamaIndex embed model that only calls the wrapped model for unseen text.
+
+    Vectors are looked up in a shared EmbeddingStore by (model, text hash),
+    so rebuilding an index over known documents costs no embedding calls.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingStore = PrivateAttr()
+    _namespace: str = PrivateAttr()
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        store: Optional[EmbeddingStore] = None,
+        namespace: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._store = store or get_store()
+        self._namespace = namespace or model_namespace(embed_model)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        # Some models embed queries differently from documents
+        return embed_with_cache(
+            self._store,
+            f"{self._namespace}:query",
+            [query],
+            lambda texts: [self._embed_model._get_query_embedding(texts[0])],
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        async def aembed(texts):
+            return [await self._embed_model._aget_query_embedding(texts[0])]
+
+        vectors = await aembed_with_cache(
+            self._store, f"{self._namespace}:query", [query], aembed
+        )
+        return vectors[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return embed_with_cache(
+            self._store, self._namespace, texts, self._embed_model._get_text_embeddings
+        )
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await aembed_with_cache(
+            self._store, self._namespace, texts, self._embed_model._aget_text_embeddings
+        )
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from llama_index.core import (
+    SimpleDirectoryReader,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexRefresher:
+    """
+    Keeps a persisted VectorStoreIndex in line with the files in `data_dir`.
+
+    A refresh parses and embeds only the added and modified files and deletes
+    the documents of removed files. A manifest of size, mtime, content hash
+    and document ids per file is stored with the index, files whose size and
+    mtime are unchanged are not read at all.
+
+    With `update_in_place`, the changes are applied to the live index and its
+    vector store, so a refresh costs in proportion to the changed files. The
+    vector store must serve queries while nodes are added and deleted and
+    keep the node text itself, so that queries never read the docstore, like
+    `LocalVectorStore`. A query running during a refresh may miss the
+    documents of a file that is being replaced.
+
+    Otherwise, every version of the index is a generation directory in
+    `storage_dir`, and the `CURRENT` file names the one in use. A refresh
+    copies the current generation, loads the copy as a second index, applies
+    the changes to it, persists it and then swaps it in, while queries keep
+    using the previous index object. This works with any vector store, but
+    each refresh copies and loads the whole corpus, and holds two indexes in
+    memory until the swap, however small the change.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        storage_dir: str,
+        vector_store_factory: Optional[Callable[[str], BasePydanticVectorStore]] = None,
+        interval: float = 30.0,
+        keep_generations: int = 2,
+        update_in_place: bool = False,
+    ):
+        self.data_dir = data_dir
+        self.storage_dir = storage_dir
+        self.vector_store_factory = vector_store_factory
+        self.interval = interval
+        self.keep_generations = keep_generations
+        self.update_in_place = update_in_place
+
+        self.generation = 0
+        self.index: Optional[VectorStoreIndex] = None
+        self._manifest: Dict[str, dict] = {}
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self) -> VectorStoreIndex:
+        """Load the current generation, building the first one if needed."""
+        os.makedirs(self.storage_dir, exist_ok=True)
+        current_path = os.path.join(self.storage_dir, "CURRENT")
+        if os.path.exists(current_path):
+            with open(current_path, "r") as f:
+                generation = int(f.read().strip())
+            path = self._generation_path(generation)
+            self.index = load_index_from_storage(self._storage_context(path, True))
+            with open(os.path.join(path, "manifest.json"), "r") as f:
+                self._manifest = json.load(f)
+            self.generation = generation
+        else:
+            self._build()
+        return self.index
+
+    def refresh(self) -> Optional[dict]:
+        """Apply file changes to the index, None if nothing changed."""
+        with self._refresh_lock:
+            changed, deleted, manifest = self._diff()
+            if not changed and not deleted:
+                if manifest != self._manifest:
+                    # Only mtimes moved, remember them to skip hashing next time
+                    self._manifest = manifest
+                    self._write_manifest(self._generation_path(self.generation))
+                return None
+
+            start = time.perf_counter()
+            if self.update_in_place:
+                generation = self.generation
+                path = self._generation_path(generation)
+                index = self.index
+            else:
+                generation = self.generation + 1
+                path = self._generation_path(generation)
+                shutil.rmtree(path, ignore_errors=True)
+                shutil.copytree(self._generation_path(self.generation), path)
+                index = load_index_from_storage(self._storage_context(path, True))
+
+            # Documents of removed files, and parts that no longer exist in
+            # modified files, are deleted
+            new_ids = {}
+            if changed:
+                documents = SimpleDirectoryReader(
+                    input_files=changed, filename_as_id=True
+                ).load_data()
+                index.refresh_ref_docs(documents)
+                for document in documents:
+                    new_ids.setdefault(document.metadata["file_path"], []).append(
+                        document.id_
+                    )
+            stale = []
+            for file_path in changed + deleted:
+                known = self._manifest.get(file_path, {}).get("doc_ids", [])
+                kept = set(new_ids.get(file_path, []))
+                stale += [doc_id for doc_id in known if doc_id not in kept]
+            for doc_id in stale:
+                index.delete_ref_doc(doc_id, delete_from_docstore=True)
+            for file_path, doc_ids in new_ids.items():
+                manifest[file_path]["doc_ids"] = doc_ids
+
+            if self.update_in_place:
+                # The vector store wrote each change already, replace the
+                # docstore files whole so a crash never leaves them half written
+                _persist_atomic(index, path)
+                self._manifest = manifest
+                self._write_manifest(path)
+            else:
+                index.storage_context.persist(persist_dir=path)
+                self._manifest = manifest
+                self._write_manifest(path)
+                self._set_current(generation)
+                # Swap: new queries use the refreshed index from here on
+                self.index, self.generation = index, generation
+                self._remove_old_generations()
+            return {
+                "generation": generation,
+                "changed_files": len(changed),
+                "deleted_files": len(deleted),
+                "deleted_documents": len(stale),
+                "seconds": round(time.perf_counter() - start, 2),
+            }
+
+    def start(self):
+        """Refresh every `interval` seconds in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="index-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                result = self.refresh()
+                if result:
+                    print(f"Index refreshed: {result}")
+            except Exception as e:
+                # The previous generation stays in use, try again later
+                print(f"Index refresh failed: {e}")
+
+    def _build(self):
+        path = self._generation_path(1)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        files = self._files()
+        documents = (
+            SimpleDirectoryReader(input_files=files, filename_as_id=True).load_data(
+                show_progress=True
+            )
+            if files
+            else []
+        )
+        self.index = VectorStoreIndex.from_documents(
+            documents, storage_context=self._storage_context(path, False)
+        )
+        self.index.storage_context.persist(persist_dir=path)
+
+        self._manifest = {file_path: self._entry(file_path) for file_path in files}
+        for document in documents:
+            entry = self._manifest[document.metadata["file_path"]]
+            entry["doc_ids"].append(document.id_)
+        self._write_manifest(path)
+        self._set_current(1)
+        self.generation = 1
+
+    def _files(self) -> List[str]:
+        try:
+            reader = SimpleDirectoryReader(self.data_dir, recursive=True)
+        except ValueError:
+            # No files in the directory
+            return []
+        return sorted(str(path) for path in reader.input_files)
+
+    def _entry(self, file_path: str, sha256: Optional[str] = None) -> dict:
+        stat = os.stat(file_path)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256 or file_hash(file_path),
+            "doc_ids": [],
+        }
+
+    def _diff(self):
+        manifest = {}
+        changed = []
+        for file_path in self._files():
+            known = self._manifest.get(file_path)
+            stat = os.stat(file_path)
+            if (
+                known is not None
+                and known["size"] == stat.st_size
+                and known["mtime_ns"] == stat.st_mtime_ns
+            ):
+                manifest[file_path] = known
+                continue
+            sha256 = file_hash(file_path)
+            manifest[file_path] = self._entry(file_path, sha256)
+            if known is not None and known["sha256"] == sha256:
+                # Touched or copied over with the same content
+                manifest[file_path]["doc_ids"] = known["doc_ids"]
+            else:
+                changed.append(file_path)
+        deleted = [path for path in self._manifest if path not in manifest]
+        return changed, deleted, manifest
+
+    def _storage_context(self, path: str, exists: bool) -> StorageContext:
+        kwargs = {}
+        if self.vector_store_factory is not None:
+            kwargs["vector_store"] = self.vector_store_factory(
+                os.path.join(path, "vectors")
+            )
+        if exists:
+            kwargs["persist_dir"] = path
+        return StorageContext.from_defaults(**kwargs)
+
+    def _generation_path(self, generation: int) -> str:
+        return os.path.join(self.storage_dir, f"generation-{generation:06}")
+
+    def _write_manifest(self, path: str):
+        _write_atomic(os.path.join(path, "manifest.json"), json.dumps(self._manifest))
+
+    def _set_current(self, generation: int):
+        _write_atomic(os.path.join(self.storage_dir, "CURRENT"), str(generation))
+
+    def _remove_old_generations(self):
+        # The previous generation may still be read by in-flight queries
+        for generation in range(self.generation - self.keep_generations, 0, -1):
+            path = self._generation_path(generation)
+            if not os.path.exists(path):
+                break
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _persist_atomic(index: VectorStoreIndex, path: str):
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    index.storage_context.persist(persist_dir=tmp_path)
+    for name in os.listdir(tmp_path):
+        os.replace(os.path.join(tmp_path, name), os.path.join(path, name))
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
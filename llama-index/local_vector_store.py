@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    node_to_metadata_dict,
+)
+
+from vector_index import VectorIndex
+
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """LlamaIndex vector store over an in-process `VectorIndex`.
+
+    Node text and metadata are kept in the index next to the vectors, so the
+    store can be reopened from `path` without a separate docstore. Metadata
+    filters support EQ and IN, combined with AND.
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    _index: VectorIndex = PrivateAttr()
+
+    def __init__(self, path: str, dtype: str = "float16", **index_kwargs: Any):
+        super().__init__()
+        self._index = VectorIndex(path, dtype=dtype, **index_kwargs)
+
+    @property
+    def client(self) -> VectorIndex:
+        return self._index
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        ids = [node.node_id for node in nodes]
+        self._index.add(
+            ids,
+            [node.get_embedding() for node in nodes],
+            [node.get_content() for node in nodes],
+            [node_to_metadata_dict(node, remove_text=True) for node in nodes],
+        )
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._index.delete(self._index.ids({"ref_doc_id": ref_doc_id}))
+
+    def clear(self) -> None:
+        self._index.delete(self._index.ids())
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        filter = _to_filter(query.filters)
+        if query.doc_ids:
+            filter = {**(filter or {}), "ref_doc_id": {"$in": query.doc_ids}}
+
+        nodes, similarities, ids = [], [], []
+        for id_, score in self._index.search(
+            query.query_embedding, query.similarity_top_k, filter
+        ):
+            record = self._index.get(id_)
+            if record is None:
+                # Deleted since the search
+                continue
+            text, metadata = record
+            node = metadata_dict_to_node(metadata)
+            node.set_content(text)
+            nodes.append(node)
+            similarities.append(score)
+            ids.append(id_)
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+    async def aquery(
+        self, query: VectorStoreQuery, **kwargs: Any
+    ) -> VectorStoreQueryResult:
+        # An exact search over a large collection takes tens of milliseconds,
+        # too long to hold the event loop of the chat server
+        return await asyncio.to_thread(self.query, query, **kwargs)
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        # Every add and delete is already written to disk
+        pass
+
+
+def _to_filter(filters: Optional[MetadataFilters]) -> Optional[dict]:
+    if filters is None or not filters.filters:
+        return None
+    if filters.condition == FilterCondition.OR and len(filters.filters) > 1:
+        raise ValueError("LocalVectorStore only supports AND filters")
+
+    filter = {}
+    for metadata_filter in filters.filters:
+        if isinstance(metadata_filter, MetadataFilters):
+            raise ValueError("LocalVectorStore does not support nested filters")
+        if metadata_filter.operator == FilterOperator.EQ:
+            filter[metadata_filter.key] = metadata_filter.value
+        elif metadata_filter.operator == FilterOperator.IN:
+            filter[metadata_filter.key] = {"$in": list(metadata_filter.value)}
+        else:
+            raise ValueError(
+                f"LocalVectorStore does not support the {metadata_filter.operator} operator"
+            )
+    return filter
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from vector_index import VectorIndex
+
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(
+        np.float32
+    )
+
+
+def ids(n):
+    return [f"id-{i}" for i in range(n)]
+
+
+def test_add_search_and_get(tmp_path):
+    vectors = unit_vectors(20)
+    index = VectorIndex(str(tmp_path), dtype="float32")
+    index.add(ids(20), vectors, [f"text {i}" for i in range(20)])
+
+    assert len(index) == 20
+    best_id, score = index.search(vectors[7], k=1)[0]
+    assert best_id == "id-7" and score == pytest.approx(1.0, abs=1e-5)
+    assert index.get("id-7") == ("text 7", None)
+    assert index.get("missing") is None
+
+
+def test_replace_keeps_one_vector_per_id(tmp_path):
+    vectors = unit_vectors(3)
+    index = VectorIndex(str(tmp_path), dtype="float32")
+    index.add(ids(2), vectors[:2], ["old 0", "old 1"])
+    index.add(["id-0"], vectors[2:], ["new 0"])
+
+    assert len(index) == 2
+    assert index.get("id-0") == ("new 0", None)
+    assert index.search(vectors[2], k=1)[0][0] == "id-0"
+
+
+def test_delete(tmp_path):
+    vectors = unit_vectors(5)
+    index = VectorIndex(str(tmp_path), dtype="float32")
+    index.add(ids(5), vectors)
+    index.delete(["id-1", "id-3", "unknown"])
+
+    assert sorted(index.ids()) == ["id-0", "id-2", "id-4"]
+    assert index.get("id-1") is None
+    assert {id_ for id_, _ in index.search(vectors[1], k=5)} == {
+        "id-0",
+        "id-2",
+        "id-4",
+    }
+
+
+def test_reload_replays_adds_replaces_and_deletes(tmp_path):
+    vectors = unit_vectors(6)
+    index = VectorIndex(str(tmp_path), dtype="float16")
+    texts = [f"text {i}" for i in range(4)]
+    index.add(ids(4), vectors[:4], texts, [{"n": i} for i in range(4)])
+    index.add(["id-2"], vectors[4:5], ["replaced"], [{"n": 20}])
+    index.delete(["id-0"])
+    index.add(["id-9"], vectors[5:], ["added"], [{"n": 9}])
+
+    reloaded = VectorIndex(str(tmp_path))
+    assert (reloaded.dim, reloaded.dtype) == (16, "float16")
+    assert sorted(reloaded.ids()) == ["id-1", "id-2", "id-3", "id-9"]
+    assert reloaded.get("id-2") == ("replaced", {"n": 20})
+    assert reloaded.get("id-0") is None
+    for id_, vector in [("id-2", vectors[4]), ("id-9", vectors[5])]:
+        assert reloaded.search(vector, k=1)[0][0] == id_
+    assert reloaded.ids({"n": 20}) == ["id-2"]
+    assert reloaded.ids({"n": 2}) == []
+
+
+def test_filters(tmp_path):
+    vectors = unit_vectors(12)
+    metadatas = [
+        {"thread_id": f"t{i % 3}", "page": i, "_private": "x", "tags": ["a"]}
+        for i in range(12)
+    ]
+    index = VectorIndex(str(tmp_path), dtype="float32")
+    index.add(ids(12), vectors, metadatas=metadatas)
+
+    assert sorted(index.ids({"thread_id": "t1"})) == ["id-1", "id-10", "id-4", "id-7"]
+    assert sorted(index.ids({"thread_id": {"$in": ["t0", "t2"]}, "page": 3})) == [
+        "id-3"
+    ]
+    # Keys starting with "_" and unhashable values are not indexed
+    assert index.ids({"_private": "x"}) == []
+    assert index.ids({"tags": "a"}) == []
+
+    hits = index.search(vectors[4], k=10, filter={"thread_id": "t1"})
+    assert hits[0][0] == "id-4"
+    assert {id_ for id_, _ in hits} == {"id-1", "id-4", "id-7", "id-10"}
+    assert index.search(vectors[4], filter={"thread_id": "none"}) == []
+
+
+def test_int8_round_trip(tmp_path):
+    vectors = unit_vectors(50, dim=32)
+    index = VectorIndex(str(tmp_path), dtype="int8")
+    index.add(ids(50), vectors)
+
+    for reopened in [index, VectorIndex(str(tmp_path))]:
+        decoded = reopened._decode(np.arange(50))
+        np.testing.assert_allclose(decoded, vectors, atol=1 / 127)
+        hits = reopened.search(vectors[10], k=3)
+        assert hits[0][0] == "id-10"
+        assert hits[0][1] == pytest.approx(1.0, abs=0.01)
+
+
+def test_ivf_search_and_exact_search(tmp_path):
+    vectors = unit_vectors(600, dim=16)
+    index = VectorIndex(str(tmp_path), dtype="float32", ann_threshold=100, nprobe=4)
+    index.add(ids(600), vectors)
+
+    assert index.search(vectors[123], k=1)[0][0] == "id-123"
+    assert index._centroids is not None
+    assert index.search_exact(vectors[321], k=1)[0][0] == "id-321"
+    # The threshold is passed along, not swapped on the shared index
+    assert index.ann_threshold == 100
@@ -10,6 +10,8 @@ import os
 import chainlit as cl
 from chainlit.input_widget import Select, Slider
 
+from token_buffer import TokenBuffer
+
 CONTROLLER_URL = os.environ.get("LLAVA_CONTROLLER_URL")
 
 
@@ -242,23 +244,26 @@ async def request(conversation: Conversation, settings):
             timeout=10,
         ) as response:
             chainlit_message = cl.Message(content="")
-            async for chunk in response.content.iter_any():
-                for json_str in chunk.decode().split("\0"):
-                    if json_str:
-                        data = json.loads(json_str)
-
-                        if data["error_code"] == 0:
-                            output = data["text"][len(pload["prompt"]) :].strip()
-                            conversation.messages[-1][-1] = output + "▌"
-                            await chainlit_message.stream_token(
-                                output, is_sequence=True
-                            )
-                        else:
-                            output = (
-                                data["text"] + f" (error_code: {data['error_code']})"
-                            )
-                            conversation.messages[-1][-1] = output
-                            chainlit_message.content = output
+            # The worker sends the whole text so far, a frame keeps the latest
+            async with TokenBuffer(chainlit_message, is_sequence=True) as buffer:
+                async for chunk in response.content.iter_any():
+                    for json_str in chunk.decode().split("\0"):
+                        if json_str:
+                            data = json.loads(json_str)
+
+                            if data["error_code"] == 0:
+                                output = data["text"][len(pload["prompt"]) :].strip()
+                                conversation.messages[-1][-1] = output + "▌"
+                                await buffer.stream_token(output)
+                            else:
+                                output = (
+                                    data["text"]
+                                    + f" (error_code: {data['error_code']})"
+                                )
+                                conversation.messages[-1][-1] = output
+                                # A pending frame would overwrite the error
+                                await buffer.flush()
+                                chainlit_message.content = output
             await chainlit_message.send()
     return conversation
 
@@ -6,6 +6,8 @@ from langchain.schema.runnable.config import RunnableConfig
 
 import chainlit as cl
 
+from token_buffer import TokenBuffer
+
 model = Ollama(
     model="llama2",
 )
@@ -32,10 +34,11 @@ async def on_message(message: cl.Message):
 
     msg = cl.Message(content="")
 
-    for chunk in await cl.make_async(runnable.stream)(
-        {"question": message.content},
-        config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
-    ):
-        await msg.stream_token(chunk)
+    async with TokenBuffer(msg) as buffer:
+        for chunk in await cl.make_async(runnable.stream)(
+            {"question": message.content},
+            config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
+        ):
+            await buffer.stream_token(chunk)
 
     await msg.send()
@@ -2,6 +2,9 @@ import json
 import chainlit as cl
 from anthropic import AsyncAnthropic
 
+from token_buffer import TokenBuffer
+from tool_runner import ToolRunner
+
 SYSTEM = "you are a helpful assistant."
 MODEL_NAME = "claude-3-5-sonnet-latest"
 c = AsyncAnthropic()
@@ -55,8 +58,9 @@ async def call_claude(chat_messages):
         tools=tools,
         model=MODEL_NAME,
     ) as stream:
-        async for text in stream.text_stream:
-            await msg.stream_token(text)
+        async with TokenBuffer(msg) as buffer:
+            async for text in stream.text_stream:
+                await buffer.stream_token(text)
 
     await msg.send()
     response = await stream.get_final_message()
@@ -112,6 +116,7 @@ async def set_starters():
 @cl.on_chat_start
 async def on_start():
     cl.user_session.set("chat_messages", [])
+    cl.user_session.set("tool_runner", ToolRunner())
 
     await open_map()
 
@@ -123,8 +128,9 @@ async def on_message(msg: cl.Message):
     response = await call_claude(chat_messages)
 
     while response.stop_reason == "tool_use":
-        tool_use = next(block for block in response.content if block.type == "tool_use")
-        tool_result = await call_tool(tool_use)
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        tool_runner = cl.user_session.get("tool_runner")
+        tool_results = await tool_runner.run(tool_uses, call_tool)
 
         messages = [
             {"role": "assistant", "content": response.content},
@@ -136,6 +142,7 @@ async def on_message(msg: cl.Message):
                         "tool_use_id": tool_use.id,
                         "content": str(tool_result),
                     }
+                    for tool_use, tool_result in zip(tool_uses, tool_results)
                 ],
             },
         ]
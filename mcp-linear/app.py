@@ -5,6 +5,10 @@ import anthropic
 
 import chainlit as cl
 
+from mcp_router import ToolCatalog, ToolRouter
+from token_buffer import TokenBuffer
+from tool_runner import ToolRunner
+
 import os
 from dotenv import load_dotenv
 
@@ -48,25 +52,34 @@ async def show_linear_ticket(title, status, assignee, deadline, tags):
     return "the ticket was displayed to the user: " + str(props)
 
 
-def flatten(xss):
-    return [x for xs in xss for x in xs]
+# Tool lists of the MCP servers, reused across the chats of a user
+tool_catalog = ToolCatalog()
+
+
+def get_user_id():
+    user = cl.user_session.get("user")
+    return user.identifier if user else None
+
+
+def get_tool_router():
+    # MCP servers may connect before on_chat_start runs
+    tool_router = cl.user_session.get("tool_router")
+    if tool_router is None:
+        tool_router = ToolRouter(extra_tools=regular_tools)
+        cl.user_session.set("tool_router", tool_router)
+    return tool_router
 
 
 @cl.on_mcp_connect
 async def on_mcp(connection, session: ClientSession):
-    result = await session.list_tools()
-    tools = [
-        {
-            "name": t.name,
-            "description": t.description,
-            "input_schema": t.inputSchema,
-        }
-        for t in result.tools
-    ]
+    tools = await tool_catalog.get_tools(get_user_id(), connection, session)
+    get_tool_router().add_connection(connection.name, session, tools)
 
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    mcp_tools[connection.name] = tools
-    cl.user_session.set("mcp_tools", mcp_tools)
+
+@cl.on_mcp_disconnect
+async def on_mcp_disconnect(name: str, session: ClientSession):
+    tool_catalog.invalidate(get_user_id(), name)
+    get_tool_router().remove_connection(name, session)
 
 
 @cl.step(type="tool")
@@ -78,42 +91,31 @@ async def call_tool(tool_use):
     current_step.name = tool_name
 
     # Identify which mcp is used
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    mcp_name = None
-
-    for connection_name, tools in mcp_tools.items():
-        if any(tool.get("name") == tool_name for tool in tools):
-            mcp_name = connection_name
-            break
-
-    if not mcp_name:
+    tool_router = get_tool_router()
+    if not tool_router.route(tool_name):
         current_step.output = json.dumps(
             {"error": f"Tool {tool_name} not found in any MCP connection"}
         )
         return current_step.output
 
-    mcp_session, _ = cl.context.session.mcp_sessions.get(mcp_name)
-
-    if not mcp_session:
-        current_step.output = json.dumps(
-            {"error": f"MCP {mcp_name} not found in any MCP connection"}
-        )
-        return current_step.output
-
     try:
-        current_step.output = await mcp_session.call_tool(tool_name, tool_input)
+        current_step.output = await tool_router.call_tool(tool_name, tool_input)
     except Exception as e:
         current_step.output = json.dumps({"error": str(e)})
 
     return current_step.output
 
 
+async def run_tool(tool_use):
+    if tool_use.name == "show_linear_ticket":
+        return await show_linear_ticket(**tool_use.input)
+    return await call_tool(tool_use)
+
+
 async def call_claude(chat_messages):
     msg = cl.Message(content="")
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    regular_tools = cl.user_session.get("regular_tools", [])
-    # Flatten the tools from all MCP connections
-    tools = flatten([tools for _, tools in mcp_tools.items()]) + regular_tools
+    # MCP and regular tools, only rebuilt when an MCP connects or disconnects
+    tools = get_tool_router().tools
     print([tool.get("name") for tool in tools])
     async with anthropic_client.messages.stream(
         system=SYSTEM,
@@ -122,8 +124,9 @@ async def call_claude(chat_messages):
         tools=tools,
         model="claude-3-5-sonnet-20240620",
     ) as stream:
-        async for text in stream.text_stream:
-            await msg.stream_token(text)
+        async with TokenBuffer(msg) as buffer:
+            async for text in stream.text_stream:
+                await buffer.stream_token(text)
 
     await msg.send()
     response = await stream.get_final_message()
@@ -134,21 +137,29 @@ async def call_claude(chat_messages):
 @cl.on_chat_start
 async def start_chat():
     cl.user_session.set("chat_messages", [])
-    cl.user_session.set("regular_tools", regular_tools)
+    cl.user_session.set("tool_runner", ToolRunner())
 
 
 @cl.on_message
 async def on_message(msg: cl.Message):
+    if msg.content.strip() == "/mcp-stats":
+        stats = "\n".join(
+            f"- {name}: {summary}"
+            for name, summary in get_tool_router().stats().items()
+        )
+        await cl.Message(
+            content=f"MCP tool latency:\n{stats or 'no MCP connected'}"
+        ).send()
+        return
+
     chat_messages = cl.user_session.get("chat_messages")
     chat_messages.append({"role": "user", "content": msg.content})
     response = await call_claude(chat_messages)
 
     while response.stop_reason == "tool_use":
-        tool_use = next(block for block in response.content if block.type == "tool_use")
-        if tool_use.name == "show_linear_ticket":
-            tool_result = await show_linear_ticket(**tool_use.input)
-        else:
-            tool_result = await call_tool(tool_use)
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        tool_runner = cl.user_session.get("tool_runner")
+        tool_results = await tool_runner.run(tool_uses, run_tool)
 
         messages = [
             {"role": "assistant", "content": response.content},
@@ -160,6 +171,7 @@ async def on_message(msg: cl.Message):
                         "tool_use_id": tool_use.id,
                         "content": str(tool_result),
                     }
+                    for tool_use, tool_result in zip(tool_uses, tool_results)
                 ],
             },
         ]
@@ -0,0 +1,38 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, List
+
+
+class ToolRunner:
+    """Run all the tool calls of a model turn concurrently.
+
+    At most `max_concurrency` tools run at once for the session that owns the
+    runner, each one is cancelled after `timeout` seconds, and results come
+    back in the same order as the calls so they can be sent to the model as
+    is. A tool that fails or times out yields a JSON error instead of
+    aborting the other calls.
+    """
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 60):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(
+        self, calls: List[Any], execute: Callable[[Any], Awaitable[Any]]
+    ) -> List[Any]:
+        return await asyncio.gather(*(self.start(call, execute) for call in calls))
+
+    def start(
+        self, call: Any, execute: Callable[[Any], Awaitable[Any]]
+    ) -> "asyncio.Future":
+        """Start one call right away, e.g. as soon as its arguments streamed in."""
+        return asyncio.ensure_future(self._run_one(call, execute))
+
+    async def _run_one(self, call, execute):
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(execute(call), self.timeout)
+            except asyncio.TimeoutError:
+                return json.dumps({"error": f"Tool timed out after {self.timeout}s"})
+            except Exception as e:
+                return json.dumps({"error": str(e)})
@@ -5,24 +5,41 @@ import anthropic
 
 import chainlit as cl
 
+from mcp_router import ToolCatalog, ToolRouter
+from token_buffer import TokenBuffer
+from tool_runner import ToolRunner
+
 anthropic_client = anthropic.AsyncAnthropic()
 SYSTEM = "you are a helpful assistant."
 
-def flatten(xss):
-    return [x for xs in xss for x in xs]
+# Tool lists of the MCP servers, reused across the chats of a user
+tool_catalog = ToolCatalog()
+
+
+def get_user_id():
+    user = cl.user_session.get("user")
+    return user.identifier if user else None
+
+
+def get_tool_router():
+    # MCP servers may connect before on_chat_start runs
+    tool_router = cl.user_session.get("tool_router")
+    if tool_router is None:
+        tool_router = ToolRouter()
+        cl.user_session.set("tool_router", tool_router)
+    return tool_router
+
 
 @cl.on_mcp_connect
 async def on_mcp(connection, session: ClientSession):
-    result = await session.list_tools()
-    tools = [{
-        "name": t.name,
-        "description": t.description,
-        "input_schema": t.inputSchema,
-        } for t in result.tools]
-    
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    mcp_tools[connection.name] = tools
-    cl.user_session.set("mcp_tools", mcp_tools)
+    tools = await tool_catalog.get_tools(get_user_id(), connection, session)
+    get_tool_router().add_connection(connection.name, session, tools)
+
+
+@cl.on_mcp_disconnect
+async def on_mcp_disconnect(name: str, session: ClientSession):
+    tool_catalog.invalidate(get_user_id(), name)
+    get_tool_router().remove_connection(name, session)
 
 
 @cl.step(type="tool") 
@@ -34,26 +51,13 @@ async def call_tool(tool_use):
     current_step.name = tool_name
     
     # Identify which mcp is used
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    mcp_name = None
-    
-    for connection_name, tools in mcp_tools.items():
-        if any(tool.get("name") == tool_name for tool in tools):
-            mcp_name = connection_name
-            break
-    
-    if not mcp_name:
+    tool_router = get_tool_router()
+    if not tool_router.route(tool_name):
         current_step.output = json.dumps({"error": f"Tool {tool_name} not found in any MCP connection"})
         return current_step.output
     
-    mcp_session, _ = cl.context.session.mcp_sessions.get(mcp_name)
-    
-    if not mcp_session:
-        current_step.output = json.dumps({"error": f"MCP {mcp_name} not found in any MCP connection"})
-        return current_step.output
-    
     try:
-        current_step.output = await mcp_session.call_tool(tool_name, tool_input)
+        current_step.output = await tool_router.call_tool(tool_name, tool_input)
     except Exception as e:
         current_step.output = json.dumps({"error": str(e)})
     
@@ -61,9 +65,8 @@ async def call_tool(tool_use):
 
 async def call_claude(chat_messages):
     msg = cl.Message(content="")
-    mcp_tools = cl.user_session.get("mcp_tools", {})
-    # Flatten the tools from all MCP connections
-    tools = flatten([tools for _, tools in mcp_tools.items()])
+    # Only rebuilt when an MCP connects or disconnects
+    tools = get_tool_router().tools
     
     async with anthropic_client.messages.stream(
         system=SYSTEM,
@@ -72,8 +75,9 @@ async def call_claude(chat_messages):
         tools=tools,
         model="claude-3-5-sonnet-20240620",
     ) as stream:
-        async for text in stream.text_stream:
-            await msg.stream_token(text)
+        async with TokenBuffer(msg) as buffer:
+            async for text in stream.text_stream:
+                await buffer.stream_token(text)
     
     await msg.send()
     response = await stream.get_final_message()
@@ -83,16 +87,25 @@ async def call_claude(chat_messages):
 @cl.on_chat_start
 async def start_chat():
     cl.user_session.set("chat_messages", [])
+    cl.user_session.set("tool_runner", ToolRunner())
 
 @cl.on_message
 async def on_message(msg: cl.Message):   
+    if msg.content.strip() == "/mcp-stats":
+        stats = "\n".join(
+            f"- {name}: {summary}" for name, summary in get_tool_router().stats().items()
+        )
+        await cl.Message(content=f"MCP tool latency:\n{stats or 'no MCP connected'}").send()
+        return
+
     chat_messages = cl.user_session.get("chat_messages")
     chat_messages.append({"role": "user", "content": msg.content})
     response = await call_claude(chat_messages)
     
     while response.stop_reason == "tool_use":
-        tool_use = next(block for block in response.content if block.type == "tool_use")
-        tool_result = await call_tool(tool_use)
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        tool_runner = cl.user_session.get("tool_runner")
+        tool_results = await tool_runner.run(tool_uses, call_tool)
 
         messages = [
             {"role": "assistant", "content": response.content},
@@ -104,6 +117,7 @@ async def on_message(msg: cl.Message):
                         "tool_use_id": tool_use.id,
                         "content": str(tool_result),
                     }
+                    for tool_use, tool_result in zip(tool_uses, tool_results)
                 ],
             },
         ]
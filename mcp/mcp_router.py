@@ -0,0 +1,161 @@
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp import ClientSession
+
+
+def to_anthropic_tools(result) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": t.name,
+            "description": t.description,
+            "input_schema": t.inputSchema,
+        }
+        for t in result.tools
+    ]
+
+
+class LatencyStats:
+    """Tool-call latencies of one MCP server, over the last `window` calls."""
+
+    def __init__(self, window: int = 256):
+        self.calls = 0
+        self.errors = 0
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool = True):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"calls": self.calls, "errors": self.errors}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": round(percentile(0.5) * 1000, 1),
+            "p95_ms": round(percentile(0.95) * 1000, 1),
+            "max_ms": round(samples[-1] * 1000, 1),
+        }
+
+
+class ToolRouter:
+    """Route tool calls of one chat session to the MCP server providing them.
+
+    The tool name index and the combined tool list are only rebuilt when an
+    MCP server connects or disconnects. Between those, `tools` is the same
+    list object on every model turn and a tool call is a dict lookup.
+    """
+
+    def __init__(self, extra_tools: Optional[List[Dict[str, Any]]] = None):
+        self.extra_tools = list(extra_tools or [])
+        self.tools: List[Dict[str, Any]] = list(self.extra_tools)
+        self.latency: Dict[str, LatencyStats] = {}
+        self._connections: Dict[str, Tuple[ClientSession, List[Dict[str, Any]]]] = {}
+        self._routes: Dict[str, str] = {}
+
+    def add_connection(
+        self, name: str, session: ClientSession, tools: List[Dict[str, Any]]
+    ):
+        self._connections[name] = (session, tools)
+        self.latency.setdefault(name, LatencyStats())
+        self._rebuild()
+
+    def remove_connection(self, name: str, session: Optional[ClientSession] = None):
+        # Chainlit reports a reconnect's new session before the old one is
+        # disconnected, so only drop the entry if it still is that old session.
+        current = self._connections.get(name)
+        if current is None or (session is not None and current[0] is not session):
+            return
+        del self._connections[name]
+        self._rebuild()
+
+    def route(self, tool_name: str) -> Optional[str]:
+        return self._routes.get(tool_name)
+
+    async def call_tool(self, tool_name: str, tool_input: Dict[str, Any]):
+        connection_name = self._routes.get(tool_name)
+        if connection_name is None:
+            raise KeyError(f"Tool {tool_name} not found in any MCP connection")
+        session, _ = self._connections[connection_name]
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await session.call_tool(tool_name, tool_input)
+            ok = not getattr(result, "isError", False)
+            return result
+        finally:
+            self.latency[connection_name].record(time.perf_counter() - start, ok)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.summary() for name, stats in self.latency.items()}
+
+    def _rebuild(self):
+        routes = {}
+        tools = []
+        for name, (_, connection_tools) in self._connections.items():
+            for tool in connection_tools:
+                # First connection wins on a name clash, like the linear scan did
+                if tool["name"] not in routes:
+                    routes[tool["name"]] = name
+                    tools.append(tool)
+        self._routes = routes
+        self.tools = tools + self.extra_tools
+
+
+class ToolCatalog:
+    """Tool lists of MCP servers, shared by all chats of the same user.
+
+    Chainlit opens MCP connections per chat session and closes them when the
+    session ends, so a new chat reconnects every server. Keying the tool list
+    on the user and the server's connection settings lets that reconnect
+    skip `list_tools` and the rebuild of the schemas.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Any, Tuple[float, List[Dict[str, Any]]]] = {}
+
+    @staticmethod
+    def key(user_id: str, connection) -> Tuple:
+        return (
+            user_id,
+            connection.name,
+            getattr(connection, "clientType", None),
+            getattr(connection, "url", None),
+            getattr(connection, "command", None),
+            tuple(getattr(connection, "args", None) or ()),
+            tuple(sorted((getattr(connection, "headers", None) or {}).items())),
+        )
+
+    async def get_tools(
+        self, user_id: Optional[str], connection, session: ClientSession
+    ) -> List[Dict[str, Any]]:
+        if user_id is None:
+            # Anonymous chats can't be told apart, never share their tools
+            return to_anthropic_tools(await session.list_tools())
+
+        key = self.key(user_id, connection)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        tools = to_anthropic_tools(await session.list_tools())
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(min(self._entries, key=lambda k: self._entries[k][0]))
+        self._entries[key] = (time.monotonic(), tools)
+        return tools
+
+    def invalidate(self, user_id: Optional[str], name: str):
+        for key in [k for k in self._entries if k[0] == user_id and k[1] == name]:
+            del self._entries[key]
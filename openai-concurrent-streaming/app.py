@@ -4,6 +4,8 @@ import asyncio
 
 from openai import AsyncClient
 
+from token_buffer import TokenBuffer
+
 openai_client = AsyncClient(api_key=os.environ.get("OPENAI_API_KEY"))
 
 
@@ -40,9 +42,10 @@ async def answer_as(name):
         stream=True,
         **settings,
     )
-    async for part in stream:
-        if token := part.choices[0].delta.content or "":
-            await msg.stream_token(token)
+    async with TokenBuffer(msg) as buffer:
+        async for part in stream:
+            if token := part.choices[0].delta.content or "":
+                await buffer.stream_token(token)
 
     # Need to add the information that it was the author who answered but OpenAI only allows assistant.
     # simplified for the purpose of the demo.
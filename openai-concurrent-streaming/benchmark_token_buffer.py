@@ -0,0 +1,77 @@
+"""Compare websocket emits and CPU time with and without `TokenBuffer`.
+
+Simulates many concurrent sessions streaming model tokens into a stand-in for
+`cl.Message` whose `stream_token` does the work of one socket emit (building
+and serializing the payload). No API key or Chainlit server is needed:
+
+    python benchmark_token_buffer.py --sessions 100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from token_buffer import TokenBuffer
+
+
+class FakeMessage:
+    def __init__(self):
+        self.content = ""
+        self.emits = 0
+
+    async def stream_token(self, token: str):
+        self.content += token
+        self.emits += 1
+        json.dumps({"id": "message-id", "token": token, "isSequence": False})
+        await asyncio.sleep(0)
+
+
+async def fake_model_stream(tokens: int, tokens_per_second: float):
+    delay = 1 / tokens_per_second
+    for i in range(tokens):
+        await asyncio.sleep(random.uniform(0, 2 * delay))
+        yield f" tok{i}"
+
+
+async def session(coalesce: bool, args) -> FakeMessage:
+    msg = FakeMessage()
+    stream = fake_model_stream(args.tokens, args.tokens_per_second)
+    if coalesce:
+        async with TokenBuffer(msg, interval=args.interval) as buffer:
+            async for token in stream:
+                await buffer.stream_token(token)
+    else:
+        async for token in stream:
+            await msg.stream_token(token)
+    return msg
+
+
+async def run(coalesce: bool, args):
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    messages = await asyncio.gather(
+        *(session(coalesce, args) for _ in range(args.sessions))
+    )
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    emits = sum(m.emits for m in messages)
+    label = "coalesced" if coalesce else "per-token"
+    print(f"{label:>10}: {emits:7d} emits, cpu {cpu:6.2f}s, wall {wall:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--interval", type=float, default=0.04)
+    args = parser.parse_args()
+
+    asyncio.run(run(False, args))
+    asyncio.run(run(True, args))
+
+
+if __name__ == "__main__":
+    main()
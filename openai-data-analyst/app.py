@@ -13,6 +13,8 @@ from chainlit.element import Element
 from chainlit.context import local_steps
 from openai.types.beta.threads.runs import RunStep
 
+from token_buffer import TokenBuffer
+
 
 async_openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 sync_openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
@@ -29,6 +31,8 @@ class EventHandler(AsyncAssistantEventHandler):
         super().__init__()
         self.current_message: cl.Message = None
         self.current_step: cl.Step = None
+        self.text_buffer: TokenBuffer = None
+        self.input_buffer: TokenBuffer = None
         self.current_tool_call = None
         self.assistant_name = assistant_name
         previous_steps = local_steps.get() or []
@@ -43,12 +47,14 @@ class EventHandler(AsyncAssistantEventHandler):
         self.current_message = await cl.Message(
             author=self.assistant_name, content=""
         ).send()
+        self.text_buffer = TokenBuffer(self.current_message)
 
     async def on_text_delta(self, delta, snapshot):
         if delta.value:
-            await self.current_message.stream_token(delta.value)
+            await self.text_buffer.stream_token(delta.value)
 
     async def on_text_done(self, text):
+        await self.text_buffer.flush()
         await self.current_message.update()
         if text.annotations:
             for annotation in text.annotations:
@@ -85,9 +91,11 @@ class EventHandler(AsyncAssistantEventHandler):
         self.current_step.show_input = "python"
         self.current_step.start = utc_now()
         await self.current_step.send()
+        self.input_buffer = TokenBuffer(self.current_step, is_input=True)
 
     async def on_tool_call_delta(self, delta, snapshot):
         if snapshot.id != self.current_tool_call:
+            await self._flush_input()
             self.current_tool_call = snapshot.id
             self.current_step = cl.Step(
                 name=delta.type, type="tool", parent_id=self.parent_id
@@ -99,12 +107,14 @@ class EventHandler(AsyncAssistantEventHandler):
                 self.current_step.name = snapshot.function.name
                 self.current_step.language = "json"
             await self.current_step.send()
+            self.input_buffer = TokenBuffer(self.current_step, is_input=True)
 
         if delta.type == "function":
             pass
 
         if delta.type == "code_interpreter":
             if delta.code_interpreter.outputs:
+                await self._flush_input()
                 for output in delta.code_interpreter.outputs:
                     if output.type == "logs":
                         self.current_step.output += output.logs
@@ -116,9 +126,7 @@ class EventHandler(AsyncAssistantEventHandler):
                         self.current_step.output = output.image.model_dump_json()
             else:
                 if delta.code_interpreter.input:
-                    await self.current_step.stream_token(
-                        delta.code_interpreter.input, is_input=True
-                    )
+                    await self.input_buffer.stream_token(delta.code_interpreter.input)
 
     async def on_event(self, event) -> None:
         if event.event == "error":
@@ -127,7 +135,18 @@ class EventHandler(AsyncAssistantEventHandler):
     async def on_exception(self, exception: Exception) -> None:
         return cl.ErrorMessage(content=str(exception)).send()
 
+    async def on_end(self) -> None:
+        # The run can end or fail between deltas, do not drop their tail
+        if self.text_buffer:
+            await self.text_buffer.flush()
+        await self._flush_input()
+
+    async def _flush_input(self):
+        if self.input_buffer:
+            await self.input_buffer.flush()
+
     async def on_tool_call_done(self, tool_call):
+        await self._flush_input()
         self.current_step.end = utc_now()
         await self.current_step.update()
 
@@ -0,0 +1,77 @@
+"""
+Compare conversation truncation with and without cached token counts.
+
+The legacy path re-encodes the whole history on every loop iteration, the
+ConversationBuffer only encodes each message once when it is appended.
+
+    python benchmark_conversation.py
+"""
+import time
+
+import tiktoken
+
+from functions.ConversationBuffer import ConversationBuffer
+
+max_tokens = 5000
+
+
+def legacy_token_count(conversation):
+    encoding = tiktoken.encoding_for_model("gpt-4")
+    num_tokens = 0
+    for message in conversation:
+        num_tokens += 4
+        for key, value in message.items():
+            num_tokens += len(encoding.encode(str(value)))
+            if key == "name":
+                num_tokens += -1
+    num_tokens += 2
+    return num_tokens
+
+
+def legacy_truncate(conversation):
+    system_con = conversation[0]
+    conversation = conversation[1:]
+    while legacy_token_count(conversation) > max_tokens and len(conversation) > 1:
+        conversation.pop(1)
+    conversation.insert(0, system_con)
+    return conversation
+
+
+def make_messages(n):
+    messages = [{"role": "system", "content": "you are a helpful assistant"}]
+    for i in range(n):
+        role = "user" if i % 2 == 0 else "assistant"
+        content = f"message {i} " + "lorem ipsum " * 40
+        messages.append({"role": role, "content": content})
+    return messages
+
+
+def main():
+    for n in (10, 100, 1000):
+        messages = make_messages(n)
+
+        start = time.perf_counter()
+        legacy_truncate(list(messages))
+        legacy = time.perf_counter() - start
+
+        # Appends are tokenized as messages arrive, count them separately
+        start = time.perf_counter()
+        buffer = ConversationBuffer()
+        for message in messages:
+            buffer.append(message)
+        appends = time.perf_counter() - start
+
+        start = time.perf_counter()
+        buffer.truncate(max_tokens)
+        buffer.to_list()
+        truncate = time.perf_counter() - start
+
+        print(
+            f"{n:5d} messages: legacy {legacy * 1000:9.1f} ms, "
+            f"buffer appends {appends * 1000:7.1f} ms total, "
+            f"truncate {truncate * 1000:6.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
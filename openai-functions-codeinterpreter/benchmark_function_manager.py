@@ -0,0 +1,75 @@
+"""
+Measure per-request FunctionManager overhead.
+
+Compares building the functions array from scratch (what every request used to
+pay) with the cached array, and the cost of argument checks on dispatch.
+
+    python benchmark_function_manager.py
+"""
+import asyncio
+import builtins
+import time
+
+from functions.FunctionManager import CompiledFunction, FunctionManager
+
+
+def make_function(i):
+    async def tool(path: str, count: int, ratio: float = 1.0, verbose: bool = False):
+        """
+        Example tool used for the benchmark.
+        Parameters:
+            path: The path to work on.
+            count: How many times to run.
+            ratio: A ratio between 0 and 1.
+            verbose: Whether to log more.
+        """
+        return {"path": path, "count": count}
+
+    tool.__name__ = f"tool_{i}"
+    return tool
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def dispatch(manager, repeat):
+    arguments = {"path": "src", "count": "3", "verbose": "true"}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await manager.call_function("tool_0", arguments)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    functions = [make_function(i) for i in range(20)]
+    manager = FunctionManager(functions=functions)
+    repeat = 1000
+
+    uncached = timed(lambda: [CompiledFunction(f).schema for f in functions], 100)
+    cached = timed(manager.generate_functions_array, repeat)
+    print(
+        f"schemas for {len(functions)} functions: "
+        f"rebuilt {uncached:8.1f} us, cached {cached:6.2f} us per request"
+    )
+
+    compiled = manager.compiled["tool_0"]
+    arguments = {"path": "src", "count": "3", "verbose": "true"}
+    prepare = timed(lambda: compiled.prepare_arguments(arguments), repeat)
+    print(f"argument checks and coercion: {prepare:6.2f} us per call")
+
+    # call_function logs every call, keep that out of the timing
+    original_print = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        total = asyncio.run(dispatch(manager, repeat))
+    finally:
+        builtins.print = original_print
+    print(f"call_function dispatch: {total:6.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
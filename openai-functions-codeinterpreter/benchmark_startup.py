@@ -0,0 +1,42 @@
+"""
+Measure plugin loading at startup, without and with the plugin manifest.
+
+Each measurement runs in a fresh interpreter so no module is already imported.
+
+    python benchmark_startup.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+LOAD = """
+import time
+start = time.perf_counter()
+from functions.FunctionManager import FunctionManager
+from functions.PluginLoader import PluginLoader
+manager = FunctionManager()
+PluginLoader(manifest_path={manifest!r}).load(manager)
+manager.generate_functions_array()
+elapsed = time.perf_counter() - start
+print(f"{{elapsed * 1000:.1f}} ms, {{len(sys.modules)}} modules loaded")
+"""
+
+
+def run(manifest_path):
+    code = "import sys\n" + LOAD.format(manifest=manifest_path)
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_path = os.path.join(tmp, "manifest.json")
+        print("cold start (no manifest):", run(manifest_path))
+        print("warm start (manifest):   ", run(manifest_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from collections import deque
+from functools import lru_cache
+
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model="gpt-4"):
+    # 每个进程只加载一次编码
+    return tiktoken.encoding_for_model(model)
+
+
+# https://github.com/openai/openai-cookbook/blob/main/examples/How_to_count_tokens_with_tiktoken.ipynb
+def count_message_tokens(message, model="gpt-4"):
+    encoding = get_encoding(model)
+    # every message follows <im_start>{role/name}\n{content}<im_end>\n
+    num_tokens = 4
+    for key, value in message.items():
+        num_tokens += len(encoding.encode(str(value)))
+        if key == "name":  # if there's a name, the role is omitted
+            num_tokens += -1  # role is always required and always 1 token
+    return num_tokens
+
+
+class ConversationBuffer:
+    """
+    Message history that keeps a running token count.
+
+    Each message is tokenized once when it is appended. Truncation drops the
+    oldest messages after the first `pinned` ones (the system prompt and the
+    first user message by default), one O(1) pop per removed message.
+    """
+
+    # every reply is primed with <im_start>assistant
+    REPLY_PRIMING_TOKENS = 2
+
+    def __init__(self, messages=None, pinned=2, model="gpt-4"):
+        self.pinned = pinned
+        self.model = model
+        self._head = []
+        self._tail = deque()
+        self.total_tokens = self.REPLY_PRIMING_TOKENS
+        for message in messages or []:
+            self.append(message)
+
+    def append(self, message):
+        num_tokens = count_message_tokens(message, self.model)
+        if len(self._head) < self.pinned:
+            self._head.append((message, num_tokens))
+        else:
+            self._tail.append((message, num_tokens))
+        self.total_tokens += num_tokens
+
+    def truncate(self, max_tokens):
+        """
+        Drop the oldest unpinned messages until the conversation fits in
+        `max_tokens`, always keeping at least one of them.
+        """
+        while self.total_tokens > max_tokens and len(self._tail) > 1:
+            _, num_tokens = self._tail.popleft()
+            self.total_tokens -= num_tokens
+
+    def to_list(self):
+        return [message for message, _ in self._head] + [
+            message for message, _ in self._tail
+        ]
+
+    def __len__(self):
+        return len(self._head) + len(self._tail)
+
+    def __iter__(self):
+        return iter(self.to_list())
@@ -1,3 +1,4 @@
+import importlib
 import inspect
 import json
 import re
@@ -5,100 +6,225 @@ import re
 import requests
 
 
-class FunctionManager:
-    def __init__(self, functions=None):
-        self.functions = {}
-        self.excluded_functions = {"inspect", "create_engine"}  # 添加这行
-        if functions:
-            for func in functions:
-                self.functions[func.__name__] = func
+TYPE_MAPPING = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "dict": "object",
+}
 
-    def add_function(self, func):
-        self.functions[func.__name__] = func
 
-    def generate_functions_array(self):
-        type_mapping = {
-            "str": "string",
-            "int": "integer",
-            "float": "number",
-            "bool": "boolean",
-            "list": "array",
-            "dict": "object",
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def _from_json(expected_type):
+    def coerce(value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        if not isinstance(value, expected_type):
+            raise TypeError(f"expected {expected_type.__name__}")
+        return value
+
+    return coerce
+
+
+# 模型返回的参数类型不一定正确，按注解做一次转换
+COERCERS = {
+    "str": lambda value: value if isinstance(value, str) else json.dumps(value),
+    "int": int,
+    "float": float,
+    "bool": _to_bool,
+    "list": _from_json(list),
+    "dict": _from_json(dict),
+}
+
+
+class CompiledFunction:
+    """
+    A registered function with its JSON schema and argument checks built once.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+
+        # 获取函数的文档字符串和参数列表
+        docstring = function.__doc__ or ""
+        parameters = inspect.signature(function).parameters
+
+        # 提取函数描述
+        docstring_lines = docstring.strip().split("\n") if docstring else []
+        function_description = docstring_lines[0].strip() if docstring_lines else ""
+
+        # 解析参数列表并生成函数描述
+        self.schema = {
+            "name": self.name,
+            "description": function_description,
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": [],  # Add a required field
+            },
+        }
+
+        self.accepts_kwargs = any(
+            parameter.kind == inspect.Parameter.VAR_KEYWORD
+            for parameter in parameters.values()
+        )
+        self.accepted = {
+            name
+            for name, parameter in parameters.items()
+            if parameter.kind
+            not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
         }
-        functions_array = []
+        self.required = [
+            name
+            for name, parameter in parameters.items()
+            if name in self.accepted and parameter.default == inspect.Parameter.empty
+        ]
+        self.coercers = {}
 
-        for function_name, function in self.functions.items():
-            if function_name in self.excluded_functions:  # 添加这行
+        for parameter_name, parameter in parameters.items():
+            # 获取参数的注释
+            parameter_annotation = parameter.annotation
+            if parameter_annotation == inspect.Parameter.empty:
                 continue
-            # 获取函数的文档字符串和参数列表
-            docstring = function.__doc__
-            parameters = inspect.signature(function).parameters
-
-            # 提取函数描述
-            docstring_lines = docstring.strip().split("\n") if docstring else []
-            function_description = docstring_lines[0].strip() if docstring_lines else ""
-
-            # 解析参数列表并生成函数描述
-            function_info = {
-                "name": function_name,
-                "description": function_description,
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": [],  # Add a required field
-                },
+
+            # 如果注解是一个类型，获取它的名字
+            # 如果注解是一个字符串，直接使用它
+            if isinstance(parameter_annotation, type):
+                parameter_annotation_name = parameter_annotation.__name__.lower()
+            else:
+                parameter_annotation_name = parameter_annotation.lower()
+
+            # 提取参数描述，第一处匹配即为描述
+            param_description_match = re.search(
+                rf"{re.escape(parameter_name)}: (.+)", docstring
+            )
+            param_description = (
+                param_description_match.group(1) if param_description_match else ""
+            )
+
+            # 添加参数描述
+            self.schema["parameters"]["properties"][parameter_name] = {
+                "type": TYPE_MAPPING.get(
+                    parameter_annotation_name, parameter_annotation_name
+                ),
+                "description": param_description,
             }
 
-            for parameter_name, parameter in parameters.items():
-                # 获取参数的注释
-                parameter_annotation = parameter.annotation
-                if parameter_annotation == inspect.Parameter.empty:
-                    continue
-
-                # 如果注解是一个类型，获取它的名字
-                # 如果注解是一个字符串，直接使用它
-                if isinstance(parameter_annotation, type):
-                    parameter_annotation_name = parameter_annotation.__name__.lower()
-                else:
-                    parameter_annotation_name = parameter_annotation.lower()
-
-                # 提取参数描述
-                param_description_pattern = rf"{parameter_name}: (.+)"
-                param_description_match = [
-                    re.search(param_description_pattern, line)
-                    for line in docstring_lines
-                ]
-                param_description = next(
-                    (match.group(1) for match in param_description_match if match), ""
-                )
+            # If the parameter has no default value, add it to the required field.
+            if parameter.default == inspect.Parameter.empty:
+                self.schema["parameters"]["required"].append(parameter_name)
+
+            if parameter_annotation_name in COERCERS:
+                self.coercers[parameter_name] = COERCERS[parameter_annotation_name]
 
-                # 添加参数描述
-                parameter_description = {
-                    "type": type_mapping.get(
-                        parameter_annotation_name, parameter_annotation_name
-                    ),
-                    "description": param_description,
-                }
-                function_info["parameters"]["properties"][parameter_name] = (
-                    parameter_description
+    def prepare_arguments(self, args_dict):
+        """
+        Check and coerce the model's arguments before calling the function.
+        """
+        missing = [name for name in self.required if name not in args_dict]
+        if missing:
+            raise ValueError(
+                f"Function '{self.name}' missing required arguments: {missing}"
+            )
+        if not self.accepts_kwargs:
+            unexpected = [name for name in args_dict if name not in self.accepted]
+            if unexpected:
+                raise ValueError(
+                    f"Function '{self.name}' got unexpected arguments: {unexpected}"
                 )
 
-                # If the parameter has no default value, add it to the required field.
-                if parameter.default == inspect.Parameter.empty:
-                    function_info["parameters"]["required"].append(parameter_name)
+        arguments = {}
+        for name, value in args_dict.items():
+            coerce = self.coercers.get(name)
+            if coerce is not None and value is not None:
+                try:
+                    value = coerce(value)
+                except (TypeError, ValueError) as e:
+                    raise ValueError(
+                        f"Function '{self.name}' argument '{name}' is invalid: {e}"
+                    )
+            arguments[name] = value
+        return arguments
+
+
+class LazyFunction:
+    """
+    A function known only by its cached schema until it is first called.
+    """
+
+    def __init__(self, schema, module_name):
+        self.name = schema["name"]
+        self.schema = schema
+        self.module_name = module_name
+
+    def resolve(self):
+        module = importlib.import_module(self.module_name)
+        return CompiledFunction(getattr(module, self.name))
+
 
-            functions_array.append(function_info)
+class FunctionManager:
+    def __init__(self, functions=None):
+        self.functions = {}
+        self.compiled = {}
+        self.excluded_functions = {"inspect", "create_engine"}  # 添加这行
+        # 每次注册或移除函数都会增加版本号，缓存的函数列表随之失效
+        self.version = 0
+        self._functions_array = None
+        self._functions_array_version = -1
+        if functions:
+            for func in functions:
+                self.add_function(func)
 
-        return functions_array
+    def add_function(self, func):
+        self.functions[func.__name__] = func
+        if func.__name__ not in self.excluded_functions:
+            self.compiled[func.__name__] = CompiledFunction(func)
+        self.version += 1
+
+    def add_lazy_function(self, schema, module_name):
+        """
+        Register a function from a cached schema, its module is only imported
+        when the function is first called.
+        """
+        if schema["name"] in self.excluded_functions:
+            return
+        self.compiled[schema["name"]] = LazyFunction(schema, module_name)
+        self.version += 1
+
+    def remove_function(self, function_name):
+        self.functions.pop(function_name, None)
+        self.compiled.pop(function_name, None)
+        self.version += 1
+
+    def generate_functions_array(self):
+        if self._functions_array_version != self.version:
+            self._functions_array = [
+                compiled.schema for compiled in self.compiled.values()
+            ]
+            self._functions_array_version = self.version
+        return self._functions_array
 
     async def call_function(self, function_name, args_dict):
-        if function_name not in self.functions:
+        if function_name not in self.compiled:
             raise ValueError(f"Function '{function_name}' not found")
 
-        function = self.functions[function_name]
+        compiled = self.compiled[function_name]
+        if isinstance(compiled, LazyFunction):
+            # The schema is unchanged, so the registry version stays the same
+            compiled = self.compiled[function_name] = compiled.resolve()
+            self.functions[function_name] = compiled.function
+        arguments = compiled.prepare_arguments(args_dict)
         # {"role": "function", "name": "get_current_weather", "content": "{\"temperature\": "22", \"unit\": \"celsius\", \"description\": \"Sunny\"}"}
-        print(function, args_dict)
-        res = await function(**args_dict)
+        print(compiled.function, arguments)
+        res = await compiled.function(**arguments)
         # 如果返回的内容是元祖或者列表或者字典，那么就返回一个json字符串
         if isinstance(res, (tuple, list, dict)):
             res = json.dumps(res)
@@ -0,0 +1,96 @@
+import importlib
+import inspect
+import json
+import os
+
+
+class PluginLoader:
+    """
+    Discover plugins and register their functions with a FunctionManager.
+
+    The function schemas of every plugin are stored in a manifest together
+    with the mtimes of the plugin's files. When nothing changed the schemas
+    are taken from the manifest and the plugin module is only imported the
+    first time one of its functions is called.
+    """
+
+    def __init__(self, plugins_dir="plugins", manifest_path=".plugin_manifest.json"):
+        self.plugins_dir = plugins_dir
+        self.manifest_path = manifest_path
+
+    def load(self, function_manager):
+        manifest = self._read_manifest()
+        new_manifest = {}
+
+        # 获取plugins目录下所有的子目录，忽略名为'__pycache__'的目录
+        plugin_dirs = sorted(
+            d
+            for d in os.listdir(self.plugins_dir)
+            if os.path.isdir(os.path.join(self.plugins_dir, d)) and d != "__pycache__"
+        )
+
+        # 遍历每个子目录（即每个插件）
+        for dir in plugin_dirs:
+            module_name = f"{os.path.basename(self.plugins_dir)}.{dir}.functions"
+            fingerprint = self._fingerprint(dir)
+            entry = manifest.get(dir)
+
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                if entry["enabled"]:
+                    for schema in entry["functions"]:
+                        function_manager.add_lazy_function(schema, module_name)
+            else:
+                entry = self._scan(dir, module_name, fingerprint, function_manager)
+            new_manifest[dir] = entry
+
+        if new_manifest != manifest:
+            self._write_manifest(new_manifest)
+
+    def _scan(self, dir, module_name, fingerprint, function_manager):
+        # 尝试读取插件的配置文件
+        try:
+            with open(os.path.join(self.plugins_dir, dir, "config.json"), "r") as f:
+                config = json.load(f)
+            enabled = config.get("enabled", True)
+        except FileNotFoundError:
+            # 如果配置文件不存在，我们默认这个插件应该被导入
+            enabled = True
+
+        entry = {"fingerprint": fingerprint, "enabled": enabled, "functions": []}
+        # 检查这个插件是否应该被导入
+        if not enabled:
+            return entry
+
+        # 动态导入每个插件的functions模块
+        module = importlib.import_module(module_name)
+
+        # 获取模块中的所有函数并注册，同时记录它们的描述
+        for name, obj in inspect.getmembers(module):
+            if not inspect.isfunction(obj):
+                continue
+            function_manager.add_function(obj)
+            if name not in function_manager.excluded_functions:
+                entry["functions"].append(function_manager.compiled[name].schema)
+        return entry
+
+    def _fingerprint(self, dir):
+        plugin_path = os.path.join(self.plugins_dir, dir)
+        return {
+            entry.name: entry.stat().st_mtime_ns
+            for entry in os.scandir(plugin_path)
+            if entry.is_file()
+            and (entry.name.endswith(".py") or entry.name == "config.json")
+        }
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
@@ -1,11 +1,27 @@
 import abc
+import asyncio
+import hashlib
+import importlib
+import multiprocessing
+import os
+import shutil
+import signal
+import site
+import stat
 import sys
+import tempfile
 import io
 import ast
 import subprocess
+from collections import OrderedDict
 from contextlib import redirect_stdout
 from loguru import logger
 
+try:
+    import resource
+except ImportError:  # Windows has no resource limits
+    resource = None
+
 logger.configure(
     handlers=[
         {
@@ -23,71 +39,410 @@ class Executor(abc.ABC):
         pass
 
 
-class PythonExecutor(Executor):
-    locals = {}
-
-    def execute(self, code: str) -> str:
-        logger.info("Executing Python code: {}", code)
-        output = io.StringIO()
+def run_python(code: str, namespace: dict) -> str:
+    """Run `code` in `namespace` REPL-style and return what it printed."""
+    logger.info("Executing Python code: {}", code)
+    output = io.StringIO()
 
+    try:
         # Parse the code into an AST.
         tree = ast.parse(code, mode="exec")
 
-        try:
-            # Redirect standard output to our StringIO instance.
-            with redirect_stdout(output):
-                for node in tree.body:
-                    # Compile and execute each node.
-                    exec(
-                        compile(
-                            ast.Module(body=[node], type_ignores=[]), "<ast>", "exec"
-                        ),
+        # Redirect standard output to our StringIO instance.
+        with redirect_stdout(output):
+            for node in tree.body:
+                # If the node is an expression, print its result.
+                if isinstance(node, ast.Expr):
+                    eval_result = eval(
+                        compile(ast.Expression(body=node.value), "<ast>", "eval"),
                         None,
-                        PythonExecutor.locals,
+                        namespace,
                     )
+                    if eval_result is not None:
+                        print(eval_result)
+                    continue
+
+                # Compile and execute each node.
+                exec(
+                    compile(ast.Module(body=[node], type_ignores=[]), "<ast>", "exec"),
+                    None,
+                    namespace,
+                )
+    except Exception as e:
+        logger.error("Error executing Python code: {}", e)
+        # MemoryError and friends have no message
+        return str(e) or type(e).__name__
 
-                    # If the node is an expression, print its result.
-                    if isinstance(node, ast.Expr):
-                        eval_result = eval(
-                            compile(ast.Expression(body=node.value), "<ast>", "eval"),
-                            None,
-                            PythonExecutor.locals,
-                        )
-                        if eval_result is not None:
-                            print(eval_result)
-        except Exception as e:
-            logger.error("Error executing Python code: {}", e)
-            return str(e)
+    # Retrieve the output and return it.
+    return output.getvalue()
 
-        # Retrieve the output and return it.
-        return output.getvalue()
 
+class PythonExecutor(Executor):
+    locals = {}
 
-class CppExecutor(Executor):
     def execute(self, code: str) -> str:
-        with open("script.cpp", "w") as f:
-            f.write(code)
+        return run_python(code, PythonExecutor.locals)
+
+
+class CPUTimeLimitExceeded(Exception):
+    pass
+
+
+def _raise_cpu_time_limit(signum, frame):
+    raise CPUTimeLimitExceeded("CPU time limit exceeded")
+
+
+def _refresh_imports():
+    """Make packages pip installed since the worker started importable."""
+    importlib.invalidate_caches()
+    # A first `pip install --user` creates the user site directory, which
+    # site only adds to sys.path if it existed at startup
+    user_site = site.getusersitepackages()
+    if (
+        site.ENABLE_USER_SITE
+        and user_site not in sys.path
+        and os.path.isdir(user_site)
+    ):
+        site.addsitedir(user_site)
+
+
+def _worker_main(conn, memory_limit, max_sessions):
+    """Serve execution requests for the sessions assigned to this worker."""
+    if resource is not None:
+        if memory_limit:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        signal.signal(signal.SIGXCPU, _raise_cpu_time_limit)
+
+    # One persistent namespace per chat session, least recently used first
+    namespaces = OrderedDict()
+
+    while True:
         try:
-            subprocess.run(["g++", "script.cpp"], check=True)
-            output = subprocess.run(
-                ["./a.out"], capture_output=True, text=True, check=True
-            )
-            return output.stdout
-        except subprocess.CalledProcessError as e:
-            # Here we include e.stderr in the output.
-            raise subprocess.CalledProcessError(e.returncode, e.cmd, output=e.stderr)
+            command, session_id, code, cpu_time_limit = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
 
+        if command == "release":
+            namespaces.pop(session_id, None)
+            conn.send("")
+            continue
 
-class RustExecutor(Executor):
-    def execute(self, code: str) -> str:
-        with open("script.rs", "w") as f:
-            f.write(code)
+        namespace = namespaces.pop(session_id, None) or {"__name__": "__main__"}
+        namespaces[session_id] = namespace
+        while len(namespaces) > max_sessions:
+            namespaces.popitem(last=False)
+
+        _refresh_imports()
+        if resource is not None and cpu_time_limit:
+            # RLIMIT_CPU counts the whole process, so the limit is moved
+            # forward from what this worker has already used.
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(used.ru_utime + used.ru_stime) + cpu_time_limit
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
         try:
-            subprocess.run(["rustc", "script.rs"], check=True)
-            output = subprocess.run(
-                ["./script"], capture_output=True, text=True, check=True
+            result = run_python(code, namespace)
+        except CPUTimeLimitExceeded as e:
+            # Raised outside of the user's code, e.g. while printing.
+            result = str(e)
+        finally:
+            if resource is not None and cpu_time_limit:
+                resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit, max_sessions):
+        self.ctx = ctx
+        self.memory_limit = memory_limit
+        self.max_sessions = max_sessions
+        self.lock = asyncio.Lock()
+        self.sessions = set()
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.memory_limit, self.max_sessions),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def restart(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.sessions.clear()
+        self.start()
+
+    def request(self, command, session_id, code, cpu_time_limit):
+        self.conn.send((command, session_id, code, cpu_time_limit))
+        return self.conn.recv()
+
+
+class ProcessPoolPythonExecutor:
+    """
+    Run Python code in a pool of worker processes instead of the server.
+
+    Each chat session is pinned to one worker that keeps its namespace between
+    calls, so sessions never share variables or stdout, and CPU-heavy code
+    does not block the event loop. Every call is bounded by a CPU time limit
+    and a wall time limit, and each worker by a memory cap. A worker that
+    times out or dies is replaced, which resets the sessions it held.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        cpu_time_limit: int = 30,
+        wall_time_limit: float = 60,
+        memory_limit: int = 1024 * 1024 * 1024,
+        max_sessions_per_worker: int = 32,
+    ):
+        self.cpu_time_limit = cpu_time_limit
+        self.wall_time_limit = wall_time_limit
+        ctx = multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        self._workers = [
+            _Worker(ctx, memory_limit, max_sessions_per_worker)
+            for _ in range(workers or os.cpu_count() or 1)
+        ]
+        self._assignments = {}
+
+    def _worker_for(self, session_id: str) -> _Worker:
+        worker = self._assignments.get(session_id)
+        if worker is None or session_id not in worker.sessions:
+            worker = min(self._workers, key=lambda w: len(w.sessions))
+            worker.sessions.add(session_id)
+            self._assignments[session_id] = worker
+        return worker
+
+    async def execute(self, session_id: str, code: str) -> str:
+        worker = self._worker_for(session_id)
+        async with worker.lock:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.to_thread(
+                        worker.request, "exec", session_id, code, self.cpu_time_limit
+                    ),
+                    timeout=self.wall_time_limit,
+                )
+            except asyncio.TimeoutError:
+                logger.error("Python execution timed out for session {}", session_id)
+                worker.restart()
+                return (
+                    f"Execution exceeded the {self.wall_time_limit}s time limit, "
+                    "the interpreter state was reset"
+                )
+            except (EOFError, OSError) as e:
+                logger.error("Python worker died for session {}: {}", session_id, e)
+                worker.restart()
+                return "The interpreter crashed (out of memory?), its state was reset"
+
+    async def release(self, session_id: str):
+        worker = self._assignments.pop(session_id, None)
+        if worker is None or session_id not in worker.sessions:
+            return
+        worker.sessions.discard(session_id)
+        async with worker.lock:
+            await asyncio.to_thread(worker.request, "release", session_id, "", 0)
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "codeinterpreter-binaries")
+
+
+class BinaryCache:
+    """
+    Content-addressed cache of compiled binaries, evicted least recently used.
+
+    Binaries are keyed by a hash of the source and the compile command, and
+    published with an atomic rename so concurrent workers never see partial
+    files. Cached binaries are executed as is, so the directory must be
+    private: it is created with mode 0o700 and refused if another user owns it.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        self._check_private()
+
+    def _check_private(self):
+        # lstat, so a symlink planted in place of the directory is refused
+        info = os.lstat(self.cache_dir)
+        if not stat.S_ISDIR(info.st_mode):
+            raise PermissionError(f"{self.cache_dir} is not a directory")
+        if hasattr(os, "getuid"):
+            if info.st_uid != os.getuid():
+                raise PermissionError(f"{self.cache_dir} is owned by another user")
+            if info.st_mode & 0o077:
+                os.chmod(self.cache_dir, 0o700)
+
+    @staticmethod
+    def key(code: str, compile_command: list) -> str:
+        digest = hashlib.sha256()
+        digest.update("\0".join(compile_command).encode())
+        digest.update(b"\0\0")
+        digest.update(code.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, dest_path: str) -> bool:
+        """Link the cached binary to `dest_path`, False if it is not cached.
+
+        The caller runs its own link, so evicting the entry in the meantime
+        does not remove the binary from under it.
+        """
+        path = os.path.join(self.cache_dir, key)
+        try:
+            os.utime(path)
+            try:
+                os.link(path, dest_path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # No hard links on this filesystem
+                shutil.copy2(path, dest_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key: str, binary_path: str):
+        path = os.path.join(self.cache_dir, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copy2(binary_path, tmp_path)
+        os.replace(tmp_path, path)
+        os.utime(path)
+        self._evict(keep=key)
+
+    def _evict(self, keep: str):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class CompiledExecutor(Executor):
+    """
+    Compile and run a snippet without blocking the event loop.
+
+    Every call works in its own temporary directory, so concurrent sessions
+    never clobber each other's sources or binaries. Compiled binaries are
+    cached by source hash, so running the same code again skips the compiler,
+    and at most `max_concurrent_compiles` compilers run at once.
+    """
+
+    source_name = None
+    binary_name = "program"
+    max_concurrent_compiles = os.cpu_count() or 1
+
+    _compile_slots = None
+    _compiling = {}
+
+    def __init__(self, cache: BinaryCache = None, run_timeout: float = 30):
+        self.cache = cache or BinaryCache(default_cache_dir())
+        self.run_timeout = run_timeout
+
+    @abc.abstractmethod
+    def compile_command(self, source_path: str, binary_path: str) -> list:
+        pass
+
+    async def execute(self, code: str) -> str:
+        # Next to the cache, so the binary can be hard linked instead of copied
+        with tempfile.TemporaryDirectory(dir=self.cache.cache_dir) as workdir:
+            binary = os.path.join(workdir, self.binary_name)
+            await self._get_binary(code, binary)
+            stdout, stderr, returncode = await self._run(
+                [binary], workdir, self.run_timeout
             )
-            return output.stdout
-        except subprocess.CalledProcessError as e:
-            # Here we include e.stderr in the output.
-            raise subprocess.CalledProcessError(e.returncode, e.cmd, output=e.stderr)
+        if returncode != 0:
+            # Here we include stderr in the output.
+            raise subprocess.CalledProcessError(returncode, binary, output=stderr)
+        return stdout
+
+    async def _get_binary(self, code: str, dest_path: str):
+        # Hash the command with placeholder paths, the real ones are temporary
+        key = BinaryCache.key(code, self.compile_command("<source>", "<binary>"))
+        if self.cache.get(key, dest_path):
+            return
+
+        cls = CompiledExecutor
+        if cls._compile_slots is None:
+            cls._compile_slots = asyncio.Semaphore(self.max_concurrent_compiles)
+        # Identical snippets submitted together are only compiled once. The
+        # lock is shared until its last waiter leaves, so a caller arriving
+        # while others still wait does not get a fresh lock.
+        lock, waiters = cls._compiling.get(key, (asyncio.Lock(), 0))
+        cls._compiling[key] = (lock, waiters + 1)
+        try:
+            async with lock:
+                if self.cache.get(key, dest_path):
+                    return
+                async with cls._compile_slots:
+                    await self._compile(key, code, dest_path)
+        finally:
+            lock, waiters = cls._compiling[key]
+            if waiters == 1:
+                del cls._compiling[key]
+            else:
+                cls._compiling[key] = (lock, waiters - 1)
+
+    async def _compile(self, key: str, code: str, dest_path: str):
+        with tempfile.TemporaryDirectory() as workdir:
+            source_path = os.path.join(workdir, self.source_name)
+            binary_path = os.path.join(workdir, self.binary_name)
+            with open(source_path, "w") as f:
+                f.write(code)
+            command = self.compile_command(source_path, binary_path)
+            _, stderr, returncode = await self._run(command, workdir, None)
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, command, output=stderr)
+            self.cache.put(key, binary_path)
+            shutil.move(binary_path, dest_path)
+
+    @staticmethod
+    async def _run(command: list, cwd: str, timeout: float):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, timeout)
+        return stdout.decode(), stderr.decode(), process.returncode
+
+
+class CppExecutor(CompiledExecutor):
+    source_name = "script.cpp"
+
+    def compile_command(self, source_path: str, binary_path: str) -> list:
+        return ["g++", source_path, "-o", binary_path]
+
+
+class RustExecutor(CompiledExecutor):
+    source_name = "script.rs"
+
+    def compile_command(self, source_path: str, binary_path: str) -> list:
+        return ["rustc", source_path, "-o", binary_path]
@@ -0,0 +1,112 @@
+import asyncio
+import importlib
+import importlib.metadata
+import re
+import sys
+
+_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+_BARE_NAME = re.compile(r"\s*[A-Za-z0-9][A-Za-z0-9._-]*\s*")
+
+
+def canonical_name(requirement: str) -> str:
+    match = _NAME.match(requirement)
+    name = match.group(1) if match else requirement.strip()
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+class PackageInstaller:
+    """
+    Install packages with pip without blocking the event loop.
+
+    Installed distributions are looked up in an index built from
+    importlib.metadata instead of running `pip show`, and the index is rebuilt
+    after every install. All missing packages of one request go to a single
+    pip invocation; if it fails, each package is retried on its own so one bad
+    name does not fail the others. A package that is already being installed
+    for another session is awaited rather than installed twice.
+    """
+
+    def __init__(self):
+        self._installed = None
+        self._installing = {}
+
+    def installed(self) -> set:
+        if self._installed is None:
+            self._installed = {
+                canonical_name(dist.metadata["Name"])
+                for dist in importlib.metadata.distributions()
+                if dist.metadata["Name"]
+            }
+        return self._installed
+
+    def refresh(self):
+        importlib.invalidate_caches()
+        self._installed = None
+
+    async def install(self, requirements: list):
+        """
+        Return (already_installed, installed, errors) for the requirements.
+        """
+        already_installed, to_install, pending = [], [], {}
+        for requirement in requirements:
+            name = canonical_name(requirement)
+            if name in self._installing:
+                pending[requirement] = self._installing[name]
+            elif _BARE_NAME.fullmatch(requirement) and name in self.installed():
+                # Requirements with version specifiers are always passed to pip
+                already_installed.append(requirement)
+            else:
+                to_install.append(requirement)
+
+        if to_install:
+            task = asyncio.ensure_future(self._install_all(to_install))
+            for requirement in to_install:
+                self._installing[canonical_name(requirement)] = task
+                pending[requirement] = task
+            task.add_done_callback(lambda _: self._forget(to_install))
+
+        installed, errors = [], {}
+        for requirement, task in pending.items():
+            # The install is shared with other sessions, cancelling this one
+            # (stop button, disconnect) must not cancel it for them
+            error = (await asyncio.shield(task))[canonical_name(requirement)]
+            if error:
+                errors[requirement] = error
+            else:
+                installed.append(requirement)
+        return already_installed, installed, errors
+
+    def _forget(self, requirements):
+        for requirement in requirements:
+            self._installing.pop(canonical_name(requirement), None)
+
+    async def _install_all(self, requirements: list) -> dict:
+        """Return the pip error of each requirement by name, "" on success."""
+        error = await self._pip_install(requirements)
+        if error and len(requirements) > 1:
+            # pip installs nothing when one requirement fails, find which
+            errors = {}
+            for requirement in requirements:
+                errors[canonical_name(requirement)] = await self._pip_install(
+                    [requirement]
+                )
+            return errors
+        return {canonical_name(requirement): error for requirement in requirements}
+
+    async def _pip_install(self, requirements: list) -> str:
+        cmd_install = [sys.executable, "-m", "pip", "install", *requirements]
+        process = await asyncio.create_subprocess_exec(
+            *cmd_install, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # Only happens when the task itself is cancelled, e.g. at shutdown,
+            # do not leave pip running on its own
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            self.refresh()
+            raise
+        self.refresh()
+        return stderr.decode() if process.returncode != 0 else ""
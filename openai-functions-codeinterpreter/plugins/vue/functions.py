@@ -1,4 +1,10 @@
-import subprocess
+import os
+
+import chainlit as cl
+
+from token_buffer import TokenBuffer
+
+from . import project
 
 
 async def vue_install_package(path: str, package_name: str):
@@ -9,7 +15,17 @@ async def vue_install_package(path: str, package_name: str):
         path : The path of the project.
     """
     try:
-        subprocess.run(["npm", "install", package_name], cwd=path)
+        # npm的输出实时显示在步骤里
+        async with cl.Step(name=f"npm install {package_name}", type="tool") as step:
+            async with TokenBuffer(step) as buffer:
+                returncode, output = await project.run_command(
+                    ["npm", "install", package_name],
+                    path,
+                    on_output=buffer.stream_token,
+                )
+        project.file_trees.invalidate(path)
+        if returncode != 0:
+            return {"status": "false", "description": output[-2000:]}
         return {
             "status": "true",
             "description": "Package installed successfully.",
@@ -26,7 +42,7 @@ async def vue_create_directory(path: str, directory_name: str):
         directory_name : The name of the directory.
     """
     try:
-        subprocess.run(["mkdir", directory_name], cwd=path)
+        await project.make_directory(os.path.join(path, directory_name))
         return {
             "status": "true",
             "description": "Directory created successfully.",
@@ -43,7 +59,7 @@ async def vue_create_file(path: str, file_name: str):
         file_name : The name of the file.
     """
     try:
-        subprocess.run(["touch", file_name], cwd=path)
+        await project.touch(os.path.join(path, file_name))
         return {
             "status": "true",
             "description": "File created successfully.",
@@ -59,12 +75,16 @@ async def vue_get_project_file_list(path: str):
         project_name : The name of the project.
         path : The path of the project.
     """
-    # 使用ls命令获取文件列表
+    # 递归列出文件，忽略.gitignore中的文件，结果会被缓存
     try:
-        tree = subprocess.run(["ls", path], capture_output=True)
+        entries, truncated = await project.file_trees.get(path)
+        if truncated:
+            entries = entries + [
+                f"... (listing truncated after {len(entries)} entries)"
+            ]
         return {
             "status": "true",
-            "description": tree.stdout.decode(),
+            "description": "\n".join(entries),
         }
     except Exception as e:
         return {"status": "false", "description": str(e)}
@@ -78,8 +98,7 @@ async def get_vue_project_file_content(path: str, file_name: str):
         file_name : The name of the file.
     """
     try:
-        with open(f"{path}/{file_name}", "r") as f:
-            content = f.read()
+        content = await project.read_text(f"{path}/{file_name}")
         return {
             "status": "true",
             "description": content,
@@ -97,8 +116,7 @@ async def write_vue_project_file_content(path: str, file_name: str, content: str
         content : The content to write.
     """
     try:
-        with open(f"{path}/{file_name}", "w") as f:
-            f.write(content)
+        await project.write_text(f"{path}/{file_name}", content)
         return {
             "status": "true",
             "description": "File content written successfully.",
@@ -0,0 +1,179 @@
+import asyncio
+import fnmatch
+import os
+from pathlib import Path
+
+# 这些目录不管.gitignore怎么写都不列出
+ALWAYS_IGNORED = {".git", "node_modules"}
+
+
+async def run_command(cmd, cwd, on_output=None):
+    """
+    Run a command without blocking the event loop, returning (returncode, output).
+    Every output line is passed to `on_output` as soon as it is printed.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    lines = []
+    async for line in process.stdout:
+        line = line.decode(errors="replace")
+        lines.append(line)
+        if on_output is not None:
+            await on_output(line)
+    await process.wait()
+    return process.returncode, "".join(lines)
+
+
+async def read_text(path):
+    return await asyncio.to_thread(Path(path).read_text)
+
+
+async def write_text(path, content):
+    await asyncio.to_thread(Path(path).write_text, content)
+    file_trees.invalidate(path)
+
+
+async def make_directory(path):
+    await asyncio.to_thread(os.makedirs, path, exist_ok=True)
+    file_trees.invalidate(path)
+
+
+async def touch(path):
+    await asyncio.to_thread(Path(path).touch)
+    file_trees.invalidate(path)
+
+
+class GitIgnore:
+    """
+    The rules of one .gitignore file. Supports comments, negation, anchored
+    patterns and directory-only patterns.
+    """
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            self.rules.append((negate, dir_only, anchored, line.lstrip("/")))
+
+    @classmethod
+    def load(cls, directory):
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r") as f:
+                return cls(f.readlines())
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+
+    def match(self, rel_path, is_dir):
+        """
+        True if ignored, False if explicitly re-included, None if no rule matches.
+        The last matching rule wins, like git.
+        """
+        result = None
+        name = rel_path.rsplit("/", 1)[-1]
+        for negate, dir_only, anchored, pattern in self.rules:
+            if dir_only and not is_dir:
+                continue
+            target = rel_path if anchored else name
+            if fnmatch.fnmatchcase(target, pattern):
+                result = not negate
+        return result
+
+
+class FileTreeCache:
+    """
+    Snapshots of project trees, walked recursively with .gitignore applied.
+
+    A snapshot records the mtime of every directory it walked and of every
+    .gitignore it read. Adding, removing or renaming an entry changes its
+    directory's mtime, so a snapshot is checked with one stat per directory
+    instead of a full walk, and is dropped as soon as our own tools change
+    the project. Walks stop after `max_entries` entries, such snapshots are
+    marked as truncated.
+    """
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._snapshots = {}
+
+    async def get(self, root):
+        """Return (entries, truncated) for the project at `root`."""
+        root = os.path.abspath(root)
+        snapshot = self._snapshots.get(root)
+        if snapshot is None or not await asyncio.to_thread(self._is_fresh, snapshot):
+            snapshot = await asyncio.to_thread(self._walk, root)
+            self._snapshots[root] = snapshot
+        return snapshot["entries"], snapshot["truncated"]
+
+    def invalidate(self, path):
+        path = os.path.abspath(path)
+        for root in list(self._snapshots):
+            if path == root or path.startswith(root + os.sep):
+                del self._snapshots[root]
+
+    @staticmethod
+    def _is_fresh(snapshot):
+        try:
+            return all(
+                os.stat(path).st_mtime_ns == mtime
+                for path, mtime in snapshot["mtimes"].items()
+            )
+        except FileNotFoundError:
+            return False
+
+    def _walk(self, root):
+        entries = []
+        mtimes = {}
+        # (directory, relative path, .gitignore rules in scope as (base, rules))
+        stack = [(root, "", [])]
+        while stack and len(entries) < self.max_entries:
+            directory, rel_dir, ignores = stack.pop()
+            mtimes[directory] = os.stat(directory).st_mtime_ns
+            gitignore = GitIgnore.load(directory)
+            if gitignore is not None:
+                ignores = ignores + [(rel_dir, gitignore)]
+                # Editing a .gitignore does not change its directory's mtime
+                gitignore_path = os.path.join(directory, ".gitignore")
+                mtimes[gitignore_path] = os.stat(gitignore_path).st_mtime_ns
+
+            subdirectories = []
+            with os.scandir(directory) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.name in ALWAYS_IGNORED or self._ignored(
+                        ignores, rel_path, is_dir
+                    ):
+                        continue
+                    entries.append(rel_path + ("/" if is_dir else ""))
+                    if is_dir:
+                        subdirectories.append((entry.path, rel_path, ignores))
+            stack.extend(reversed(subdirectories))
+
+        truncated = bool(stack) or len(entries) > self.max_entries
+        entries = sorted(entries)[: self.max_entries]
+        return {"entries": entries, "mtimes": mtimes, "truncated": truncated}
+
+    @staticmethod
+    def _ignored(ignores, rel_path, is_dir):
+        # 越深的.gitignore优先级越高
+        for base, gitignore in reversed(ignores):
+            path = rel_path[len(base) + 1 :] if base else rel_path
+            result = gitignore.match(path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+
+file_trees = FileTreeCache()
@@ -1,10 +1,14 @@
+import asyncio
 import json
-import ast
 import os
 from openai import AsyncOpenAI
 
 import chainlit as cl
 
+from tool_call_assembler import ToolCallAssembler
+from token_buffer import TokenBuffer
+from tool_runner import ToolRunner
+
 cl.instrument_openai()
 
 api_key = os.environ.get("OPENAI_API_KEY")
@@ -52,11 +56,15 @@ def start_chat():
         "message_history",
         [{"role": "system", "content": "You are a helpful assistant."}],
     )
+    cl.user_session.set("tool_runner", ToolRunner())
 
 
 @cl.step(type="tool")
-async def call_tool(tool_call_id, name, arguments, message_history):
-    arguments = ast.literal_eval(arguments)
+async def call_tool(tool_call):
+    name = tool_call.name
+    if tool_call.error:
+        raise ValueError(tool_call.error)
+    arguments = tool_call.arguments
 
     current_step = cl.context.current_step
     current_step.name = name
@@ -70,14 +78,7 @@ async def call_tool(tool_call_id, name, arguments, message_history):
     current_step.output = function_response
     current_step.language = "json"
 
-    message_history.append(
-        {
-            "role": "function",
-            "name": name,
-            "content": function_response,
-            "tool_call_id": tool_call_id,
-        }
-    )
+    return function_response
 
 
 async def call_gpt4(message_history):
@@ -92,40 +93,52 @@ async def call_gpt4(message_history):
         messages=message_history, stream=True, **settings
     )
 
-    tool_call_id = None
-    function_output = {"name": "", "arguments": ""}
+    # Parallel tool calls are streamed side by side, each one is started as
+    # soon as its arguments are complete, before the model stream ends
+    assembler = ToolCallAssembler()
+    tool_runner = cl.user_session.get("tool_runner")
+    running = {}
 
     final_answer = cl.Message(content="", author="Answer")
 
-    async for part in stream:
-        new_delta = part.choices[0].delta
-        tool_call = new_delta.tool_calls and new_delta.tool_calls[0]
-        function = tool_call and tool_call.function
-        if tool_call and tool_call.id:
-            tool_call_id = tool_call.id
-
-        if function:
-            if function.name:
-                function_output["name"] = function.name
-            else:
-                function_output["arguments"] += function.arguments
-        if new_delta.content:
-            if not final_answer.content:
-                await final_answer.send()
-            await final_answer.stream_token(new_delta.content)
-
-    if tool_call_id:
-        await call_tool(
-            tool_call_id,
-            function_output["name"],
-            function_output["arguments"],
-            message_history,
+    try:
+        async with TokenBuffer(final_answer) as buffer:
+            async for part in stream:
+                new_delta = part.choices[0].delta
+                for tool_call in assembler.add_openai_delta(new_delta):
+                    running[tool_call.key] = tool_runner.start(tool_call, call_tool)
+                if new_delta.content:
+                    if not buffer.tokens:
+                        await final_answer.send()
+                    await buffer.stream_token(new_delta.content)
+    except BaseException:
+        # Nobody awaits the tools already started if the stream fails
+        for task in running.values():
+            task.cancel()
+        raise
+
+    for tool_call in assembler.finish():
+        running[tool_call.key] = tool_runner.start(tool_call, call_tool)
+
+    tool_calls = assembler.tool_calls
+    function_responses = await asyncio.gather(
+        *(running[tool_call.key] for tool_call in tool_calls)
+    )
+
+    for tool_call, function_response in zip(tool_calls, function_responses):
+        message_history.append(
+            {
+                "role": "function",
+                "name": tool_call.name,
+                "content": function_response,
+                "tool_call_id": tool_call.id,
+            }
         )
 
     if final_answer.content:
         await final_answer.update()
 
-    return tool_call_id
+    return bool(tool_calls)
 
 
 @cl.on_message
@@ -136,8 +149,8 @@ async def on_message(message: cl.Message):
     cur_iter = 0
 
     while cur_iter < MAX_ITER:
-        tool_call_id = await call_gpt4(message_history)
-        if not tool_call_id:
+        has_tool_calls = await call_gpt4(message_history)
+        if not has_tool_calls:
             break
 
         cur_iter += 1
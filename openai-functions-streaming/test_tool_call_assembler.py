@@ -0,0 +1,154 @@
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+from tool_call_assembler import IncrementalJSON, ToolCallAssembler
+
+ARGUMENTS = {
+    "location": 'San "Francisco", {CA} [US]\\',
+    "unit": "celsius",
+    "nested": {"list": [1, {"a": "}"}], "empty": {}},
+}
+
+
+def split_randomly(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(0, len(text) - 1)))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def openai_delta(index, id=None, name=None, arguments=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    tool_call = SimpleNamespace(index=index, id=id, function=function)
+    return SimpleNamespace(content=None, tool_calls=[tool_call])
+
+
+def block_start(index, block_type, id=None, name=None):
+    block = SimpleNamespace(type=block_type, id=id, name=name)
+    return SimpleNamespace(
+        type="content_block_start", index=index, content_block=block
+    )
+
+
+def json_delta(index, partial_json):
+    delta = SimpleNamespace(type="input_json_delta", partial_json=partial_json)
+    return SimpleNamespace(type="content_block_delta", index=index, delta=delta)
+
+
+def text_delta(index, text):
+    delta = SimpleNamespace(type="text_delta", text=text)
+    return SimpleNamespace(type="content_block_delta", index=index, delta=delta)
+
+
+def block_stop(index):
+    return SimpleNamespace(type="content_block_stop", index=index)
+
+
+def test_interleaved_openai_deltas():
+    assembler = ToolCallAssembler()
+    first = split_randomly(json.dumps({"location": "Paris"}), random.Random(0))
+    second = split_randomly(json.dumps(ARGUMENTS), random.Random(1))
+    deltas = [
+        openai_delta(0, id="call_0", name="get_current_weather"),
+        openai_delta(1, id="call_1", name="get_current_weather"),
+    ]
+    for i in range(max(len(first), len(second))):
+        if i < len(second):
+            deltas.append(openai_delta(1, arguments=second[i]))
+        if i < len(first):
+            deltas.append(openai_delta(0, arguments=first[i]))
+
+    completed = []
+    for delta in deltas:
+        completed += [call.id for call in assembler.add_openai_delta(delta)]
+
+    # Each call completes on its own closing brace, the shorter one first
+    assert completed == ["call_0", "call_1"]
+    assert assembler.finish() == []
+    calls = assembler.tool_calls
+    assert [call.id for call in calls] == ["call_0", "call_1"]
+    assert calls[0].arguments == {"location": "Paris"}
+    assert calls[1].arguments == ARGUMENTS
+    assert calls[1].error is None
+
+
+def test_openai_call_completes_before_stream_ends():
+    assembler = ToolCallAssembler()
+    assembler.add_openai_delta(openai_delta(0, id="call_0", name="f"))
+    assert assembler.add_openai_delta(openai_delta(0, arguments='{"a": ')) == []
+    (call,) = assembler.add_openai_delta(openai_delta(0, arguments="1}"))
+    assert call.done and call.arguments == {"a": 1}
+    # Trailing fragments after completion do not complete it twice
+    assert assembler.add_openai_delta(openai_delta(0, arguments=" ")) == []
+
+
+def test_anthropic_input_json_delta_events():
+    assembler = ToolCallAssembler()
+    pieces = split_randomly(json.dumps(ARGUMENTS), random.Random(2))
+    events = [
+        block_start(0, "text"),
+        text_delta(0, "Let me check {"),
+        block_stop(0),
+        block_start(1, "tool_use", id="toolu_1", name="get_current_weather"),
+        *(json_delta(1, piece) for piece in pieces),
+        block_stop(1),
+        block_start(2, "tool_use", id="toolu_2", name="no_arguments"),
+        block_stop(2),
+    ]
+
+    completed = []
+    for event in events:
+        completed += [
+            (event.type, call.id) for call in assembler.add_anthropic_event(event)
+        ]
+
+    assert completed == [
+        # Complete on the closing brace, not on content_block_stop
+        ("content_block_delta", "toolu_1"),
+        # A tool without parameters completes when its block stops
+        ("content_block_stop", "toolu_2"),
+    ]
+    calls = assembler.tool_calls
+    assert [(call.name, call.arguments) for call in calls] == [
+        ("get_current_weather", ARGUMENTS),
+        ("no_arguments", {}),
+    ]
+    assert assembler.finish() == []
+
+
+def test_arguments_split_mid_token():
+    # Cut inside a string, right after a backslash, and inside a number
+    fragments = ['{"path": "C:\\', '\\dir\\', '"}", "n": 1', "2.5", "}"]
+    parser = IncrementalJSON()
+    results = [parser.feed(fragment) for fragment in fragments]
+    assert results == [False, False, False, False, True]
+    assert json.loads(parser.text) == {"path": 'C:\\dir"}', "n": 12.5}
+
+
+def test_invalid_arguments_are_reported_not_raised():
+    assembler = ToolCallAssembler()
+    assembler.add_openai_delta(openai_delta(0, id="call_0", name="f"))
+    (call,) = assembler.add_openai_delta(openai_delta(0, arguments='{"a": tru}'))
+    assert call.arguments is None
+    assert call.error.startswith("Failed to parse tool arguments")
+
+
+def test_finish_returns_calls_cut_off_by_the_stream():
+    assembler = ToolCallAssembler()
+    assembler.add_openai_delta(openai_delta(0, id="call_0", name="f"))
+    assembler.add_openai_delta(openai_delta(0, arguments='{"a": [1, 2'))
+    (call,) = assembler.finish()
+    assert call.done and call.error is not None
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fuzz_fragment_boundaries(seed):
+    rng = random.Random(seed)
+    text = json.dumps(ARGUMENTS)
+    parser = IncrementalJSON()
+    pieces = split_randomly(text, rng)
+    results = [parser.feed(piece) for piece in pieces]
+
+    # Complete exactly on the last fragment, whatever the cuts
+    assert results == [False] * (len(pieces) - 1) + [True]
+    assert json.loads(parser.text) == ARGUMENTS
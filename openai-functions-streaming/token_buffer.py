@@ -0,0 +1,105 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, List, Optional, Union
+
+if TYPE_CHECKING:
+    import chainlit as cl
+
+
+class TokenBuffer:
+    """Coalesce model tokens into fewer `stream_token` calls.
+
+    Every `stream_token` on a `cl.Message` or `cl.Step` is a websocket emit.
+    Tokens written to the buffer are held until `interval` seconds have passed
+    since the first pending token or `max_chars` characters are pending,
+    and are then sent to the wrapped message or step as a single frame.
+    The interval is also checked on every token, so frames keep flowing when
+    a synchronous token generator holds the event loop and the timer cannot
+    fire. With `is_input`, the tokens go to the input of the wrapped step
+    instead of its output. With `is_sequence`, every token is the whole text
+    so far, as for `stream_token(..., is_sequence=True)`, and a frame only
+    sends the latest one.
+
+    Use it as an async context manager so the tail is flushed when the stream
+    ends, fails or is cancelled:
+
+        async with TokenBuffer(msg) as buffer:
+            async for token in stream:
+                await buffer.stream_token(token)
+    """
+
+    def __init__(
+        self,
+        target: Union["cl.Message", "cl.Step"],
+        interval: float = 0.04,
+        max_chars: int = 1024,
+        is_input: bool = False,
+        is_sequence: bool = False,
+    ):
+        self.target = target
+        self.interval = interval
+        self.max_chars = max_chars
+        self.is_input = is_input
+        self.is_sequence = is_sequence
+
+        self.tokens = 0
+        self.frames = 0
+
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._pending_since = 0.0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def stream_token(self, token: str):
+        if not token:
+            return
+
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        if self.is_sequence:
+            self._pending = [token]
+        else:
+            self._pending.append(token)
+            self._pending_chars += len(token)
+        self.tokens += 1
+
+        if (
+            self._pending_chars >= self.max_chars
+            or time.monotonic() - self._pending_since >= self.interval
+        ):
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_interval())
+
+    async def flush(self):
+        if self._timer is not None:
+            # The timer clears itself before flushing, so this only ever
+            # cancels a timer that is still sleeping.
+            self._timer.cancel()
+            self._timer = None
+
+        async with self._lock:
+            if not self._pending:
+                return
+            frame = "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+            self.frames += 1
+            kwargs = {}
+            if self.is_input:
+                kwargs["is_input"] = True
+            if self.is_sequence:
+                kwargs["is_sequence"] = True
+            await self.target.stream_token(frame, **kwargs)
+
+    async def _flush_after_interval(self):
+        await asyncio.sleep(self.interval)
+        self._timer = None
+        await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.flush()
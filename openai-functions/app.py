@@ -5,6 +5,8 @@ from openai import AsyncOpenAI
 
 import chainlit as cl
 
+from tool_runner import ToolRunner
+
 api_key = os.environ.get("OPENAI_API_KEY")
 client = AsyncOpenAI(api_key=api_key)
 
@@ -56,10 +58,11 @@ def start_chat():
         "message_history",
         [{"role": "system", "content": "You are a helpful assistant."}],
     )
+    cl.user_session.set("tool_runner", ToolRunner())
 
 
 @cl.step(type="tool")
-async def call_tool(tool_call, message_history):
+async def call_tool(tool_call):
     function_name = tool_call.function.name
     arguments = ast.literal_eval(tool_call.function.arguments)
 
@@ -76,14 +79,7 @@ async def call_tool(tool_call, message_history):
     current_step.output = function_response
     current_step.language = "json"
 
-    message_history.append(
-        {
-            "role": "function",
-            "name": function_name,
-            "content": function_response,
-            "tool_call_id": tool_call.id,
-        }
-    )
+    return function_response
 
 
 async def call_gpt4(message_history):
@@ -99,9 +95,24 @@ async def call_gpt4(message_history):
 
     message = response.choices[0].message
 
-    for tool_call in message.tool_calls or []:
-        if tool_call.type == "function":
-            await call_tool(tool_call, message_history)
+    # Run every tool call of the turn concurrently, results keep the call order
+    tool_calls = [
+        tool_call
+        for tool_call in message.tool_calls or []
+        if tool_call.type == "function"
+    ]
+    tool_runner = cl.user_session.get("tool_runner")
+    function_responses = await tool_runner.run(tool_calls, call_tool)
+
+    for tool_call, function_response in zip(tool_calls, function_responses):
+        message_history.append(
+            {
+                "role": "function",
+                "name": tool_call.function.name,
+                "content": function_response,
+                "tool_call_id": tool_call.id,
+            }
+        )
 
     if message.content:
         cl.context.current_step.output = message.content
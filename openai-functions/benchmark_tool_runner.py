@@ -0,0 +1,45 @@
+"""Compare wall time of multi-tool turns, run serially and with `ToolRunner`.
+
+Each simulated tool waits like a backend or API call would:
+
+    python benchmark_tool_runner.py
+"""
+
+import asyncio
+import random
+import time
+
+from tool_runner import ToolRunner
+
+
+async def fake_tool(latency: float):
+    await asyncio.sleep(latency)
+    return f"done in {latency:.2f}s"
+
+
+async def serial(calls):
+    return [await fake_tool(latency) for latency in calls]
+
+
+async def main():
+    rng = random.Random(0)
+    for tools_per_turn in (1, 2, 4, 8):
+        calls = [rng.uniform(0.1, 0.5) for _ in range(tools_per_turn)]
+
+        start = time.perf_counter()
+        expected = await serial(calls)
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await ToolRunner(max_concurrency=4).run(calls, fake_tool)
+        parallel_time = time.perf_counter() - start
+
+        assert results == expected
+        print(
+            f"{tools_per_turn} tools per turn: serial {serial_time:5.2f}s, "
+            f"ToolRunner {parallel_time:5.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
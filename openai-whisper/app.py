@@ -8,6 +8,8 @@ import audioop
 from openai import AsyncOpenAI
 import chainlit as cl
 
+from tts_cache import TTSCache
+
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -19,6 +21,15 @@ if not ELEVENLABS_API_KEY or not ELEVENLABS_VOICE_ID or not OPENAI_API_KEY:
         "OPENAI_API_KEY, ELEVENLABS_API_KEY and ELEVENLABS_VOICE_ID must be set"
     )
 
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+ELEVENLABS_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.5}
+
+tts_cache = TTSCache(
+    cache_dir=os.getenv("TTS_CACHE_DIR", ".files/tts_cache"),
+    max_disk_bytes=int(os.getenv("TTS_CACHE_MAX_DISK_BYTES", 512 * 1024 * 1024)),
+    max_memory_bytes=int(os.getenv("TTS_CACHE_MAX_MEMORY_BYTES", 32 * 1024 * 1024)),
+)
+
 
 # Define a threshold for detecting silence and a timeout for ending a turn
 SILENCE_THRESHOLD = (
@@ -38,8 +49,27 @@ async def speech_to_text(audio_file):
 
 @cl.step(type="tool")
 async def text_to_speech(text: str, mime_type: str):
+    """Synthesize `text`, returning (name, content, path).
+
+    Cached clips found only on disk are returned as a path with no content, so
+    Chainlit streams them from the file instead of loading them in memory.
+    """
     CHUNK_SIZE = 1024
 
+    name = f"output_audio.{mime_type.split('/')[1]}"
+    key = TTSCache.key(
+        text,
+        ELEVENLABS_VOICE_ID,
+        ELEVENLABS_MODEL_ID,
+        ELEVENLABS_VOICE_SETTINGS,
+        mime_type,
+    )
+
+    if (audio := tts_cache.get_memory(key)) is not None:
+        return name, audio, None
+    if (path := tts_cache.get_path(key)) is not None:
+        return name, None, path
+
     url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVENLABS_VOICE_ID}"
 
     headers = {
@@ -50,23 +80,24 @@ async def text_to_speech(text: str, mime_type: str):
 
     data = {
         "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {"stability": 0.5, "similarity_boost": 0.5},
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS,
     }
 
     async with httpx.AsyncClient(timeout=25.0) as client:
         response = await client.post(url, json=data, headers=headers)
         response.raise_for_status()  # Ensure we notice bad responses
 
-        buffer = io.BytesIO()
-        buffer.name = f"output_audio.{mime_type.split('/')[1]}"
-
-        async for chunk in response.aiter_bytes(chunk_size=CHUNK_SIZE):
-            if chunk:
-                buffer.write(chunk)
+        writer = tts_cache.open_writer(key)
+        try:
+            async for chunk in response.aiter_bytes(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
 
-        buffer.seek(0)
-        return buffer.name, buffer.read()
+        return name, writer.commit(), None
 
 
 @cl.step(type="tool")
@@ -188,12 +219,16 @@ async def process_audio():
 
     answer = await generate_text_answer(transcription)
 
-    output_name, output_audio = await text_to_speech(answer, "audio/wav")
+    output_name, output_audio, output_path = await text_to_speech(
+        answer, "audio/wav"
+    )
 
     output_audio_el = cl.Audio(
+        name=output_name,
         auto_play=True,
         mime="audio/wav",
         content=output_audio,
+        path=output_path,
     )
 
     await cl.Message(content=answer, elements=[output_audio_el]).send()
@@ -201,4 +236,9 @@ async def process_audio():
 
 @cl.on_message
 async def on_message(message: cl.Message):
+    if message.content.strip() == "/tts-stats":
+        stats = "\n".join(f"- {k}: {v}" for k, v in tts_cache.stats().items())
+        await cl.Message(content=f"TTS cache stats:\n{stats}").send()
+        return
+
     await cl.Message(content="This is a voice demo, press P to start!").send()
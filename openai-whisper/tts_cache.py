@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTSCache:
+    """Content-addressed cache for synthesized speech.
+
+    Audio is keyed on everything that influences the synthesized bytes (text,
+    voice, model, voice settings and mime type). Recent clips are kept in an
+    in-memory LRU, and every clip is also written to a size-bounded directory
+    on disk so it survives restarts and can be served straight from the file.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def key(
+        text: str,
+        voice_id: str,
+        model_id: str,
+        voice_settings: dict,
+        mime_type: str,
+    ) -> str:
+        payload = json.dumps(
+            {
+                "text": text,
+                "voice_id": voice_id,
+                "model_id": model_id,
+                "voice_settings": voice_settings,
+                "mime_type": mime_type,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is None:
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return audio
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Return the on-disk path of a cached clip, or None on a miss.
+
+        The file is left on disk and returned as a path so the caller can
+        stream it rather than loading it into memory.
+        """
+        path = self.path(key)
+        with self._lock:
+            if key not in self._disk and not os.path.exists(path):
+                self.misses += 1
+                return None
+            if key not in self._disk:
+                # Written by another worker sharing the same directory.
+                self._disk[key] = os.path.getsize(path)
+                self._disk_bytes += self._disk[key]
+            self._disk.move_to_end(key)
+            self.disk_hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another worker between the check and the touch.
+            with self._lock:
+                self._forget_disk(key)
+                self.disk_hits -= 1
+                self.misses += 1
+            return None
+        return path
+
+    def open_writer(self, key: str) -> "TTSCacheWriter":
+        return TTSCacheWriter(self, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _commit(self, key: str, tmp_path: str, audio: bytes):
+        os.replace(tmp_path, self.path(key))
+        with self._lock:
+            self._forget_disk(key)
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            self._evict_disk()
+
+            if len(audio) <= self.max_memory_bytes:
+                if key in self._memory:
+                    self._memory_bytes -= len(self._memory.pop(key))
+                self._memory[key] = audio
+                self._memory_bytes += len(audio)
+                while self._memory_bytes > self.max_memory_bytes:
+                    _, evicted = self._memory.popitem(last=False)
+                    self._memory_bytes -= len(evicted)
+
+    def _forget_disk(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def _load_disk_index(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        # Oldest first, so the least recently used clips are evicted first.
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        with self._lock:
+            self._evict_disk()
+
+
+class TTSCacheWriter:
+    """Collects a clip while it streams in and publishes it atomically."""
+
+    def __init__(self, cache: TTSCache, key: str):
+        self.cache = cache
+        self.key = key
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self._chunks = []
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._chunks.append(chunk)
+
+    def commit(self) -> bytes:
+        self._file.close()
+        audio = b"".join(self._chunks)
+        self.cache._commit(self.key, self.tmp_path, audio)
+        return audio
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
@@ -1,3 +1,4 @@
+import hashlib
 import os
 from typing import List
 from langchain.document_loaders import PyPDFLoader, TextLoader
@@ -12,8 +13,14 @@ from langchain.docstore.document import Document
 import pinecone
 
 import chainlit as cl
+from chainlit.logger import logger
 from chainlit.types import AskFileResponse
 
+from cached_embeddings import CachedEmbeddings
+from hybrid_retriever import HybridRetriever
+from ingestion import BackgroundIngestion
+from semantic_cache import CachedConversationalRetrievalChain, SemanticCache
+
 pinecone.init(
     api_key=os.environ.get("PINECONE_API_KEY"),
     environment=os.environ.get("PINECONE_ENV"),
@@ -21,9 +28,14 @@ pinecone.init(
 
 index_name = "langchain-demo"
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-embeddings = OpenAIEmbeddings()
-
-namespaces = set()
+# Chunks indexed before the first question can be asked, the rest is
+# indexed in the background
+INGEST_FIRST_CHUNKS = int(os.environ.get("INGEST_FIRST_CHUNKS", "32"))
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "100"))
+embeddings = CachedEmbeddings(OpenAIEmbeddings())
+# Answers to near-duplicate questions about the same file are shared across
+# chats
+answer_cache = SemanticCache.from_env(embeddings)
 
 welcome_message = """Welcome to the Chainlit PDF QA demo! To get started:
 1. Upload a PDF or text file
@@ -37,34 +49,32 @@ def process_file(file: AskFileResponse):
     elif file.type == "application/pdf":
         Loader = PyPDFLoader
 
-        loader = Loader(file.path)
-        documents = loader.load()
-        docs = text_splitter.split_documents(documents)
-        for i, doc in enumerate(docs):
-            doc.metadata["source"] = f"source_{i}"
-        return docs
-
+    loader = Loader(file.path)
+    documents = loader.load()
+    docs = text_splitter.split_documents(documents)
+    for i, doc in enumerate(docs):
+        doc.metadata["source"] = f"source_{i}"
+    return docs
 
-def get_docsearch(file: AskFileResponse):
-    docs = process_file(file)
 
-    # Save data in the user session
-    cl.user_session.set("docs", docs)
+def file_namespace(file: AskFileResponse):
+    # The same content always maps to the same namespace, across uploads
+    # and restarts
+    with open(file.path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-    # Create a unique namespace for the file
-    namespace = file.id
 
-    if namespace in namespaces:
-        docsearch = Pinecone.from_existing_index(
-            index_name=index_name, embedding=embeddings, namespace=namespace
-        )
-    else:
-        docsearch = Pinecone.from_documents(
-            docs, embeddings, index_name=index_name, namespace=namespace
-        )
-        namespaces.add(namespace)
+def get_docsearch(namespace: str, chunks: int):
+    """Return the namespace's vector store and whether it is fully indexed."""
+    stats = pinecone.Index(index_name).describe_index_stats()
+    indexed = 0
+    if namespace in stats["namespaces"]:
+        indexed = stats["namespaces"][namespace]["vector_count"]
 
-    return docsearch
+    docsearch = Pinecone.from_existing_index(
+        index_name=index_name, embedding=embeddings, namespace=namespace
+    )
+    return docsearch, indexed >= chunks
 
 
 @cl.on_chat_start
@@ -83,8 +93,18 @@ async def start():
     msg = cl.Message(content=f"Processing `{file.name}`...", disable_feedback=True)
     await msg.send()
 
+    # The chunks are needed for the BM25 index either way, splitting is
+    # cheap next to embedding them
+    namespace = await cl.make_async(file_namespace)(file)
+    docs = await cl.make_async(process_file)(file)
     # No async implementation in the Pinecone client, fallback to sync
-    docsearch = await cl.make_async(get_docsearch)(file)
+    docsearch, indexed = await cl.make_async(get_docsearch)(namespace, len(docs))
+
+    if indexed:
+        msg.content = f"`{file.name}` processed. You can now ask questions!"
+    else:
+        ingestion = await start_ingestion(file.name, msg, docsearch, docs, namespace)
+        cl.user_session.set("ingestion", ingestion)
 
     message_history = ChatMessageHistory()
 
@@ -95,23 +115,89 @@ async def start():
         return_messages=True,
     )
 
-    chain = ConversationalRetrievalChain.from_llm(
+    chain = CachedConversationalRetrievalChain.from_llm(
         ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, streaming=True),
         chain_type="stuff",
-        retriever=docsearch.as_retriever(),
+        # BM25 and Pinecone are queried concurrently and fused by rank
+        retriever=HybridRetriever.from_vector_store(docsearch, docs),
         memory=memory,
         return_source_documents=True,
+        answer_cache=answer_cache,
+        cache_namespace=namespace,
     )
 
     # Let the user know that the system is ready
-    msg.content = f"`{file.name}` processed. You can now ask questions!"
     await msg.update()
 
     cl.user_session.set("chain", chain)
 
 
+async def start_ingestion(file_name, msg, docsearch, docs, namespace):
+    async def on_progress(indexed, total):
+        if indexed < total:
+            msg.content = (
+                f"Processing `{file_name}`: {indexed}/{total} chunks indexed. "
+                "You can already ask questions about the indexed part."
+            )
+        else:
+            # Answers given from a partial index are not reused
+            answer_cache.invalidate(namespace)
+            msg.content = f"`{file_name}` processed. You can now ask questions!"
+            logger.info(
+                "%s: %d chunks, first questions possible after %.2fs, "
+                "fully indexed after %.2fs",
+                file_name,
+                total,
+                ingestion.ready_seconds or ingestion.total_seconds,
+                ingestion.total_seconds,
+            )
+        # The first call happens before the message is completed in start()
+        if ingestion.task is not None:
+            await msg.update()
+
+    async def on_error(error):
+        logger.error(
+            "Indexing %s failed at %d/%d chunks",
+            file_name,
+            ingestion.indexed,
+            ingestion.total,
+            exc_info=error,
+        )
+        # Answers given from the partial index are not reused
+        answer_cache.invalidate(namespace)
+        msg.content = (
+            f"Indexing `{file_name}` stopped at {ingestion.indexed}/"
+            f"{ingestion.total} chunks ({error}). Answers only cover the indexed "
+            "part, upload the file again to index the rest."
+        )
+        await msg.update()
+
+    ingestion = BackgroundIngestion(
+        docsearch,
+        docs,
+        namespace,
+        first_chunks=INGEST_FIRST_CHUNKS,
+        batch_size=INGEST_BATCH_SIZE,
+        on_progress=on_progress,
+        on_error=on_error,
+    )
+    await ingestion.start()
+    return ingestion
+
+
+@cl.on_chat_end
+async def end():
+    ingestion = cl.user_session.get("ingestion")  # type: BackgroundIngestion
+    if ingestion:
+        ingestion.cancel()
+
+
 @cl.on_message
 async def main(message: cl.Message):
+    if message.content.strip() == "/cache-stats":
+        await cl.Message(content=f"Answer cache: {answer_cache.stats()}").send()
+        return
+
     chain = cl.user_session.get("chain")  # type: ConversationalRetrievalChain
     cb = cl.AsyncLangchainCallbackHandler()
     res = await chain.acall(message.content, callbacks=[cb])
@@ -0,0 +1,93 @@
+"""Time-to-first-question after an upload, background vs blocking ingestion.
+
+Splits a synthetic text file like `process_file` does, then indexes it into
+an in-memory vector store whose embedding calls sleep like a remote API
+(a fixed round trip plus a per-chunk cost). Reports when the first search
+can run with `BackgroundIngestion` compared with indexing every chunk
+before the chat is ready. No API key is needed:
+
+    python benchmark_ingestion.py --chunks 2000 --first-chunks 32
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from ingestion import BackgroundIngestion
+
+WORDS = (
+    "revenue growth margin quarter forecast customer product market segment "
+    "report region cost share investment outlook"
+).split()
+
+
+class SlowEmbeddings(DeterministicFakeEmbedding):
+    round_trip: float = 0.2
+    per_chunk: float = 0.002
+
+    def embed_documents(self, texts):
+        time.sleep(self.round_trip + self.per_chunk * len(texts))
+        return super().embed_documents(texts)
+
+
+def make_docs(chunks: int):
+    rng = random.Random(0)
+    text = "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(110)) for _ in range(chunks)
+    )
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    return splitter.split_documents([Document(page_content=text)])
+
+
+async def blocking(docs, batch_size):
+    store = InMemoryVectorStore(SlowEmbeddings(size=256))
+    start = time.perf_counter()
+    for i in range(0, len(docs), batch_size):
+        await asyncio.to_thread(store.add_documents, docs[i : i + batch_size])
+    store.similarity_search("revenue forecast", k=4)
+    return time.perf_counter() - start
+
+
+async def background(docs, first_chunks, batch_size):
+    store = InMemoryVectorStore(SlowEmbeddings(size=256))
+    start = time.perf_counter()
+    ingestion = BackgroundIngestion(
+        store, docs, "benchmark", first_chunks=first_chunks, batch_size=batch_size
+    )
+    await ingestion.start()
+    store.similarity_search("revenue forecast", k=4)
+    first_question = time.perf_counter() - start
+    await ingestion.task
+    return first_question, ingestion.total_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--first-chunks", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    docs = make_docs(args.chunks)
+    print(f"{len(docs)} chunks")
+
+    elapsed = asyncio.run(blocking(docs, args.batch_size))
+    print(f"blocking    first question after {elapsed:7.2f}s")
+
+    first_question, total = asyncio.run(
+        background(docs, args.first_chunks, args.batch_size)
+    )
+    print(
+        f"background  first question after {first_question:7.2f}s, "
+        f"fully indexed after {total:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
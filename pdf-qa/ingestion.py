@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from langchain.docstore.document import Document
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundIngestion:
+    """Indexes a file's chunks so the first ones are searchable right away.
+
+    `start()` upserts the first `first_chunks` chunks and returns, the rest
+    is upserted in batches of `batch_size` by a background task that reports
+    progress through `on_progress(indexed, total)`. If a batch fails, the
+    task stops and `on_error(error)` is called, the chunks indexed so far stay
+    searchable. Chunk ids are derived from the namespace and chunk number, so
+    re-running an interrupted ingestion overwrites instead of duplicating
+    vectors.
+    """
+
+    def __init__(
+        self,
+        docsearch,
+        docs: List[Document],
+        namespace: str,
+        first_chunks: int = 32,
+        batch_size: int = 100,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        on_error: Optional[Callable[[BaseException], Awaitable[None]]] = None,
+    ):
+        self.docsearch = docsearch
+        self.docs = docs
+        self.namespace = namespace
+        self.first_chunks = first_chunks
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.on_error = on_error
+
+        self.indexed = 0
+        self.ready_seconds: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+        self._error_task: Optional[asyncio.Task] = None
+        self._start = 0.0
+
+    @property
+    def total(self) -> int:
+        return len(self.docs)
+
+    @property
+    def done(self) -> bool:
+        return self.indexed == self.total
+
+    async def start(self):
+        """Index the first chunks, then continue in the background."""
+        self._start = time.perf_counter()
+        await self._add(0, min(self.first_chunks, self.total))
+        self.ready_seconds = time.perf_counter() - self._start
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(self._done)
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def _done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        self.error = task.exception()
+        if self.on_error:
+            self._error_task = asyncio.ensure_future(self.on_error(self.error))
+        else:
+            logger.error(
+                "Indexing %s stopped at %d/%d chunks",
+                self.namespace,
+                self.indexed,
+                self.total,
+                exc_info=self.error,
+            )
+
+    async def _run(self):
+        for start in range(self.indexed, self.total, self.batch_size):
+            await self._add(start, min(start + self.batch_size, self.total))
+
+    async def _add(self, start: int, end: int):
+        if start < end:
+            ids = [f"{self.namespace}-{i}" for i in range(start, end)]
+            # The Pinecone client is synchronous, cancelling only takes effect
+            # between batches
+            await asyncio.to_thread(
+                self.docsearch.add_documents, self.docs[start:end], ids=ids
+            )
+        self.indexed = end
+        if self.done:
+            self.total_seconds = time.perf_counter() - self._start
+        if self.on_progress:
+            await self.on_progress(self.indexed, self.total)
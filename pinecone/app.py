@@ -10,6 +10,9 @@ from langchain.docstore.document import Document
 from pinecone import Pinecone as PineconeClient
 import chainlit as cl
 
+from hybrid_retriever import BM25Index, HybridRetriever
+from semantic_cache import CachedConversationalRetrievalChain, SemanticCache
+
 pc = PineconeClient(api_key=os.environ.get("PINECONE_API_KEY"))
 
 index_name = "langchain-demo"
@@ -18,6 +21,46 @@ index_name = "langchain-demo"
 namespace = None
 
 embeddings = OpenAIEmbeddings()
+# Answers to near-duplicate questions are shared across chats
+answer_cache = SemanticCache.from_env(embeddings)
+
+
+@cl.cache
+def get_bm25_index():
+    """
+    Build a BM25 index over the chunk texts stored in the Pinecone index.
+    Listing vector ids is only supported by serverless indexes, without it
+    the retriever stays dense only.
+    """
+    index = pc.Index(index_name)
+    bm25 = BM25Index()
+    try:
+        for ids in index.list(namespace=namespace or ""):
+            fetched = index.fetch(ids=ids, namespace=namespace or "")
+            documents = []
+            for vector in fetched.vectors.values():
+                metadata = dict(vector.metadata or {})
+                text = metadata.pop("text", None)
+                if text:
+                    documents.append(Document(page_content=text, metadata=metadata))
+            bm25.add_documents(documents)
+    except Exception as e:
+        print(f"BM25 index unavailable, using dense retrieval only: {e}")
+        return None
+    return bm25
+
+
+def namespace_version(cache_namespace: str):
+    """
+    The namespace's vector count. The documents are written by another
+    process and Pinecone keeps no content version, so re-indexing with as
+    many chunks (edited pages, upserts under stable ids) goes unnoticed and
+    cached answers stay until ANSWER_CACHE_TTL expires.
+    """
+    stats = pc.Index(index_name).describe_index_stats()
+    summary = stats.namespaces.get(cache_namespace)
+    return summary.vector_count if summary else 0
+
 
 welcome_message = "Welcome to the Chainlit Pinecone demo! Ask anything about documents you vectorized and stored in your Pinecone DB."
 
@@ -29,6 +72,20 @@ async def start():
         index_name=index_name, embedding=embeddings, namespace=namespace
     )
 
+    # Cached answers are dropped once the namespace's vector count changes
+    cache_namespace = namespace or ""
+    answer_cache.check_version(
+        cache_namespace, await cl.make_async(namespace_version)(cache_namespace)
+    )
+
+    retriever = docsearch.as_retriever()
+    bm25 = await cl.make_async(get_bm25_index)()
+    if bm25:
+        # BM25 and Pinecone are queried concurrently and fused by rank
+        retriever = HybridRetriever(
+            dense=docsearch.as_retriever(search_kwargs={"k": 20}), bm25=bm25
+        )
+
     message_history = ChatMessageHistory()
 
     memory = ConversationBufferMemory(
@@ -38,18 +95,24 @@ async def start():
         return_messages=True,
     )
 
-    chain = ConversationalRetrievalChain.from_llm(
+    chain = CachedConversationalRetrievalChain.from_llm(
         ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, streaming=True),
         chain_type="stuff",
-        retriever=docsearch.as_retriever(),
+        retriever=retriever,
         memory=memory,
         return_source_documents=True,
+        answer_cache=answer_cache,
+        cache_namespace=cache_namespace,
     )
     cl.user_session.set("chain", chain)
 
 
 @cl.on_message
 async def main(message: cl.Message):
+    if message.content.strip() == "/cache-stats":
+        await cl.Message(content=f"Answer cache: {answer_cache.stats()}").send()
+        return
+
     chain = cl.user_session.get("chain")  # type: ConversationalRetrievalChain
 
     cb = cl.AsyncLangchainCallbackHandler()
@@ -3,6 +3,7 @@ from openai import AsyncOpenAI
 
 import chainlit as cl
 
+from token_buffer import TokenBuffer
 
 client = AsyncOpenAI(
     api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ["BASE_URL"]
@@ -39,9 +40,10 @@ async def on_message(message: cl.Message):
         messages=message_history, stream=True, **settings
     )
 
-    async for part in stream:
-        if token := part.choices[0].delta.content or "":
-            await msg.stream_token(token)
+    async with TokenBuffer(msg) as buffer:
+        async for part in stream:
+            if token := part.choices[0].delta.content or "":
+                await buffer.stream_token(token)
 
     message_history.append({"role": "assistant", "content": msg.content})
     await msg.update()
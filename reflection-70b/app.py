@@ -1,28 +1,31 @@
-import requests
+import httpx
 import os
 import chainlit as cl
 from dotenv import load_dotenv
 
+from baseten_stream import stream_text
+from tag_stream import SegmentStack, TagStreamParser
+from token_buffer import TokenBuffer
+
 # Load environment variables from .env file
 load_dotenv()
 
+http_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+
 
-def call_model(messages):
+async def call_model(messages):
     # Model ID for production deployment
     model_id = os.getenv("MODEL_ID")
     # Read secrets from environment variables
     baseten_api_key = os.getenv("BASETEN_API_KEY")
-    # Call model endpoint
-    resp = requests.post(
+    # Call model endpoint and stream the generated text
+    async for text in stream_text(
+        http_client,
         f"https://model-{model_id}.api.baseten.co/production/predict",
-        headers={"Authorization": f"Api-Key {baseten_api_key}"},
-        json={"messages": messages, "max_tokens": 1024, "temperature": 0.7},
-        stream=True,
-    )
-
-    # Stream the generated tokens
-    for content in resp.iter_content():
-        yield content.decode("utf-8")
+        baseten_api_key,
+        {"messages": messages, "max_tokens": 1024, "temperature": 0.7},
+    ):
+        yield text
 
 
 @cl.set_starters
@@ -53,39 +56,50 @@ async def main(message: cl.Message):
     # RAW
     # msg = cl.Message(content="")
     # # option 1
-    # for chunk in call_model(message_history):
+    # async for chunk in call_model(message_history):
     #     if chunk:
     #         await msg.stream_token(chunk)
     # msg.send()
     # # Add the assistant's response to the history
     # message_history.append({"role": "assistant", "content": msg.content})
 
-    raw_answer = ""
-    is_thinking = False
-    is_answering = False
-
-    # Todo: fix when answer is just <|start_header_id|>assistant<|end_header_id|>\n\n SOMETHING <|eot_id|>
-    for chunk in call_model(message_history):
-        raw_answer += chunk
-        if raw_answer.endswith("<thinking>"):
-            is_thinking = True
-            msg = cl.Message(author="Thinking", content="<thinking>")
-            await msg.send()
-        elif raw_answer.endswith("</thinking>"):
-            await msg.stream_token(chunk)
-            is_thinking = False
-            await msg.update()
-        elif raw_answer.endswith("<output>"):
-            is_answering = True
-            msg = cl.Message(author="Answer", content="<output>")
-            await msg.send()
-        elif raw_answer.endswith("</output>"):
-            await msg.stream_token(chunk)
-            is_answering = False
-            await msg.update()
-        if chunk and (is_thinking or is_answering):
-            await msg.stream_token(chunk)
-
+    chunks = []
+    parser = TagStreamParser(["thinking", "reflection", "output"])
+    authors = {"thinking": "Thinking", "reflection": "Reflection", "output": "Answer"}
+    # Mirrors parser.stack, a tag can be nested in itself. Each open tag
+    # streams into its own message through a TokenBuffer.
+    buffers = SegmentStack()
+
+    async def close(closed):
+        for buffer in closed:
+            await buffer.flush()
+            await buffer.target.update()
+
+    try:
+        # Todo: fix when answer is just <|start_header_id|>assistant<|end_header_id|>\n\n SOMETHING <|eot_id|>
+        async for text in call_model(message_history):
+            chunks.append(text)
+            for kind, tag, segment in parser.feed(text):
+                if kind == "open":
+                    if buffers.top is not None:
+                        # The enclosing text is shown before the nested message
+                        await buffers.top.flush()
+                    msg = cl.Message(author=authors[tag], content="")
+                    await msg.send()
+                    buffers.push(tag, TokenBuffer(msg))
+                elif kind == "close":
+                    await close(buffers.close(tag))
+                elif tag is not None:
+                    await buffers.top.stream_token(segment)
+
+        for kind, tag, segment in parser.close():
+            if tag is not None:
+                await buffers.top.stream_token(segment)
+    finally:
+        # Also when the stream fails, so the partial messages are kept
+        await close(buffers.close_all())
+
+    raw_answer = "".join(chunks)
     raw_answer = raw_answer.replace(
         "<|start_header_id|>assistant<|end_header_id|>\n\n", ""
     )
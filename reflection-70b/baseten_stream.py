@@ -0,0 +1,31 @@
+import codecs
+from typing import AsyncIterator
+
+import httpx
+
+
+async def stream_text(
+    client: httpx.AsyncClient, url: str, api_key: str, payload: dict
+) -> AsyncIterator[str]:
+    """Stream a Baseten model response as decoded text.
+
+    Bytes are read as large as the network delivers them rather than one at a
+    time, and decoded with an incremental UTF-8 decoder so multi-byte
+    characters split across reads come out whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async with client.stream(
+        "POST",
+        url,
+        headers={"Authorization": f"Api-Key {api_key}"},
+        json=payload,
+    ) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes():
+            if text := decoder.decode(chunk):
+                yield text
+
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
@@ -0,0 +1,137 @@
+import random
+
+import pytest
+from tag_stream import SegmentStack, TagStreamParser
+
+TAGS = ["think", "thinking", "reflection", "output"]
+
+
+def merge(events):
+    merged = []
+    for kind, tag, text in events:
+        if kind == "text" and merged and merged[-1][:2] == ("text", tag):
+            merged[-1] = ("text", tag, merged[-1][2] + text)
+        else:
+            merged.append((kind, tag, text))
+    return merged
+
+
+def render(events):
+    markers = {"open": "<{}>", "close": "</{}>"}
+    return "".join(
+        text if kind == "text" else markers[kind].format(tag)
+        for kind, tag, text in events
+    )
+
+
+def parse(chunks):
+    parser = TagStreamParser(TAGS)
+    events = []
+    for chunk in chunks:
+        events += parser.feed(chunk)
+    events += parser.close()
+    return merge(events)
+
+
+def split_randomly(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(0, len(text) - 1)))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def test_routes_nested_tags():
+    text = (
+        "<|header|><thinking>a<reflection>b</reflection>c</thinking>"
+        "<output>d</output>"
+    )
+    assert parse([text]) == [
+        ("text", None, "<|header|>"),
+        ("open", "thinking", ""),
+        ("text", "thinking", "a"),
+        ("open", "reflection", ""),
+        ("text", "reflection", "b"),
+        ("close", "reflection", ""),
+        ("text", "thinking", "c"),
+        ("close", "thinking", ""),
+        ("open", "output", ""),
+        ("text", "output", "d"),
+        ("close", "output", ""),
+    ]
+
+
+def test_unknown_and_unopened_tags_are_text():
+    assert parse(["a < b <b>x</b> </output> <thin"]) == [
+        ("text", None, "a < b <b>x</b> </output> <thin"),
+    ]
+
+
+def test_tag_split_across_chunks():
+    assert parse(["<th", "ink>", "hm</thi", "nk", ">ok"]) == [
+        ("open", "think", ""),
+        ("text", "think", "hm"),
+        ("close", "think", ""),
+        ("text", None, "ok"),
+    ]
+
+
+def route(chunks):
+    """Feed chunks like app.py does, one list of text per opened tag."""
+    parser = TagStreamParser(TAGS)
+    stack = SegmentStack()
+    segments, closed = [], []
+    events = []
+    for chunk in chunks:
+        events += parser.feed(chunk)
+    events += parser.close()
+    for kind, tag, text in events:
+        if kind == "open":
+            segment = (tag, [])
+            segments.append(segment)
+            stack.push(tag, segment)
+        elif kind == "close":
+            closed += [tag for tag, _ in stack.close(tag)]
+        elif tag is not None:
+            assert stack.top[0] == tag
+            stack.top[1].append(text)
+    closed += [tag for tag, _ in stack.close_all()]
+    return [(tag, "".join(texts)) for tag, texts in segments], closed
+
+
+def test_routes_tag_nested_in_itself():
+    segments, closed = route(["<thinking>a<thinking>b</thinking>c</thinking>d"])
+    assert segments == [("thinking", "ac"), ("thinking", "b")]
+    assert closed == ["thinking", "thinking"]
+
+
+def test_outer_close_closes_inner_segments():
+    segments, closed = route(
+        ["<thinking>a<reflection>b<think>c</thinking>", "<output>d"]
+    )
+    assert segments == [
+        ("thinking", "a"),
+        ("reflection", "b"),
+        ("think", "c"),
+        ("output", "d"),
+    ]
+    # Innermost first, and the unclosed output once the stream ends
+    assert closed == ["think", "reflection", "thinking", "output"]
+
+
+def test_close_of_tag_that_is_not_open_closes_nothing():
+    stack = SegmentStack()
+    stack.push("output", "m")
+    assert stack.close("thinking") == []
+    assert stack.top == "m"
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fuzz_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    pieces = [f"<{tag}>" for tag in TAGS] + [f"</{tag}>" for tag in TAGS]
+    pieces += ["<", ">", "</", "<th", "text", " ", "é", "<b>", "\n"]
+    text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 60)))
+
+    assert parse(split_randomly(text, rng)) == parse([text])
+    assert parse(list(text)) == parse([text])
+    assert render(parse(split_randomly(text, rng))) == text
+    # Every text event lands in the segment of its innermost open tag
+    route(split_randomly(text, rng))
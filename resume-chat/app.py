@@ -11,6 +11,7 @@ from chainlit.types import ThreadDict
 import chainlit as cl
 
 import memory
+from token_buffer import TokenBuffer
 
 @cl.data_layer
 def get_data_layer():
@@ -72,11 +73,12 @@ async def on_message(message: cl.Message):
 
     res = cl.Message(content="")
 
-    async for chunk in runnable.astream(
-        {"question": message.content},
-        config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
-    ):
-        await res.stream_token(chunk)
+    async with TokenBuffer(res) as buffer:
+        async for chunk in runnable.astream(
+            {"question": message.content},
+            config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
+        ):
+            await buffer.stream_token(chunk)
 
     await res.send()
 